@@ -0,0 +1,129 @@
+"""
+Benchmark the fused compiler passes over the boot modules.
+
+Usage: python compilebench.py [file.mast...]
+
+Each module is lowered up to t.n.structure.refactorStructure(). Then the
+structural passes are timed one traversal at a time and fused, as are the
+first two passes of t.n.mix.mix(), and the totals are compared.
+"""
+
+from glob import glob
+import sys
+import time
+
+from typhon.load.nano import loadMAST
+from typhon.nano.auditors import dischargeAuditors
+from typhon.nano.escapes import elideEscapes
+from typhon.nano.interp import SplitAuditorsCounter
+from typhon.nano.mast import MastIR, saveScripts
+from typhon.nano.mix import FillAndThaw, FillOuters, ThawLiterals
+from typhon.nano.scopes import SEV_BINDING, SEV_SLOT, bindNouns, layoutScopes
+from typhon.nano.slots import recoverSlots
+from typhon.nano.structure import (MakeAtoms, RefactorStructure,
+                                   RemoveDefIgnore, SplitAuditors, SplitScript)
+from typhon.objects.constants import NullObject
+from typhon.objects.guards import anyGuard
+from typhon.objects.slots import FinalSlot, finalBinding
+
+
+def freeNames(expr):
+    """
+    Names used but never defined in a module; a stand-in for its outers.
+    """
+
+    used = set()
+    defined = set()
+    stack = [expr]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+            continue
+        if isinstance(node, (MastIR.NounExpr, MastIR.BindingExpr,
+                             MastIR.AssignExpr)):
+            used.add(node.name)
+        elif isinstance(node, (MastIR.FinalPatt, MastIR.VarPatt,
+                               MastIR.BindingPatt)):
+            defined.add(node.name)
+        for field in getattr(node, "_immutable_fields_", []):
+            stack.append(getattr(node, field.split("[")[0]))
+    return list(used - defined)
+
+
+def fakeOuters(outerNames):
+    outers = [None] * len(outerNames)
+    for (index, severity) in outerNames.values():
+        if severity is SEV_BINDING:
+            outers[index] = finalBinding(NullObject, anyGuard)
+        elif severity is SEV_SLOT:
+            outers[index] = FinalSlot(NullObject, anyGuard)
+        else:
+            outers[index] = NullObject
+    return outers
+
+
+def lowerForBench(path):
+    ast = loadMAST(path)
+    names = freeNames(ast)
+    ast = saveScripts(ast)
+    ast = recoverSlots(ast)
+    ast, outerNames, _, _ = layoutScopes(ast, names, u"bench", False)
+    ast = bindNouns(ast)
+    ast = elideEscapes(ast)
+    ast = dischargeAuditors(ast)
+    return ast, fakeOuters(outerNames)
+
+
+def separateStructure(ast):
+    for p in [RemoveDefIgnore, SplitScript, MakeAtoms, SplitAuditors]:
+        ast = p().visitExpr(ast)
+    return ast
+
+
+def fusedStructure(ast):
+    return RefactorStructure().visitExpr(ast)
+
+
+def best(f, modules, rounds):
+    rv = None
+    for _ in range(rounds):
+        start = time.time()
+        for module in modules:
+            f(*module)
+        taken = time.time() - start
+        if rv is None or taken < rv:
+            rv = taken
+    return rv
+
+
+def compare(name, separate, fused, modules, rounds):
+    old = best(separate, modules, rounds)
+    new = best(fused, modules, rounds)
+    print "%s, separate: %.4fs" % (name, old)
+    print "%s, fused:    %.4fs" % (name, new)
+    print "%s, speedup:  %.2fx" % (name, old / new)
+
+
+def main(argv):
+    paths = argv[1:] or sorted(glob("boot/*.mast") + glob("boot/*/*.mast") +
+                               glob("boot/*/*/*.mast"))
+    modules = [lowerForBench(path) for path in paths]
+    for ast, _ in modules:
+        counter = SplitAuditorsCounter()
+        assert (counter.visitExpr(separateStructure(ast)) ==
+                counter.visitExpr(fusedStructure(ast))), "mismatch"
+    print "Compiling %d modules" % len(modules)
+    compare("refactorStructure",
+            lambda ast, outers: separateStructure(ast),
+            lambda ast, outers: fusedStructure(ast), modules, 5)
+    structured = [(fusedStructure(ast), outers) for ast, outers in modules]
+    compare("mix",
+            lambda ast, outers: ThawLiterals().visitExpr(
+                FillOuters(outers).visitExpr(ast)),
+            lambda ast, outers: FillAndThaw(outers).visitExpr(ast),
+            structured, 5)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
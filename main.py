@@ -24,9 +24,13 @@ from typhon import rsodium, ruv
 from typhon.arguments import Configuration
 from typhon.debug import enableDebugPrint, TyphonJitHooks
 from typhon.errors import LoadFailed, UserException
-from typhon.importing import obtainModule
+from typhon.importing import (loweredCache, moduleCache, obtainModule,
+                              precompileModules)
+from typhon.load.nano import mappingSettings
 from typhon.log import log
-from typhon.metrics import globalRecorder
+from typhon.metrics import (Recorder, callSiteStats, compilerStats,
+                            globalRecorder)
+from typhon.nano.bytecode import engineSettings
 from typhon.objects.auditors import deepFrozenGuard
 from typhon.objects.collections.maps import ConstMap, monteMap, unwrapMap
 from typhon.objects.constants import NullObject
@@ -81,6 +85,58 @@ def loadPrelude(config, recorder, vat):
     return prelude
 
 
+def buildSafeScope(prelude):
+    """
+    Combine the safe scope with the prelude, and reflect the result as
+    `safeScope`.
+    """
+
+    scope = safeScope()
+    scope.update(prelude)
+    ss = scope.copy()
+    reflectedSS = monteMap()
+    for k, b in ss.iteritems():
+        reflectedSS[StrObject(u"&&" + k)] = b
+    ss[u"safeScope"] = finalBinding(ConstMap(reflectedSS), deepFrozenGuard)
+    reflectedSS[StrObject(u"&&safeScope")] = ss[u"safeScope"]
+    scope[u"safeScope"] = ss[u"safeScope"]
+    return scope
+
+
+class PrebuiltScope(object):
+    """
+    The safe scope and prelude, evaluated during translation and frozen into
+    the binary.
+    """
+
+    scope = None
+
+    def build(self, libraryPaths):
+        argv = ["mt-typhon"]
+        for path in libraryPaths:
+            argv += ["-l", path]
+        config = Configuration(argv)
+        vatManager = VatManager()
+        vat = Vat(vatManager, None, checkpoints=-1)
+        # Mappings and cached modules can't be prebuilt, so read the prelude
+        # into strings, and forget its modules afterwards.
+        mappingSettings.disable()
+        try:
+            with scopedVat(vat) as vat:
+                prelude = loadPrelude(config, Recorder(), vat)
+        finally:
+            mappingSettings.enable()
+            moduleCache.clear()
+        if vat.hasTurns():
+            raise LoadFailed("Prelude can't be prebuilt: it left turns "
+                             "queued in its vat")
+        registerGlobals(prelude)
+        self.scope = buildSafeScope(prelude)
+
+
+prebuiltScope = PrebuiltScope()
+
+
 def runUntilDone(vatManager, uv_loop, recorder):
     # This may take a while.
     anyVatHasTurns = vatManager.anyVatHasTurns()
@@ -139,6 +195,15 @@ class profiling(object):
         self.handle.close()
 
 
+def dumpCompilerStats(config):
+    if config.compilerStatsPath is None:
+        return
+    try:
+        compilerStats.dump(config.compilerStatsPath)
+    except (IOError, OSError):
+        print "Couldn't write compiler statistics to", config.compilerStatsPath
+
+
 def cleanUpEverything():
     """
     Put back any ambient-authority mutable global state that we may have
@@ -168,6 +233,21 @@ def runTyphon(argv):
 
     config.enableLogging()
 
+    if config.cachePath is not None:
+        loweredCache.enable(config.cachePath)
+
+    if config.compilerStatsPath is not None:
+        compilerStats.enable()
+
+    if config.profile:
+        callSiteStats.enable()
+
+    if config.engine == "bytecode":
+        engineSettings.useBytecode()
+    elif config.engine != "ast":
+        print "Unknown engine %s; expected ast or bytecode" % config.engine
+        return 1
+
     if len(config.argv) < 2:
         print "No file provided?"
         return 1
@@ -190,28 +270,27 @@ def runTyphon(argv):
     # have to do this ourselves in order to get the timing correct for early
     # timers.
     ruv.update_time(uv_loop)
-    try:
-        with scopedVat(vat) as vat:
-            prelude = loadPrelude(config, recorder, vat)
-    except LoadFailed as lf:
-        print lf
-        return 1
-    except UserException as ue:
-        debug_print("Caught exception while importing prelude:",
-                ue.formatError())
-        return 1
+    if prebuiltScope.scope is not None:
+        # The prelude was evaluated during translation, and its globals
+        # were registered then.
+        scope = prebuiltScope.scope.copy()
+    else:
+        try:
+            with scopedVat(vat) as vat:
+                prelude = loadPrelude(config, recorder, vat)
+        except LoadFailed as lf:
+            print lf
+            return 1
+        except UserException as ue:
+            debug_print("Caught exception while importing prelude:",
+                    ue.formatError())
+            return 1
 
-    registerGlobals(prelude)
+        registerGlobals(prelude)
+        scope = buildSafeScope(prelude)
 
-    scope = safeScope()
-    scope.update(prelude)
-    ss = scope.copy()
-    reflectedSS = monteMap()
-    for k, b in ss.iteritems():
-        reflectedSS[StrObject(u"&&" + k)] = b
-    ss[u"safeScope"] = finalBinding(ConstMap(reflectedSS), deepFrozenGuard)
-    reflectedSS[StrObject(u"&&safeScope")] = ss[u"safeScope"]
-    scope[u"safeScope"] = ss[u"safeScope"]
+    # The scope that the loader gives to modules.
+    safeEnv = scope.copy()
     scope.update(unsafeScope(config))
     reflectedUnsafeScope = monteMap()
     unsafeScopeDict = {}
@@ -229,6 +308,30 @@ def runTyphon(argv):
 
     if config.loadOnly:
         # We are finished.
+        dumpCompilerStats(config)
+        return 0
+
+    if config.precompile:
+        if not loweredCache.enabled():
+            print "-precompile needs a cache directory; use -cache"
+            return 1
+        try:
+            with scopedVat(vat):
+                # The main script is lowered in the scope that it'll be run
+                # in, and its modules in the scope that the loader gives
+                # them.
+                module.lower(unsafeScopeDict.keys())
+                count = precompileModules(config.libraryPaths, recorder,
+                                          config.precompile, safeEnv)
+        except LoadFailed as lf:
+            print lf
+            return 1
+        except UserException as ue:
+            debug_print("Caught exception while precompiling:",
+                    ue.formatError())
+            return 1
+        print "Precompiled", count, "modules into", config.cachePath
+        dumpCompilerStats(config)
         return 0
 
     if not config.benchmark:
@@ -261,6 +364,8 @@ def runTyphon(argv):
         finally:
             recorder.stop()
             recorder.printResults()
+            callSiteStats.printResults()
+            dumpCompilerStats(config)
 
     # Clean up and exit.
     cleanUpEverything()
@@ -288,8 +393,13 @@ def jitpolicy(driver):
     return JitPolicy(TyphonJitHooks())
 
 
-def target(driver, *args):
+def target(driver, args):
     driver.exe_name = "mt-typhon"
+    # With --prebuilt-prelude DIR, the prelude is loaded from DIR now, and
+    # every process starts with it already evaluated.
+    if "--prebuilt-prelude" in args:
+        i = args.index("--prebuilt-prelude")
+        prebuiltScope.build([args[i + 1]])
     return entryPoint, None
 
 
@@ -0,0 +1,84 @@
+"""
+Benchmark MAST decoding over the boot modules.
+
+Usage: python mastbench.py [file.mast...]
+
+Each file is decoded with the machine-word varint decoder and with the
+bigint decoder it replaced, and the totals are compared. Then the library
+modules are decoded, reporting how many strings and leaves were interned
+rather than allocated, and roughly how many bytes of heap that saved.
+"""
+
+from glob import glob
+import sys
+import time
+
+from typhon.load.nano import MAGIC, LeafInterner, MASTContext, MASTStream
+
+
+class BigintMASTStream(MASTStream):
+    """
+    The old decoder, which built a bigint for every varint.
+    """
+
+    def nextInt(self):
+        return self.nextVarInt().toint()
+
+
+def decode(streamClass, bs):
+    stream = streamClass(bs[len(MAGIC):])
+    context = MASTContext()
+    while not stream.exhausted():
+        context.decodeNextTag(stream)
+    return context
+
+
+def timeDecode(streamClass, blobs, rounds):
+    best = None
+    for _ in range(rounds):
+        start = time.time()
+        for bs in blobs:
+            decode(streamClass, bs)
+        taken = time.time() - start
+        if best is None or taken < best:
+            best = taken
+    return best
+
+
+def sharing(paths):
+    # Each module is decoded with its own interner, as when loading.
+    hits = 0
+    saved = 0
+    for path in paths:
+        with open(path, "rb") as handle:
+            bs = handle.read()
+        stream = MASTStream(bs[len(MAGIC):])
+        context = MASTContext(interner=LeafInterner())
+        while not stream.exhausted():
+            context.decodeNextTag(stream)
+        hits += context.interner.hits
+        saved += context.interner.saved
+    print "%d strings and leaves interned, ~%d bytes saved" % (hits, saved)
+
+
+def main(argv):
+    paths = argv[1:] or sorted(glob("boot/*.mast") + glob("boot/*/*.mast") +
+                               glob("boot/*/*/*.mast"))
+    blobs = []
+    for path in paths:
+        with open(path, "rb") as handle:
+            bs = handle.read()
+        if bs.startswith(MAGIC):
+            blobs.append(bs)
+    print "Decoding %d modules, %d bytes" % (len(blobs),
+                                             sum(len(bs) for bs in blobs))
+    old = timeDecode(BigintMASTStream, blobs, 5)
+    new = timeDecode(MASTStream, blobs, 5)
+    print "bigint varints:  %.4fs" % old
+    print "machine varints: %.4fs" % new
+    print "speedup: %.2fx" % (old / new)
+    sharing(sorted(glob("boot/lib/monte/*.mast")))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,20 @@
+"""
+Rewrite MAST files into the MAST v1 container format.
+
+Usage: python remast.py file.mast...
+"""
+
+import sys
+
+from typhon.load.nano import dumpMASTv1Bytes, loadMAST
+
+
+def main(argv):
+    for path in argv[1:]:
+        bs = dumpMASTv1Bytes(loadMAST(path))
+        with open(path, "wb") as handle:
+            handle.write(bs)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -53,6 +53,15 @@ class Configuration(object):
     # Whether to run benchmarks.
     benchmark = False
 
+    # Where to keep lowered modules between runs, if anywhere.
+    cachePath = None
+
+    # Where to write compiler pass statistics at exit, if anywhere.
+    compilerStatsPath = None
+
+    # Which engine runs methods: "ast" or "bytecode".
+    engine = "ast"
+
     # User settings for the JIT. By default:
     # * The trace limit is over 9000 and prime.
     jit = "trace_limit=9001"
@@ -65,6 +74,12 @@ class Configuration(object):
         # The paths from which to draw imports and the prelude.
         self.libraryPaths = []
 
+        # Modules whose import graphs should be lowered into the cache,
+        # instead of running the main script. Each module's top level is
+        # evaluated in the safe scope to find its dependencies, but no module
+        # is run.
+        self.precompile = []
+
         # Tags for the logger. Defaults to only the most serious logs.
         self.loggerTags = ["serious"]
 
@@ -92,6 +107,14 @@ class Configuration(object):
                 self.profile = True
             elif item == "-b":
                 self.benchmark = True
+            elif item == "-cache":
+                self.cachePath = stream.nextItem()
+            elif item == "-precompile":
+                self.precompile.append(stream.nextItem().decode("utf-8"))
+            elif item == "-passes":
+                self.compilerStatsPath = stream.nextItem()
+            elif item == "-engine":
+                self.engine = stream.nextItem()
             elif item == "--jit":
                 self.jit = stream.nextItem()
             else:
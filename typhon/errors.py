@@ -23,6 +23,18 @@ class Ejecting(Exception):
         self.value = value
 
 
+class LocalEjecting(Exception):
+    """
+    An elided ejector is currently being used.
+
+    The ejector's local index and value are carried by the evaluator which
+    raised this, so that a single prebuilt instance can be raised each time.
+    """
+
+
+theLocalEjecting = LocalEjecting()
+
+
 class LoadFailed(Exception):
     """
     An AST couldn't be loaded.
@@ -12,59 +12,255 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import os
+from collections import OrderedDict
+from time import time
+
 from rpython.rlib.jit import dont_look_inside
+from rpython.rlib.objectmodel import import_from_mixin
 from rpython.rlib.rpath import rjoin
+from rpython.rlib.rsha import RSHA
 
 from typhon import log
 from typhon.debug import debugPrint
 from typhon.errors import userError
-from typhon.load.nano import loadMASTBytes as nanoLoad
-from typhon.nano.interp import evalMonte
+from typhon.load.lowered import dumpLowered, loadLoweredBytes
+from typhon.load.nano import InvalidMAST, loadMASTStream, openMAST
+from typhon.lru import LRU
+from typhon.nano.interp import (evalLowered, layoutNames, loweringKey,
+                                lowerMonte)
+from typhon.objects.collections.lists import unwrapList
+from typhon.objects.data import unwrapStr
 from typhon.objects.root import Object
 
 
+class ModuleCacheEntry(object):
+
+    def __init__(self, module, mtime, size):
+        self.module = module
+        self.mtime = mtime
+        self.size = size
+
+
+def statFile(path):
+    """
+    The modification time and size of a file, or None if it's gone.
+    """
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime, st.st_size
+
+
 class ModuleCache(object):
     """
     A necessary evil.
+
+    Entries are checked against their file's modification time and size on
+    every hit, and the least recently used entries are evicted once there
+    are more than maxSize of them.
     """
 
+    import_from_mixin(LRU)
+
+    maxSize = 1024
+
+    hits = 0
+    misses = 0
+    invalidations = 0
+    loadTime = 0.0
+
     def __init__(self):
-        self.cache = {}
+        self.cache = OrderedDict()
+
+    def get(self, path):
+        entry = self.getRecent(path)
+        if entry is None:
+            self.misses += 1
+            return None
+        origin = entry.module.origin.encode("utf-8")
+        stat = statFile(origin)
+        if stat is None or stat != (entry.mtime, entry.size):
+            log.log(["import"], u"Module %s changed on disk" %
+                    entry.module.origin)
+            del self.cache[path]
+            self.invalidations += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry.module
+
+    def put(self, path, module, stat):
+        if stat is None:
+            return
+        mtime, size = stat
+        self.putRecent(path, ModuleCacheEntry(module, mtime, size))
+
+    def addLoadTime(self, elapsed):
+        self.loadTime += elapsed
+
+    def clear(self):
+        self.cache.clear()
 
 moduleCache = ModuleCache()
 
 
+class LoweredCache(object):
+    """
+    An on-disk cache of lowered modules.
+
+    Entries are keyed by the hash of the module's MAST and the layout of its
+    outer scope, so that unchanged modules can skip the nanopass pipeline
+    entirely. The cache is disabled until given a directory.
+    """
+
+    path = None
+
+    def enable(self, path):
+        self.path = path
+
+    def enabled(self):
+        return self.path is not None
+
+    def hashSource(self, source):
+        h = RSHA()
+        # Hash the source a chunk at a time, so that mapped modules aren't
+        # copied out whole.
+        start = source.index
+        while start < source.stop:
+            stop = min(start + 65536, source.stop)
+            h.update(source.sliceAt(start, stop))
+            start = stop
+        return h.digest()
+
+    def pathFor(self, key):
+        assert self.path is not None, "pathFor: Cache is disabled"
+        return rjoin(self.path, key + ".lowered")
+
+    def fetch(self, key):
+        if self.path is None:
+            return None
+        path = self.pathFor(key)
+        try:
+            with open(path, "rb") as handle:
+                lowered = loadLoweredBytes(handle.read())
+        except IOError:
+            return None
+        except InvalidMAST:
+            log.log(["import", "serious"],
+                    u"Ignoring damaged lowered module %s" %
+                    path.decode("utf-8"))
+            return None
+        debugPrint("Lowered cache hit:", path)
+        return lowered
+
+    def store(self, key, lowered):
+        if self.path is None:
+            return
+        try:
+            bs = dumpLowered(lowered)
+        except InvalidMAST:
+            # Something in the module can't be frozen; it'll be lowered
+            # afresh every time.
+            return
+        path = self.pathFor(key)
+        # Write aside and rename, so that concurrent processes never see a
+        # partial file.
+        temp = "%s.%d" % (path, os.getpid())
+        try:
+            with open(temp, "wb") as handle:
+                handle.write(bs)
+            os.rename(temp, path)
+        except (IOError, OSError):
+            log.log(["import", "serious"],
+                    u"Couldn't write lowered module %s" %
+                    path.decode("utf-8"))
+
+loweredCache = LoweredCache()
+
+
 def tryExtensions(filePath, recorder):
     # Leaving this in loop form in case we change formats again.
     for extension in [".mast"]:
         path = filePath + extension
         try:
-            with open(path, "rb") as handle:
-                debugPrint("Reading:", path)
-                source = handle.read()
-                mod = AstModule(recorder, path.decode('utf-8'))
-                mod.load(source)
-                return mod
+            debugPrint("Reading:", path)
+            source = openMAST(path)
+            mod = AstModule(recorder, path.decode('utf-8'))
+            mod.load(source, path)
+            return mod
         except IOError:
             continue
     return None
 
 
+def findTyphonFile(paths, pname):
+    for extension in [".ty", ".mast"]:
+        path = pname.encode("utf-8") + extension
+        for base in paths:
+            fullpath = os.path.join(base, path)
+            if os.path.exists(fullpath):
+                return fullpath
+    return None
+
+
+def precompileModules(libraryPaths, recorder, pnames, env):
+    """
+    Lower every module in the import graph rooted at each of pnames, the way
+    that loader.mt would load them, so that they land in the lowered cache.
+
+    Each module's top level is evaluated in env, in order to ask it for its
+    dependencies; the modules themselves are never run.
+
+    Returns the number of modules visited.
+    """
+
+    seen = {}
+    stack = pnames[:]
+    while stack:
+        pname = stack.pop()
+        # The loader provides these itself.
+        if pname in seen or pname == u"unittest" or pname == u"bench":
+            continue
+        seen[pname] = None
+        path = findTyphonFile(libraryPaths, pname)
+        if path is None:
+            raise userError(u"Unable to locate %s" % pname)
+        log.log(["import"], u"Precompiling %s" % pname)
+        # Named as the loader names its modules, so that the loader finds
+        # them in the cache.
+        module = AstModule(recorder, pname)
+        module.load(openMAST(path), path)
+        # Modules only say what they depend on once they've been evaluated.
+        # Evaluating runs the module's top level, in the safe scope; for a
+        # module from the expander, that only builds the module object, and
+        # its body waits for the loader to call run(), which we never do.
+        result = module.eval(env)[0]
+        for dep in unwrapList(result.call(u"dependencies", [])):
+            stack.append(unwrapStr(dep))
+    return len(seen)
+
+
 def obtainModule(libraryPaths, recorder, filePath):
     for libraryPath in libraryPaths:
         path = rjoin(libraryPath, filePath)
 
-        if path in moduleCache.cache:
+        code = moduleCache.get(path)
+        if code is not None:
             log.log(["import"], u"Importing %s (cached)" %
                     path.decode("utf-8"))
-            return moduleCache.cache[path]
+            return code
 
         log.log(["import"], u"Importing %s" % path.decode("utf-8"))
+        start = time()
         code = tryExtensions(path, recorder)
+        moduleCache.addLoadTime(time() - start)
         if code is None:
             continue
-        # Cache.
-        moduleCache.cache[path] = code
+        # Cache, remembering what the file looked like when it was read.
+        moduleCache.put(path, code, statFile(code.origin.encode("utf-8")))
         return code
     else:
         log.log(["import", "error"], u"Failed to import from %s" %
@@ -84,10 +280,73 @@ class Module(Object):
 
 
 class AstModule(Module):
-    def load(self, source):
+    path = None
+    sourceHash = None
+    lowered = None
+    loweredNames = None
+
+    def load(self, source, path=None):
+        """
+        Load a module from a MAST source, closing the source before returning.
+
+        With the lowered cache, a module read from the file at `path` only
+        keeps the hash of its source, and reads the file again if it turns
+        out to need decoding.
+        """
+
+        try:
+            if loweredCache.enabled() and path is not None:
+                self.sourceHash = loweredCache.hashSource(source)
+                self.path = path
+            else:
+                self.decodeFrom(source)
+        finally:
+            source.close()
+
+    def decodeFrom(self, source):
         with self.recorder.context("Deserialization"):
-            self.astSource = nanoLoad(source)
+            self.astSource = loadMASTStream(source)
+
+    def decode(self):
+        if self.astSource is None:
+            assert self.path is not None, "decode: Module was never loaded"
+            try:
+                source = openMAST(self.path)
+            except (IOError, OSError):
+                raise InvalidMAST("Couldn't read %s again" % self.path)
+            try:
+                # The lowered cache was consulted with the old hash.
+                if loweredCache.hashSource(source) != self.sourceHash:
+                    raise InvalidMAST("%s changed since it was read" %
+                                      self.path)
+                self.decodeFrom(source)
+            finally:
+                source.close()
+        return self.astSource
+
+    def lower(self, outerNames):
+        names = layoutNames(outerNames)
+        if self.lowered is not None and self.loweredNames == names:
+            return self.lowered
+        key = None
+        lowered = None
+        if self.sourceHash is not None:
+            key = loweringKey(self.sourceHash, outerNames, self.origin,
+                              False)
+            with self.recorder.context("Deserialization"):
+                lowered = loweredCache.fetch(key)
+        if lowered is None:
+            ast = self.decode()
+            with self.recorder.context("Compilation"):
+                lowered = lowerMonte(ast, outerNames, self.origin)
+            if key is not None:
+                loweredCache.store(key, lowered)
+                # The file can be read again if it's ever needed.
+                self.astSource = None
+        self.lowered = lowered
+        self.loweredNames = names
+        return lowered
 
     @dont_look_inside
     def eval(self, env):
-            return evalMonte(self.astSource, env, self.origin)
+        return evalLowered(self.lower(env.keys()), env, self.origin)
@@ -0,0 +1,503 @@
+"""
+Serialization of fully-lowered IR.
+
+The lowered IR is the output of t.n.interp.lowerMonte(); it depends on the
+names of the outer scope, but not on their values, and so it may be saved and
+reused by later processes.
+"""
+
+from collections import OrderedDict
+
+from typhon.atoms import getAtom
+from typhon.load.nano import (InvalidMAST, MASTSink, MASTStream,
+                              dumpMASTBytes, loadMASTBytes)
+from typhon.nano.mast import BuildKernelNodes
+from typhon.nano.scopes import (SCOPE_FRAME, SCOPE_LOCAL, SCOPE_OUTER,
+                                SEV_BINDING, SEV_NOUN, SEV_SLOT, ScopeFrame)
+from typhon.nano.structure import SplitAuditorsIR
+from typhon.objects.auditors import deepFrozenStamp
+from typhon.objects.user import AuditClipboard
+
+# Bump the version whenever the lowered IR changes shape; stale files will
+# then be rejected.
+MAGIC = "Mont\xe0LIR\x00"
+VERSION = 3
+
+scopes = [SCOPE_OUTER, SCOPE_FRAME, SCOPE_LOCAL]
+severities = [SEV_NOUN, SEV_SLOT, SEV_BINDING]
+
+# Stamps which can be discharged statically, and thus can appear on scripts.
+knownStamps = [deepFrozenStamp]
+
+
+class LoweredWriter(SplitAuditorsIR.makePassTo(None)):
+    """
+    Write lowered IR in prefix order; each expression and pattern is tagged
+    with a single byte.
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+
+    def putLayout(self, layout):
+        self.sink.putStr(layout.fqn)
+        self.sink.putInt(len(layout.frameNames))
+        frameNames = layout.frameNames
+        for name, (position, scope, idx, severity) in frameNames.items():
+            if scope is None or severity is None:
+                # Unresolved name; leave it for the compiler to complain
+                # about every time.
+                raise InvalidMAST("Can't serialize unresolved name")
+            self.sink.putStr(name)
+            self.sink.putInt(position)
+            self.sink.putInt(scope.asInt)
+            self.sink.putInt(idx)
+            self.sink.putInt(severity.asInt)
+        self.sink.putInt(len(layout.outerNames))
+        for name, (idx, severity) in layout.outerNames.items():
+            self.sink.putStr(name)
+            self.sink.putInt(idx)
+            self.sink.putInt(severity.asInt)
+        self.sink.putInt(1 if layout.frameTable.shareable else 0)
+
+    def putNoun(self, tag, name, index):
+        self.sink.putByte(tag)
+        self.sink.putStr(name)
+        self.sink.putInt(index)
+
+    def visitNullExpr(self):
+        self.sink.putByte("n")
+
+    def visitCharExpr(self, c):
+        self.sink.putByte("c")
+        self.sink.putStr(c)
+
+    def visitDoubleExpr(self, d):
+        self.sink.putByte("d")
+        self.sink.putDouble(d)
+
+    def visitIntExpr(self, i):
+        self.sink.putByte("i")
+        self.sink.putZigZag(i)
+
+    def visitStrExpr(self, s):
+        self.sink.putByte("s")
+        self.sink.putStr(s)
+
+    def visitCallExpr(self, obj, atom, args, namedArgs):
+        self.sink.putByte("C")
+        self.visitExpr(obj)
+        self.sink.putStr(atom.verb)
+        self.sink.putInt(len(args))
+        for arg in args:
+            self.visitExpr(arg)
+        self.sink.putInt(len(namedArgs))
+        for namedArg in namedArgs:
+            self.visitNamedArg(namedArg)
+
+    def visitDefExpr(self, patt, ex, rvalue):
+        self.sink.putByte("D")
+        self.visitPatt(patt)
+        self.visitExpr(ex)
+        self.visitExpr(rvalue)
+
+    def visitEscapeOnlyExpr(self, patt, body):
+        self.sink.putByte("e")
+        self.visitPatt(patt)
+        self.visitExpr(body)
+
+    def visitEscapeExpr(self, ejPatt, ejBody, catchPatt, catchBody):
+        self.sink.putByte("E")
+        self.visitPatt(ejPatt)
+        self.visitExpr(ejBody)
+        self.visitPatt(catchPatt)
+        self.visitExpr(catchBody)
+
+    def visitLocalEscapeOnlyExpr(self, name, index, body):
+        self.putNoun("x", name, index)
+        self.visitExpr(body)
+
+    def visitLocalEscapeExpr(self, name, index, body, catchPatt, catchBody):
+        self.putNoun("X", name, index)
+        self.visitExpr(body)
+        self.visitPatt(catchPatt)
+        self.visitExpr(catchBody)
+
+    def visitLocalEjectExpr(self, name, index, value):
+        self.putNoun("j", name, index)
+        self.visitExpr(value)
+
+    def visitFinallyExpr(self, body, atLast):
+        self.sink.putByte("F")
+        self.visitExpr(body)
+        self.visitExpr(atLast)
+
+    def visitIfExpr(self, test, cons, alt):
+        self.sink.putByte("I")
+        self.visitExpr(test)
+        self.visitExpr(cons)
+        self.visitExpr(alt)
+
+    def visitSeqExpr(self, exprs):
+        self.sink.putByte("S")
+        self.sink.putInt(len(exprs))
+        for expr in exprs:
+            self.visitExpr(expr)
+
+    def visitTryExpr(self, body, catchPatt, catchBody):
+        self.sink.putByte("Y")
+        self.visitExpr(body)
+        self.visitPatt(catchPatt)
+        self.visitExpr(catchBody)
+
+    def visitLocalExpr(self, name, index):
+        self.putNoun("l", name, index)
+
+    def visitFrameExpr(self, name, index):
+        self.putNoun("f", name, index)
+
+    def visitOuterExpr(self, name, index):
+        self.putNoun("o", name, index)
+
+    def visitClearObjectExpr(self, doc, patt, script, layout):
+        self.sink.putByte("K")
+        self.sink.putStr(doc)
+        self.visitPatt(patt)
+        self.visitScript(script)
+        self.putLayout(layout)
+
+    def visitObjectExpr(self, doc, patt, auditors, script, mast, layout,
+                        clipboard):
+        self.sink.putByte("O")
+        self.sink.putStr(doc)
+        self.visitPatt(patt)
+        self.sink.putInt(len(auditors))
+        for auditor in auditors:
+            self.visitExpr(auditor)
+        self.visitScript(script)
+        # The clipboard's kernel AST is rebuilt from the MAST when loading.
+        bs = dumpMASTBytes(mast)
+        self.sink.putInt(len(bs))
+        self.sink.putBytes(bs)
+        self.putLayout(layout)
+
+    def visitIgnorePatt(self, guard):
+        self.sink.putByte("I")
+        self.visitExpr(guard)
+
+    def visitBindingPatt(self, name, index):
+        self.putNoun("B", name, index)
+
+    def visitNounPatt(self, name, guard, index):
+        self.putNoun("N", name, index)
+        self.visitExpr(guard)
+
+    def visitFinalSlotPatt(self, name, guard, index):
+        self.putNoun("f", name, index)
+        self.visitExpr(guard)
+
+    def visitVarSlotPatt(self, name, guard, index):
+        self.putNoun("v", name, index)
+        self.visitExpr(guard)
+
+    def visitFinalBindingPatt(self, name, guard, index):
+        self.putNoun("F", name, index)
+        self.visitExpr(guard)
+
+    def visitVarBindingPatt(self, name, guard, index):
+        self.putNoun("V", name, index)
+        self.visitExpr(guard)
+
+    def visitListPatt(self, patts):
+        self.sink.putByte("L")
+        self.sink.putInt(len(patts))
+        for patt in patts:
+            self.visitPatt(patt)
+
+    def visitViaPatt(self, trans, patt):
+        self.sink.putByte("A")
+        self.visitExpr(trans)
+        self.visitPatt(patt)
+
+    def visitNamedArgExpr(self, key, value):
+        self.visitExpr(key)
+        self.visitExpr(value)
+
+    def visitNamedPattern(self, key, patt, default):
+        self.visitExpr(key)
+        self.visitPatt(patt)
+        self.visitExpr(default)
+
+    def visitMatcherExpr(self, patt, body, localSize):
+        self.visitPatt(patt)
+        self.visitExpr(body)
+        self.sink.putInt(localSize)
+
+    def visitMethodExpr(self, doc, atom, patts, namedPatts, guard, body,
+                        localSize):
+        self.sink.putStr(doc)
+        self.sink.putStr(atom.verb)
+        self.sink.putInt(len(patts))
+        for patt in patts:
+            self.visitPatt(patt)
+        self.sink.putInt(len(namedPatts))
+        for namedPatt in namedPatts:
+            self.visitNamedPatt(namedPatt)
+        self.visitExpr(guard)
+        self.visitExpr(body)
+        self.sink.putInt(localSize)
+
+    def visitScriptExpr(self, stamps, methods, matchers):
+        self.sink.putInt(len(stamps))
+        for stamp in stamps:
+            if stamp not in knownStamps:
+                raise InvalidMAST("Can't serialize unknown stamp")
+            self.sink.putInt(knownStamps.index(stamp))
+        self.sink.putInt(len(methods))
+        for method in methods:
+            self.visitMethod(method)
+        self.sink.putInt(len(matchers))
+        for matcher in matchers:
+            self.visitMatcher(matcher)
+
+
+class LoweredReader(object):
+    """
+    The inverse of LoweredWriter.
+    """
+
+    dest = SplitAuditorsIR
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def enumAt(self, enums):
+        i = self.stream.nextInt()
+        if not 0 <= i < len(enums):
+            raise InvalidMAST("Enum index %d is out of bounds" % i)
+        return enums[i]
+
+    def nextLayout(self):
+        fqn = self.stream.nextStr()
+        layout = ScopeFrame(None, fqn)
+        for _ in range(self.stream.nextInt()):
+            name = self.stream.nextStr()
+            position = self.stream.nextInt()
+            scope = self.enumAt(scopes)
+            idx = self.stream.nextInt()
+            severity = self.enumAt(severities)
+            layout.frameNames[name] = position, scope, idx, severity
+        for _ in range(self.stream.nextInt()):
+            name = self.stream.nextStr()
+            idx = self.stream.nextInt()
+            severity = self.enumAt(severities)
+            layout.outerNames[name] = idx, severity
+        layout.computeFrameTable()
+        layout.frameTable.shareable = self.stream.nextInt() != 0
+        return layout
+
+    def nextExprs(self):
+        return [self.nextExpr() for _ in range(self.stream.nextInt())]
+
+    def nextPatts(self):
+        return [self.nextPatt() for _ in range(self.stream.nextInt())]
+
+    def nextExpr(self):
+        tag = self.stream.nextByte()
+        if tag == "n":
+            return self.dest.NullExpr()
+        elif tag == "c":
+            return self.dest.CharExpr(self.stream.nextStr())
+        elif tag == "d":
+            return self.dest.DoubleExpr(self.stream.nextDouble())
+        elif tag == "i":
+            return self.dest.IntExpr(self.stream.nextZigZag())
+        elif tag == "s":
+            return self.dest.StrExpr(self.stream.nextStr())
+        elif tag == "C":
+            obj = self.nextExpr()
+            verb = self.stream.nextStr()
+            args = self.nextExprs()
+            namedArgs = [self.dest.NamedArgExpr(self.nextExpr(),
+                                                self.nextExpr())
+                         for _ in range(self.stream.nextInt())]
+            return self.dest.CallExpr(obj, getAtom(verb, len(args)), args,
+                                      namedArgs)
+        elif tag == "D":
+            patt = self.nextPatt()
+            ex = self.nextExpr()
+            return self.dest.DefExpr(patt, ex, self.nextExpr())
+        elif tag == "e":
+            patt = self.nextPatt()
+            return self.dest.EscapeOnlyExpr(patt, self.nextExpr())
+        elif tag == "E":
+            ejPatt = self.nextPatt()
+            ejBody = self.nextExpr()
+            catchPatt = self.nextPatt()
+            return self.dest.EscapeExpr(ejPatt, ejBody, catchPatt,
+                                        self.nextExpr())
+        elif tag == "x":
+            name = self.stream.nextStr()
+            index = self.stream.nextInt()
+            return self.dest.LocalEscapeOnlyExpr(name, index, self.nextExpr())
+        elif tag == "X":
+            name = self.stream.nextStr()
+            index = self.stream.nextInt()
+            body = self.nextExpr()
+            catchPatt = self.nextPatt()
+            return self.dest.LocalEscapeExpr(name, index, body, catchPatt,
+                                             self.nextExpr())
+        elif tag == "j":
+            name = self.stream.nextStr()
+            index = self.stream.nextInt()
+            return self.dest.LocalEjectExpr(name, index, self.nextExpr())
+        elif tag == "F":
+            body = self.nextExpr()
+            return self.dest.FinallyExpr(body, self.nextExpr())
+        elif tag == "I":
+            test = self.nextExpr()
+            cons = self.nextExpr()
+            return self.dest.IfExpr(test, cons, self.nextExpr())
+        elif tag == "S":
+            return self.dest.SeqExpr(self.nextExprs())
+        elif tag == "Y":
+            body = self.nextExpr()
+            catchPatt = self.nextPatt()
+            return self.dest.TryExpr(body, catchPatt, self.nextExpr())
+        elif tag == "l":
+            name = self.stream.nextStr()
+            return self.dest.LocalExpr(name, self.stream.nextInt())
+        elif tag == "f":
+            name = self.stream.nextStr()
+            return self.dest.FrameExpr(name, self.stream.nextInt())
+        elif tag == "o":
+            name = self.stream.nextStr()
+            return self.dest.OuterExpr(name, self.stream.nextInt())
+        elif tag == "K":
+            doc = self.stream.nextStr()
+            patt = self.nextPatt()
+            script = self.nextScript()
+            return self.dest.ClearObjectExpr(doc, patt, script,
+                                             self.nextLayout())
+        elif tag == "O":
+            doc = self.stream.nextStr()
+            patt = self.nextPatt()
+            auditors = self.nextExprs()
+            script = self.nextScript()
+            mast = loadMASTBytes(self.stream.nextBytes(self.stream.nextInt()))
+            layout = self.nextLayout()
+            clipboard = AuditClipboard(layout.fqn,
+                                       BuildKernelNodes().visitExpr(mast))
+            return self.dest.ObjectExpr(doc, patt, auditors, script, mast,
+                                        layout, clipboard)
+        else:
+            raise InvalidMAST("Didn't know lowered expr tag %s" % tag)
+
+    def nextPatt(self):
+        tag = self.stream.nextByte()
+        if tag == "I":
+            return self.dest.IgnorePatt(self.nextExpr())
+        elif tag == "L":
+            return self.dest.ListPatt(self.nextPatts())
+        elif tag == "A":
+            trans = self.nextExpr()
+            return self.dest.ViaPatt(trans, self.nextPatt())
+        name = self.stream.nextStr()
+        index = self.stream.nextInt()
+        if tag == "B":
+            return self.dest.BindingPatt(name, index)
+        elif tag == "N":
+            return self.dest.NounPatt(name, self.nextExpr(), index)
+        elif tag == "f":
+            return self.dest.FinalSlotPatt(name, self.nextExpr(), index)
+        elif tag == "v":
+            return self.dest.VarSlotPatt(name, self.nextExpr(), index)
+        elif tag == "F":
+            return self.dest.FinalBindingPatt(name, self.nextExpr(), index)
+        elif tag == "V":
+            return self.dest.VarBindingPatt(name, self.nextExpr(), index)
+        else:
+            raise InvalidMAST("Didn't know lowered pattern tag %s" % tag)
+
+    def nextMethod(self):
+        doc = self.stream.nextStr()
+        verb = self.stream.nextStr()
+        patts = self.nextPatts()
+        namedPatts = []
+        for _ in range(self.stream.nextInt()):
+            key = self.nextExpr()
+            patt = self.nextPatt()
+            namedPatts.append(self.dest.NamedPattern(key, patt,
+                                                     self.nextExpr()))
+        guard = self.nextExpr()
+        body = self.nextExpr()
+        return self.dest.MethodExpr(doc, getAtom(verb, len(patts)), patts,
+                                    namedPatts, guard, body,
+                                    self.stream.nextInt())
+
+    def nextMatcher(self):
+        patt = self.nextPatt()
+        body = self.nextExpr()
+        return self.dest.MatcherExpr(patt, body, self.stream.nextInt())
+
+    def nextScript(self):
+        stamps = [self.enumAt(knownStamps)
+                  for _ in range(self.stream.nextInt())]
+        methods = [self.nextMethod() for _ in range(self.stream.nextInt())]
+        matchers = [self.nextMatcher() for _ in range(self.stream.nextInt())]
+        return self.dest.ScriptExpr(stamps, methods, matchers)
+
+
+def dumpLowered(lowered):
+    """
+    Serialize a lowered program, as returned by t.n.interp.lowerMonte().
+    """
+
+    ast, outerNames, topLocalNames, localSize = lowered
+    sink = MASTSink()
+    sink.putBytes(MAGIC)
+    sink.putInt(VERSION)
+    sink.putInt(len(outerNames))
+    for name, (idx, severity) in outerNames.items():
+        sink.putStr(name)
+        sink.putInt(idx)
+        sink.putInt(severity.asInt)
+    sink.putInt(len(topLocalNames))
+    for name, severity in topLocalNames:
+        sink.putStr(name)
+        sink.putInt(severity.asInt)
+    sink.putInt(localSize)
+    LoweredWriter(sink).visitExpr(ast)
+    return sink.getvalue()
+
+
+def loadLoweredBytes(bs):
+    """
+    Deserialize a lowered program.
+
+    Raises InvalidMAST if the bytes are damaged or from another version.
+    """
+
+    if not bs.startswith(MAGIC):
+        raise InvalidMAST("Wrong magic bytes for lowered IR")
+    try:
+        stream = MASTStream(bs[len(MAGIC):])
+        if stream.nextInt() != VERSION:
+            raise InvalidMAST("Wrong version for lowered IR")
+        reader = LoweredReader(stream)
+        outerNames = OrderedDict()
+        for _ in range(stream.nextInt()):
+            name = stream.nextStr()
+            idx = stream.nextInt()
+            outerNames[name] = idx, reader.enumAt(severities)
+        topLocalNames = []
+        for _ in range(stream.nextInt()):
+            name = stream.nextStr()
+            topLocalNames.append((name, reader.enumAt(severities)))
+        localSize = stream.nextInt()
+        ast = reader.nextExpr()
+    except MemoryError:
+        raise InvalidMAST("Insufficient memory to decode lowered IR")
+    if not stream.exhausted():
+        raise InvalidMAST("Trailing garbage after lowered IR")
+    return ast, outerNames, topLocalNames, localSize
@@ -1,13 +1,33 @@
 """
-The MAST format, version zero, nanopass version.
+The MAST format, versions zero and one, nanopass version.
+
+Version zero is a flat stream of tags, each of which refers to previously
+decoded expressions and patterns by index.
+
+Version one wraps the same tags in a container:
+
+ * The magic bytes, followed by a section table: a count, and then, for each
+   section, a tag byte and the offset and length of the section, relative to
+   the end of the table.
+ * An "S" section, holding a pool of deduplicated strings. Everywhere that
+   version zero would write a string, version one writes its index in the
+   pool instead. Character literals are still written inline.
+ * A "T" section, holding the tag stream of the module.
 """
 
+from rpython.rlib.rarithmetic import LONG_BIT, intmask, r_ulonglong
 from rpython.rlib.rbigint import rbigint
-from rpython.rlib.rstruct.ieee import unpack_float
+from rpython.rlib.rmmap import (ACCESS_READ, RMMapError, RValueError,
+                                mmap)
+from rpython.rlib.rstring import StringBuilder, UnicodeBuilder
+from rpython.rlib.rstruct.ieee import float_pack, float_unpack
 from rpython.rlib.runicode import str_decode_utf_8
 
 from typhon.nano.mast import MastIR
 
+# The size of a machine word, in bytes.
+WORD = LONG_BIT // 8
+
 
 class InvalidMAST(Exception):
     """
@@ -16,48 +36,78 @@ class InvalidMAST(Exception):
 
 
 MAGIC = "Mont\xe0MAST\x00"
+MAGIC_V1 = "Mont\xe0MAST\x01"
 
 
 class MASTStream(object):
+    """
+    A window onto a buffer of MAST.
+
+    In MAST v1, strings are indices into a pool instead of being inline.
+    """
 
-    index = 0
+    pool = None
 
-    def __init__(self, bytes):
+    def __init__(self, bytes, start=0, stop=-1):
         self.bytes = bytes
+        self.index = start
+        self.stop = len(bytes) if stop < 0 else stop
+
+    def window(self, start, stop):
+        """
+        A fresh stream over part of the same buffer, sharing the string pool.
+        """
+
+        if start < 0 or stop > self.stop or start > stop:
+            raise InvalidMAST("Window is out of bounds")
+        rv = MASTStream(self.bytes, start, stop)
+        rv.pool = self.pool
+        return rv
 
     def exhausted(self):
-        return self.index >= len(self.bytes)
+        return self.index >= self.stop
+
+    def close(self):
+        """
+        Let go of the buffer. Windows onto it must not be read afterwards.
+        """
+
+    def byteAt(self, index):
+        return self.bytes[index]
+
+    def sliceAt(self, start, stop):
+        assert start >= 0, "Non-negative proof"
+        assert stop >= 0, "Non-negative proof"
+        return self.bytes[start:stop]
 
     def nextByte(self):
         if self.exhausted():
             raise InvalidMAST("nextByte: Buffer underrun while streaming")
-        rv = self.bytes[self.index]
+        rv = self.byteAt(self.index)
         self.index += 1
         return rv
 
     def nextBytes(self, count):
         assert count > 0, "nextBytes: Implementation error"
 
-        if self.exhausted():
-            raise InvalidMAST("nextBytes: Buffer underrun while streaming")
-
         start = self.index
-        assert start >= 0, "Non-negative proof"
-        stop = self.index + count
-        assert stop >= 0, "Non-negative proof"
+        stop = start + count
+        if stop > self.stop:
+            raise InvalidMAST("nextBytes: Buffer underrun while streaming")
 
-        rv = self.bytes[start:stop]
         self.index = stop
-        return rv
+        return self.sliceAt(start, stop)
 
     def nextDouble(self):
-        # Second parameter is the big-endian flag.
-        try:
-            return unpack_float(self.nextBytes(8), True)
-        except ValueError:
-            raise InvalidMAST("Couldn't decode invalid double")
+        # Big-endian; assembled in place rather than sliced out.
+        bits = r_ulonglong(0)
+        for _ in range(8):
+            bits = (bits << 8) | r_ulonglong(ord(self.nextByte()))
+        return float_unpack(bits, 8)
 
     def nextVarInt(self):
+        # Only integer literals may exceed a machine word; everything else
+        # should use nextInt().
         shift = 0
         bi = rbigint.fromint(0)
         cont = True
@@ -68,30 +118,258 @@ class MASTStream(object):
             cont = bool(b & 0x80)
         return bi
 
+    def nextZigZag(self):
+        # Read a varint and un-zz it.
+        bi = self.nextVarInt()
+        shifted = bi.rshift(1)
+        if bi.int_and_(1).toint():
+            shifted = shifted.int_xor(-1)
+        return shifted
+
     def nextInt(self):
-        try:
-            return self.nextVarInt().toint()
-        except OverflowError:
-            raise InvalidMAST("String length overflows integer bounds")
+        # Lengths and indices are always small, so decode them directly into
+        # a machine word instead of building a bigint.
+        shift = 0
+        rv = 0
+        while True:
+            b = ord(self.nextByte())
+            if shift > LONG_BIT - 9:
+                raise InvalidMAST("Varint overflows integer bounds")
+            rv |= (b & 0x7f) << shift
+            if not b & 0x80:
+                return rv
+            shift += 7
 
     def nextStr(self):
+        if self.pool is not None:
+            index = self.nextInt()
+            try:
+                return self.pool[index]
+            except IndexError:
+                raise InvalidMAST("String index %d is out of bounds" % index)
+        return self.nextInlineStr()
+
+    def nextInlineStr(self):
         size = self.nextInt()
         if size == 0:
             return u""
 
-        s = self.nextBytes(size)
+        start = self.index
+        stop = start + size
+        if stop > self.stop:
+            raise InvalidMAST("nextStr: Buffer underrun while streaming")
+        self.index = stop
+
+        # Most strings are ASCII; decode those without slicing them out.
+        ub = UnicodeBuilder(size)
+        i = start
+        while i < stop:
+            c = ord(self.byteAt(i))
+            if c >= 0x80:
+                break
+            ub.append(unichr(c))
+            i += 1
+        if i == stop:
+            return ub.build()
+
+        s = self.sliceAt(start, stop)
         try:
             return s.decode('utf-8')
         except UnicodeDecodeError:
             raise InvalidMAST("Couldn't decode string %s" % s)
 
 
+class MappedMASTStream(MASTStream):
+    """
+    A window onto a read-only memory mapping of MAST.
+    """
+
+    def __init__(self, mapping, start=0, stop=-1):
+        self.mapping = mapping
+        self.index = start
+        self.stop = mapping.size if stop < 0 else stop
+
+    def window(self, start, stop):
+        if start < 0 or stop > self.stop or start > stop:
+            raise InvalidMAST("Window is out of bounds")
+        rv = MappedMASTStream(self.mapping, start, stop)
+        rv.pool = self.pool
+        return rv
+
+    def close(self):
+        self.mapping.close()
+
+    def byteAt(self, index):
+        return self.mapping.getitem(index)
+
+    def sliceAt(self, start, stop):
+        return self.mapping.getslice(start, stop - start)
+
+
+class MASTSink(object):
+    """
+    The writing half of MASTStream.
+    """
+
+    def __init__(self):
+        self.sb = StringBuilder()
+
+    def getvalue(self):
+        return self.sb.build()
+
+    def size(self):
+        return self.sb.getlength()
+
+    def putByte(self, c):
+        self.sb.append(c)
+
+    def putBytes(self, bs):
+        self.sb.append(bs)
+
+    def putDouble(self, d):
+        # Big-endian, to match nextDouble().
+        bits = float_pack(d, 8)
+        for i in range(8):
+            self.sb.append(chr(intmask((bits >> ((7 - i) * 8)) & 0xff)))
+
+    def putInt(self, i):
+        assert i >= 0, "putInt: Negative varint"
+        while i > 0x7f:
+            self.sb.append(chr((i & 0x7f) | 0x80))
+            i >>= 7
+        self.sb.append(chr(i))
+
+    def putVarInt(self, bi):
+        assert bi.int_ge(0), "putVarInt: Negative varint"
+        while bi.int_gt(0x7f):
+            self.sb.append(chr(bi.int_and_(0x7f).toint() | 0x80))
+            bi = bi.rshift(7)
+        self.sb.append(chr(bi.toint()))
+
+    def putZigZag(self, bi):
+        if bi.int_ge(0):
+            self.putVarInt(bi.lshift(1))
+        else:
+            self.putVarInt(bi.int_xor(-1).lshift(1).int_or_(1))
+
+    def putStr(self, s):
+        bs = s.encode("utf-8")
+        self.putInt(len(bs))
+        self.putBytes(bs)
+
+
+class StringPool(object):
+    """
+    Deduplicated strings, in order of first appearance.
+    """
+
+    def __init__(self):
+        self.strings = []
+        self.indices = {}
+
+    def intern(self, s):
+        index = self.indices.get(s, -1)
+        if index == -1:
+            index = len(self.strings)
+            self.strings.append(s)
+            self.indices[s] = index
+        return index
+
+
+class PooledMASTSink(MASTSink):
+    """
+    The writing half of a MAST v1 stream, whose strings are pooled.
+    """
+
+    def __init__(self, pool):
+        MASTSink.__init__(self)
+        self.pool = pool
+
+    def putStr(self, s):
+        self.putInt(self.pool.intern(s))
+
+
+class LeafInterner(object):
+    """
+    Canonical copies of decoded strings, and of the nouns and literals which
+    are built from nothing else.
+
+    Version zero writes every string inline, so that each verb and name would
+    otherwise be decoded into its own copy. The bytes saved are estimated
+    from the sizes of the strings and nodes which were dropped.
+    """
+
+    hits = 0
+    saved = 0
+
+    nullExpr = None
+
+    def __init__(self):
+        self.strs = {}
+        self.nouns = {}
+        self.strExprs = {}
+        self.intExprs = {}
+
+    def drop(self, size):
+        self.hits += 1
+        self.saved += size
+
+    def internStr(self, s):
+        rv = self.strs.get(s, None)
+        if rv is None:
+            self.strs[s] = rv = s
+        else:
+            # A header and length, and then the characters.
+            self.drop(2 * WORD + 4 * len(s))
+        return rv
+
+    def null(self):
+        if self.nullExpr is None:
+            self.nullExpr = MastIR.NullExpr()
+        else:
+            self.drop(WORD)
+        return self.nullExpr
+
+    def noun(self, name):
+        rv = self.nouns.get(name, None)
+        if rv is None:
+            self.nouns[name] = rv = MastIR.NounExpr(name)
+        else:
+            self.drop(2 * WORD)
+        return rv
+
+    def strLiteral(self, s):
+        rv = self.strExprs.get(s, None)
+        if rv is None:
+            self.strExprs[s] = rv = MastIR.StrExpr(s)
+        else:
+            self.drop(2 * WORD)
+        return rv
+
+    def intLiteral(self, bi):
+        # Only machine-sized ints are common enough to be worth a table.
+        try:
+            i = bi.toint()
+        except OverflowError:
+            return MastIR.IntExpr(bi)
+        rv = self.intExprs.get(i, None)
+        if rv is None:
+            self.intExprs[i] = rv = MastIR.IntExpr(bi)
+        else:
+            # The node, and the bigint with its digits.
+            self.drop(6 * WORD)
+        return rv
+
+
 class MASTContext(object):
 
-    def __init__(self, noisy=False):
+    def __init__(self, noisy=False, interner=None):
         self.exprs = []
         self.patts = []
         self.noisy = noisy
+        # Strings and leaves are only interned when given an interner; see
+        # loadMASTStream().
+        self.interner = interner
 
     def __repr__(self):
         return "<Context(exprs=%r, patts=%r)>" % (self.exprs, self.patts)
@@ -108,6 +386,12 @@ class MASTContext(object):
         except IndexError:
             raise InvalidMAST("Pattern index %d is out of bounds" % index)
 
+    def nextStr(self, stream):
+        s = stream.nextStr()
+        if self.interner is not None:
+            s = self.interner.internStr(s)
+        return s
+
     def nextExpr(self, stream):
         expr = self.exprAt(stream.nextInt())
         if not isinstance(expr, MastIR.Expr):
@@ -122,7 +406,7 @@ class MASTContext(object):
         size = stream.nextInt()
         rv = [self.exprAt(stream.nextInt()) for _ in range(size)]
         for method in rv:
-            if not isinstance(method, MastIR.MethodExpr):
+            if not isinstance(method, MastIR.Method):
                 raise InvalidMAST("Expected method")
         return rv
 
@@ -180,19 +464,25 @@ class MASTContext(object):
                 # Double.
                 self.exprs.append(MastIR.DoubleExpr(stream.nextDouble()))
             elif literalTag == 'I':
-                # Int. Read a varint and un-zz it.
-                bi = stream.nextVarInt()
-                shifted = bi.rshift(1)
-                if bi.int_and_(1).toint():
-                    shifted = shifted.int_xor(-1)
-                self.exprs.append(MastIR.IntExpr(shifted))
+                # Int.
+                bi = stream.nextZigZag()
+                if self.interner is None:
+                    self.exprs.append(MastIR.IntExpr(bi))
+                else:
+                    self.exprs.append(self.interner.intLiteral(bi))
             elif literalTag == 'N':
                 # Null.
-                self.exprs.append(MastIR.NullExpr())
+                if self.interner is None:
+                    self.exprs.append(MastIR.NullExpr())
+                else:
+                    self.exprs.append(self.interner.null())
             elif literalTag == 'S':
                 # Str.
-                s = stream.nextStr()
-                self.exprs.append(MastIR.StrExpr(s))
+                s = self.nextStr(stream)
+                if self.interner is None:
+                    self.exprs.append(MastIR.StrExpr(s))
+                else:
+                    self.exprs.append(self.interner.strLiteral(s))
             else:
                 raise InvalidMAST("Didn't know literal tag %s" % literalTag)
         elif tag == 'P':
@@ -203,7 +493,7 @@ class MASTContext(object):
 
             if pattTag == 'F':
                 # Final.
-                name = stream.nextStr()
+                name = self.nextStr(stream)
                 guard = self.nextExpr(stream)
                 self.patts.append(MastIR.FinalPatt(name, guard))
             elif pattTag == 'I':
@@ -212,7 +502,7 @@ class MASTContext(object):
                 self.patts.append(MastIR.IgnorePatt(guard))
             elif pattTag == 'V':
                 # Var.
-                name = stream.nextStr()
+                name = self.nextStr(stream)
                 guard = self.nextExpr(stream)
                 self.patts.append(MastIR.VarPatt(name, guard))
             elif pattTag == 'L':
@@ -226,17 +516,20 @@ class MASTContext(object):
                 self.patts.append(MastIR.ViaPatt(expr, patt))
             elif pattTag == 'B':
                 # Binding.
-                name = stream.nextStr()
+                name = self.nextStr(stream)
                 self.patts.append(MastIR.BindingPatt(name))
             else:
                 raise InvalidMAST("Didn't know pattern tag %s" % pattTag)
         elif tag == 'N':
             # Noun.
-            s = stream.nextStr()
-            self.exprs.append(MastIR.NounExpr(s))
+            s = self.nextStr(stream)
+            if self.interner is None:
+                self.exprs.append(MastIR.NounExpr(s))
+            else:
+                self.exprs.append(self.interner.noun(s))
         elif tag == 'B':
             # Binding.
-            s = stream.nextStr()
+            s = self.nextStr(stream)
             self.exprs.append(MastIR.BindingExpr(s))
         elif tag == 'S':
             # Sequence.
@@ -245,7 +538,7 @@ class MASTContext(object):
         elif tag == 'C':
             # Call.
             target = self.nextExpr(stream)
-            verb = stream.nextStr()
+            verb = self.nextStr(stream)
             args = self.nextExprs(stream)
             namedArgs = self.nextNamedExprs(stream)
             self.exprs.append(MastIR.CallExpr(target, verb, args, namedArgs))
@@ -270,7 +563,7 @@ class MASTContext(object):
                                                 catchPatt, catchExpr))
         elif tag == 'O':
             # Object with no script, just direct methods and matchers.
-            doc = stream.nextStr()
+            doc = self.nextStr(stream)
             patt = self.nextPatt(stream)
             asExpr = self.nextExpr(stream)
             implements = self.nextExprs(stream)
@@ -281,8 +574,8 @@ class MASTContext(object):
                                                 methods, matchers))
         elif tag == 'M':
             # Method.
-            doc = stream.nextStr()
-            verb = stream.nextStr()
+            doc = self.nextStr(stream)
+            verb = self.nextStr(stream)
             patts = self.nextPatts(stream)
             namedPatts = [MastIR.NamedPattern(key, value, default)
                           for (key, value, default)
@@ -298,7 +591,7 @@ class MASTContext(object):
             self.exprs.append(MastIR.MatcherExpr(patt, block))
         elif tag == 'A':
             # Assign.
-            target = stream.nextStr()
+            target = self.nextStr(stream)
             expr = self.nextExpr(stream)
             self.exprs.append(MastIR.AssignExpr(target, expr))
         elif tag == 'F':
@@ -342,14 +635,354 @@ class MASTContext(object):
                 print "No expressions yet"
 
 
-def loadMASTBytes(bs, noisy=False):
-    if not bs.startswith(MAGIC):
-        raise InvalidMAST("Wrong magic bytes '%s'" % bs[:len(MAGIC)])
+class MASTWriter(MastIR.makePassTo(None)):
+    """
+    Serialize MAST back into the tag stream read by MASTContext.
+
+    Every visitor emits its children before itself and returns the index
+    which the decoder will assign to it, mirroring MASTContext's bookkeeping.
+    Subtrees which are shared by identity are only emitted once.
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.exprCount = 0
+        self.pattCount = 0
+        self.exprIndices = {}
+        self.pattIndices = {}
+
+    def visitExpr(self, expr):
+        index = self.exprIndices.get(expr, -1)
+        if index == -1:
+            index = self.super.visitExpr(self, expr)
+            self.exprIndices[expr] = index
+        return index
+
+    def visitPatt(self, patt):
+        index = self.pattIndices.get(patt, -1)
+        if index == -1:
+            index = self.super.visitPatt(self, patt)
+            self.pattIndices[patt] = index
+        return index
+
+    def expr(self):
+        rv = self.exprCount
+        self.exprCount += 1
+        return rv
+
+    def patt(self):
+        rv = self.pattCount
+        self.pattCount += 1
+        return rv
+
+    def putIndices(self, indices):
+        self.sink.putInt(len(indices))
+        for index in indices:
+            self.sink.putInt(index)
+
+    def visitNullExpr(self):
+        self.sink.putBytes("LN")
+        return self.expr()
+
+    def visitCharExpr(self, c):
+        self.sink.putBytes("LC")
+        self.sink.putBytes(c.encode("utf-8"))
+        return self.expr()
+
+    def visitDoubleExpr(self, d):
+        self.sink.putBytes("LD")
+        self.sink.putDouble(d)
+        return self.expr()
+
+    def visitIntExpr(self, i):
+        self.sink.putBytes("LI")
+        self.sink.putZigZag(i)
+        return self.expr()
+
+    def visitStrExpr(self, s):
+        self.sink.putBytes("LS")
+        self.sink.putStr(s)
+        return self.expr()
+
+    def visitAssignExpr(self, name, rvalue):
+        rvalue = self.visitExpr(rvalue)
+        self.sink.putByte("A")
+        self.sink.putStr(name)
+        self.sink.putInt(rvalue)
+        return self.expr()
+
+    def visitBindingExpr(self, name):
+        self.sink.putByte("B")
+        self.sink.putStr(name)
+        return self.expr()
+
+    def visitCallExpr(self, obj, verb, args, namedArgs):
+        obj = self.visitExpr(obj)
+        args = [self.visitExpr(arg) for arg in args]
+        namedArgs = [(self.visitExpr(na.key), self.visitExpr(na.value))
+                     for na in namedArgs]
+        self.sink.putByte("C")
+        self.sink.putInt(obj)
+        self.sink.putStr(verb)
+        self.putIndices(args)
+        self.sink.putInt(len(namedArgs))
+        for key, value in namedArgs:
+            self.sink.putInt(key)
+            self.sink.putInt(value)
+        return self.expr()
+
+    def visitDefExpr(self, patt, ex, rvalue):
+        patt = self.visitPatt(patt)
+        ex = self.visitExpr(ex)
+        rvalue = self.visitExpr(rvalue)
+        self.sink.putByte("D")
+        self.sink.putInt(patt)
+        self.sink.putInt(ex)
+        self.sink.putInt(rvalue)
+        return self.expr()
+
+    def visitEscapeOnlyExpr(self, patt, body):
+        patt = self.visitPatt(patt)
+        body = self.visitExpr(body)
+        self.sink.putByte("e")
+        self.sink.putInt(patt)
+        self.sink.putInt(body)
+        return self.expr()
+
+    def visitEscapeExpr(self, ejPatt, ejBody, catchPatt, catchBody):
+        ejPatt = self.visitPatt(ejPatt)
+        ejBody = self.visitExpr(ejBody)
+        catchPatt = self.visitPatt(catchPatt)
+        catchBody = self.visitExpr(catchBody)
+        self.sink.putByte("E")
+        self.sink.putInt(ejPatt)
+        self.sink.putInt(ejBody)
+        self.sink.putInt(catchPatt)
+        self.sink.putInt(catchBody)
+        return self.expr()
+
+    def visitFinallyExpr(self, body, atLast):
+        body = self.visitExpr(body)
+        atLast = self.visitExpr(atLast)
+        self.sink.putByte("F")
+        self.sink.putInt(body)
+        self.sink.putInt(atLast)
+        return self.expr()
+
+    def visitHideExpr(self, body):
+        body = self.visitExpr(body)
+        self.sink.putByte("H")
+        self.sink.putInt(body)
+        return self.expr()
+
+    def visitIfExpr(self, test, cons, alt):
+        test = self.visitExpr(test)
+        cons = self.visitExpr(cons)
+        alt = self.visitExpr(alt)
+        self.sink.putByte("I")
+        self.sink.putInt(test)
+        self.sink.putInt(cons)
+        self.sink.putInt(alt)
+        return self.expr()
+
+    def visitMetaContextExpr(self):
+        self.sink.putByte("X")
+        return self.expr()
+
+    def visitMetaStateExpr(self):
+        self.sink.putByte("T")
+        return self.expr()
+
+    def visitNounExpr(self, name):
+        self.sink.putByte("N")
+        self.sink.putStr(name)
+        return self.expr()
+
+    def visitObjectExpr(self, doc, patt, auditors, methods, matchers):
+        assert auditors, "MASTWriter: Object without as-auditor"
+        patt = self.visitPatt(patt)
+        auditors = [self.visitExpr(auditor) for auditor in auditors]
+        methods = [self.visitMethod(method) for method in methods]
+        matchers = [self.visitMatcher(matcher) for matcher in matchers]
+        self.sink.putByte("O")
+        self.sink.putStr(doc)
+        self.sink.putInt(patt)
+        self.sink.putInt(auditors[0])
+        self.putIndices(auditors[1:])
+        self.putIndices(methods)
+        self.putIndices(matchers)
+        return self.expr()
+
+    def visitSeqExpr(self, exprs):
+        exprs = [self.visitExpr(expr) for expr in exprs]
+        self.sink.putByte("S")
+        self.putIndices(exprs)
+        return self.expr()
+
+    def visitTryExpr(self, body, catchPatt, catchBody):
+        body = self.visitExpr(body)
+        catchPatt = self.visitPatt(catchPatt)
+        catchBody = self.visitExpr(catchBody)
+        self.sink.putByte("Y")
+        self.sink.putInt(body)
+        self.sink.putInt(catchPatt)
+        self.sink.putInt(catchBody)
+        return self.expr()
+
+    def visitIgnorePatt(self, guard):
+        guard = self.visitExpr(guard)
+        self.sink.putBytes("PI")
+        self.sink.putInt(guard)
+        return self.patt()
+
+    def visitBindingPatt(self, name):
+        self.sink.putBytes("PB")
+        self.sink.putStr(name)
+        return self.patt()
+
+    def visitFinalPatt(self, name, guard):
+        guard = self.visitExpr(guard)
+        self.sink.putBytes("PF")
+        self.sink.putStr(name)
+        self.sink.putInt(guard)
+        return self.patt()
+
+    def visitVarPatt(self, name, guard):
+        guard = self.visitExpr(guard)
+        self.sink.putBytes("PV")
+        self.sink.putStr(name)
+        self.sink.putInt(guard)
+        return self.patt()
+
+    def visitListPatt(self, patts):
+        patts = [self.visitPatt(patt) for patt in patts]
+        self.sink.putBytes("PL")
+        self.putIndices(patts)
+        return self.patt()
+
+    def visitViaPatt(self, trans, patt):
+        trans = self.visitExpr(trans)
+        patt = self.visitPatt(patt)
+        self.sink.putBytes("PA")
+        self.sink.putInt(trans)
+        self.sink.putInt(patt)
+        return self.patt()
+
+    def visitMatcherExpr(self, patt, body):
+        patt = self.visitPatt(patt)
+        body = self.visitExpr(body)
+        self.sink.putByte("R")
+        self.sink.putInt(patt)
+        self.sink.putInt(body)
+        return self.expr()
+
+    def visitMethodExpr(self, doc, verb, patts, namedPatts, guard, body):
+        patts = [self.visitPatt(patt) for patt in patts]
+        namedPatts = [(self.visitExpr(np.key), self.visitPatt(np.patt),
+                       self.visitExpr(np.default)) for np in namedPatts]
+        guard = self.visitExpr(guard)
+        body = self.visitExpr(body)
+        self.sink.putByte("M")
+        self.sink.putStr(doc)
+        self.sink.putStr(verb)
+        self.putIndices(patts)
+        self.sink.putInt(len(namedPatts))
+        for key, value, default in namedPatts:
+            self.sink.putInt(key)
+            self.sink.putInt(value)
+            self.sink.putInt(default)
+        self.sink.putInt(guard)
+        self.sink.putInt(body)
+        return self.expr()
+
+
+def dumpMASTBytes(expr):
+    """
+    Serialize a MAST expression, including the magic bytes.
+    """
+
+    sink = MASTSink()
+    sink.putBytes(MAGIC)
+    MASTWriter(sink).visitExpr(expr)
+    return sink.getvalue()
+
+
+def dumpMASTv1Bytes(expr):
+    """
+    Serialize a MAST expression into a MAST v1 container.
+    """
+
+    pool = StringPool()
+    tags = PooledMASTSink(pool)
+    MASTWriter(tags).visitExpr(expr)
+    strings = MASTSink()
+    strings.putInt(len(pool.strings))
+    for s in pool.strings:
+        strings.putStr(s)
+
+    sections = [("S", strings.getvalue()), ("T", tags.getvalue())]
+    sink = MASTSink()
+    sink.putBytes(MAGIC_V1)
+    sink.putInt(len(sections))
+    offset = 0
+    for tag, section in sections:
+        sink.putByte(tag)
+        sink.putInt(offset)
+        sink.putInt(len(section))
+        offset += len(section)
+    for _, section in sections:
+        sink.putBytes(section)
+    return sink.getvalue()
+
+
+def sectionAt(stream, base, table, tag):
+    if tag not in table:
+        raise InvalidMAST("Missing section %s" % tag)
+    offset, size = table[tag]
+    return stream.window(base + offset, base + offset + size)
+
+
+def loadMASTv1(stream, noisy=False):
+    # Unknown sections are skipped, so that they can be added later.
+    table = {}
+    for _ in range(stream.nextInt()):
+        tag = stream.nextByte()
+        offset = stream.nextInt()
+        table[tag] = offset, stream.nextInt()
+    base = stream.index
+
+    strings = sectionAt(stream, base, table, "S")
+    pool = [strings.nextInlineStr() for _ in range(strings.nextInt())]
+    tags = sectionAt(stream, base, table, "T")
+    tags.pool = pool
+    # Strings are already pooled, and nodes are shared as they were written.
+    context = MASTContext(noisy)
+    while not tags.exhausted():
+        context.decodeNextTag(tags)
+    return context
+
+
+def hasMagic(stream, magic):
+    stop = stream.index + len(magic)
+    return stop <= stream.stop and stream.sliceAt(stream.index, stop) == magic
+
+
+def loadMASTStream(stream, noisy=False):
     try:
-        stream = MASTStream(bs[len(MAGIC):])
-        context = MASTContext(noisy)
-        while not stream.exhausted():
-            context.decodeNextTag(stream)
+        if hasMagic(stream, MAGIC_V1):
+            stream.index += len(MAGIC_V1)
+            context = loadMASTv1(stream, noisy)
+        elif hasMagic(stream, MAGIC):
+            stream.index += len(MAGIC)
+            # Nodes are shared as they were written, but strings are inline.
+            context = MASTContext(noisy, LeafInterner())
+            while not stream.exhausted():
+                context.decodeNextTag(stream)
+        else:
+            start = stream.index
+            stop = min(start + len(MAGIC), stream.stop)
+            raise InvalidMAST("Wrong magic bytes '%s'" %
+                              stream.sliceAt(start, stop))
     except MemoryError:
         raise InvalidMAST("Insufficient memory to decode MAST")
 
@@ -359,10 +992,51 @@ def loadMASTBytes(bs, noisy=False):
         raise InvalidMAST("No expressions in MAST")
 
 
+def loadMASTBytes(bs, noisy=False):
+    return loadMASTStream(MASTStream(bs), noisy)
+
+
+class MappingSettings(object):
+
+    enabled = True
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+
+mappingSettings = MappingSettings()
+
+
+def openMAST(path):
+    """
+    Open a MAST file for streaming.
+
+    The file is mapped read-only, so that decoding reads straight from the
+    page cache; files which can't be mapped, like empty files, are read
+    instead. Callers must close the stream once they've decoded it, and
+    open the file again if they need its contents later.
+    """
+
+    with open(path, "rb") as handle:
+        if not mappingSettings.enabled:
+            return MASTStream(handle.read())
+        try:
+            mapping = mmap(handle.fileno(), 0, access=ACCESS_READ)
+        except (RMMapError, RValueError, OSError):
+            return MASTStream(handle.read())
+        return MappedMASTStream(mapping)
+
+
 def loadMASTHandle(handle, noisy=False):
     return loadMASTBytes(handle.read(), noisy)
 
 
 def loadMAST(path, noisy=False):
-    with open(path, "rb") as handle:
-        return loadMASTHandle(handle, noisy)
+    stream = openMAST(path)
+    try:
+        return loadMASTStream(stream, noisy)
+    finally:
+        stream.close()
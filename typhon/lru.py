@@ -0,0 +1,40 @@
+"""
+Least-recently-used eviction for in-memory caches.
+"""
+
+
+class LRU(object):
+    """
+    Keep the entries of `self.cache`, an OrderedDict, in order of use, and
+    evict the least recently used once there are more than `maxSize`.
+
+    Mix in with `import_from_mixin()`, so that each cache keeps its own types.
+    """
+
+    evictions = 0
+
+    def getRecent(self, key):
+        """
+        Fetch an entry, or None, marking it as the most recently used.
+        """
+
+        value = self.cache.get(key, None)
+        if value is not None:
+            del self.cache[key]
+            self.cache[key] = value
+        return value
+
+    def putRecent(self, key, value):
+        """
+        Add an entry as the most recently used, evicting as needed.
+        """
+
+        self.cache[key] = value
+        while len(self.cache) > self.maxSize:
+            oldest = None
+            for k in self.cache:
+                oldest = k
+                break
+            assert oldest is not None, "putRecent: Cache is empty"
+            del self.cache[oldest]
+            self.evictions += 1
@@ -76,3 +76,79 @@ class Recorder(object):
 _recorder = Recorder()
 def globalRecorder():
     return _recorder
+
+
+class CompilerStats(object):
+    """
+    The time taken by each compiler pass, and the number of nodes that it
+    produced, for each module compiled.
+
+    Disabled until enabled, since counting nodes isn't free.
+    """
+
+    enabled = False
+
+    def __init__(self):
+        self.records = []
+
+    def enable(self):
+        self.enabled = True
+
+    def record(self, fqn, name, elapsed, nodes):
+        self.records.append((fqn, name, elapsed, nodes))
+
+    def dump(self, path):
+        """
+        Write the records as tab-separated values, one pass per line.
+        """
+
+        with open(path, "wb") as handle:
+            handle.write("fqn\tpass\tseconds\tnodes\n")
+            for fqn, name, elapsed, nodes in self.records:
+                handle.write("%s\t%s\t%f\t%d\n" % (fqn.encode("utf-8"),
+                                                     name, elapsed, nodes))
+
+
+compilerStats = CompilerStats()
+
+
+class CallSiteStats(object):
+    """
+    The inline cache at each call site, for reporting how polymorphic the
+    sites were.
+
+    Disabled until enabled, since remembering every site isn't free.
+    """
+
+    enabled = False
+
+    def __init__(self):
+        self.sites = []
+
+    def enable(self):
+        self.enabled = True
+
+    def register(self, label, site):
+        self.sites.append((label, site))
+
+    def printResults(self):
+        if not self.enabled:
+            return
+        mono = poly = mega = 0
+        for _, site in self.sites:
+            if site.megamorphic:
+                mega += 1
+            elif len(site.scripts) > 1:
+                poly += 1
+            elif site.scripts:
+                mono += 1
+        debug_print("Call sites:", len(self.sites), "monomorphic:", mono,
+                    "polymorphic:", poly, "megamorphic:", mega)
+        for label, site in self.sites:
+            if site.megamorphic:
+                debug_print("~", label, site.atom.repr, "hits:", site.hits,
+                            "misses:", site.misses, "megamorphic:",
+                            site.megamorphic)
+
+
+callSiteStats = CallSiteStats()
@@ -4,14 +4,14 @@
 Static discharge of auditors.
 """
 
-from typhon.nano.scopes import BoundNounsIR
+from typhon.nano.escapes import ElidedEscapesIR
 from typhon.objects.auditors import deepFrozenStamp
 
 def dischargeAuditors(ast):
     ast = DischargeDF().visitExpr(ast)
     return ast
 
-DeepFrozenIR = BoundNounsIR.extend("DeepFrozen",
+DeepFrozenIR = ElidedEscapesIR.extend("DeepFrozen",
     ["Object"],
     {
         "Expr": {
@@ -67,7 +67,7 @@ deepFrozenSubsetGuards = {
 # NB: The only live exprs possible here are already DF, so we don't need to
 # audit them. Revisit this if/when necessary. ~ C.
 
-class DischargeDF(BoundNounsIR.makePassTo(DeepFrozenIR)):
+class DischargeDF(ElidedEscapesIR.makePassTo(DeepFrozenIR)):
 
     def __init__(self):
         self.frameStack = [{}]
@@ -159,10 +159,33 @@ class DischargeDF(BoundNounsIR.makePassTo(DeepFrozenIR)):
                     return False
         return True
 
+    def sharesFrame(self, patt, layout):
+        """
+        Whether every object built from this expression, within the same
+        enclosing object, would get the same frame.
+
+        Each captured name must be final and DeepFrozen, and must come from
+        the enclosing object's frame rather than from a local.
+        """
+
+        frameTable = layout.frameTable
+        for idx in frameTable.copyPlan:
+            if idx >= 0:
+                return False
+        # An object's own binding is put into its frame after it's built.
+        if not isinstance(patt, self.dest.IgnorePatt):
+            if patt.name in layout.frameNames:
+                return False
+        for frameName in layout.frameNames.keys():
+            if not self.searchFrames(frameName):
+                return False
+        return True
+
     def visitObjectExpr(self, doc, patt, auditors, methods, matchers, mast,
                         layout):
         patt = self.visitPatt(patt)
         auditors = [self.visitExpr(auditor) for auditor in auditors]
+        layout.frameTable.shareable = self.sharesFrame(patt, layout)
 
         # Search for DeepFrozen. Only outer names can refer to the true
         # DeepFrozen.
@@ -0,0 +1,331 @@
+"""
+A bytecode compiler and register machine for method and matcher bodies.
+
+The AST evaluator remains the reference implementation. Bodies compiled to
+bytecode keep their locals in the same list as the evaluator, with temporary
+registers after the locals, so that any expression which the compiler
+doesn't handle itself can be handed to the evaluator in place.
+"""
+
+from rpython.rlib.jit import JitDriver, unroll_safe
+
+from typhon.objects.collections.maps import ConstMap, EMPTY_MAP, monteMap
+from typhon.objects.constants import NullObject, unwrapBool
+
+
+# Each instruction is an opcode followed by its operands. Operands are
+# register numbers, indices into one of the code's tables, or jump targets.
+CONST = 0        # dst const
+MOVE = 1         # dst src
+FRAME = 2        # dst index
+CALL = 3         # dst rcvr site first count
+CALL_NAMED = 4   # dst rcvr site first count namedFirst namedCount
+JUMP = 5         # target
+JUMP_FALSE = 6   # test target
+ASSIGN = 7       # index guard value
+BIND = 8         # patt value ej
+EVAL = 9         # dst expr
+RETURN = 10      # src
+
+opNames = ["CONST", "MOVE", "FRAME", "CALL", "CALL_NAMED", "JUMP",
+           "JUMP_FALSE", "ASSIGN", "BIND", "EVAL", "RETURN"]
+opWidths = [3, 3, 3, 6, 8, 2, 3, 4, 4, 3, 2]
+
+
+class EngineSettings(object):
+    """
+    Which engine runs the bodies of methods and matchers.
+    """
+
+    _immutable_fields_ = "bytecode?",
+
+    bytecode = False
+
+    def useAST(self):
+        self.bytecode = False
+
+    def useBytecode(self):
+        self.bytecode = True
+
+
+engineSettings = EngineSettings()
+
+
+class Code(object):
+    """
+    A compiled body.
+    """
+
+    _immutable_ = True
+    _immutable_fields_ = ("ops[*]", "consts[*]", "sites[*]", "exprs[*]",
+                          "patts[*]")
+
+    def __init__(self, name, ops, consts, sites, exprs, patts, localSize,
+                 registers):
+        self.name = name
+        self.ops = ops
+        self.consts = consts
+        self.sites = sites
+        self.exprs = exprs
+        self.patts = patts
+        self.localSize = localSize
+        self.registers = registers
+
+    def disassemble(self):
+        lines = []
+        pc = 0
+        while pc < len(self.ops):
+            op = self.ops[pc]
+            width = opWidths[op]
+            operands = " ".join([str(i) for i in self.ops[pc + 1:pc + width]])
+            lines.append("%d %s %s" % (pc, opNames[op], operands))
+            pc += width
+        return lines
+
+
+class BytecodeCompiler(object):
+    """
+    Compile one body to bytecode.
+
+    Mix into a class with the final IR as `src`; the compiler only knows
+    the IR through it.
+
+    Calls, conditionals, sequences, simple definitions and assignments, and
+    reads of locals, frames, and constants are compiled. Everything else is
+    left to the evaluator.
+    """
+
+    def __init__(self, name, localSize):
+        self.name = name
+        self.localSize = localSize
+        self.ops = []
+        self.consts = []
+        self.sites = []
+        self.exprs = []
+        self.patts = []
+        self.next = localSize
+        self.registers = localSize
+
+    def compileBody(self, body):
+        dst = self.alloc(1)
+        self.compileExpr(body, dst)
+        self.ops += [RETURN, dst]
+        return Code(self.name, self.ops[:], self.consts[:], self.sites[:],
+                    self.exprs[:], self.patts[:], self.localSize,
+                    self.registers)
+
+    def alloc(self, count):
+        rv = self.next
+        self.next += count
+        if self.next > self.registers:
+            self.registers = self.next
+        return rv
+
+    def addConst(self, obj):
+        self.consts.append(obj)
+        return len(self.consts) - 1
+
+    def addSite(self, site):
+        self.sites.append(site)
+        return len(self.sites) - 1
+
+    def label(self):
+        return len(self.ops)
+
+    def patch(self, at, target):
+        self.ops[at] = target
+
+    def compileExpr(self, expr, dst):
+        # Temporaries are released as soon as the expression is done.
+        mark = self.next
+        self.compileInto(expr, dst)
+        self.next = mark
+
+    def compileInto(self, expr, dst):
+        ir = self.src
+        if isinstance(expr, ir.NullExpr):
+            self.ops += [CONST, dst, self.addConst(NullObject)]
+        elif isinstance(expr, ir.LiveExpr):
+            self.ops += [CONST, dst, self.addConst(expr.obj)]
+        elif isinstance(expr, ir.LocalExpr):
+            self.ops += [MOVE, dst, expr.index]
+        elif isinstance(expr, ir.FrameExpr):
+            self.ops += [FRAME, dst, expr.index]
+        elif isinstance(expr, ir.CallExpr):
+            self.compileCall(expr, dst)
+        elif isinstance(expr, ir.SeqExpr):
+            if not expr.exprs:
+                self.ops += [CONST, dst, self.addConst(NullObject)]
+            for e in expr.exprs:
+                self.compileExpr(e, dst)
+        elif isinstance(expr, ir.IfExpr):
+            test = self.alloc(1)
+            self.compileExpr(expr.test, test)
+            self.ops += [JUMP_FALSE, test, -1]
+            toAlt = self.label() - 1
+            self.compileExpr(expr.cons, dst)
+            self.ops += [JUMP, -1]
+            toEnd = self.label() - 1
+            self.patch(toAlt, self.label())
+            self.compileExpr(expr.alt, dst)
+            self.patch(toEnd, self.label())
+        elif isinstance(expr, ir.DefExpr):
+            self.compileDef(expr, dst)
+        elif isinstance(expr, ir.LocalAssignExpr):
+            self.compileExpr(expr.value, dst)
+            if isinstance(expr.guard, ir.NullExpr):
+                self.ops += [MOVE, expr.index, dst]
+            else:
+                guard = self.alloc(1)
+                self.compileExpr(expr.guard, guard)
+                self.ops += [ASSIGN, expr.index, guard, dst]
+            self.ops += [CONST, dst, self.addConst(NullObject)]
+        else:
+            self.exprs.append(expr)
+            self.ops += [EVAL, dst, len(self.exprs) - 1]
+
+    def compileCall(self, expr, dst):
+        rcvr = self.alloc(1)
+        self.compileExpr(expr.obj, rcvr)
+        first = self.alloc(len(expr.args))
+        for i, arg in enumerate(expr.args):
+            self.compileExpr(arg, first + i)
+        site = self.addSite(expr.site)
+        if not expr.namedArgs:
+            self.ops += [CALL, dst, rcvr, site, first, len(expr.args)]
+            return
+        namedFirst = self.alloc(len(expr.namedArgs) * 2)
+        for i, na in enumerate(expr.namedArgs):
+            # Literal keys are already known to the site.
+            if expr.site.keys is None:
+                self.compileExpr(na.key, namedFirst + i * 2)
+            self.compileExpr(na.value, namedFirst + i * 2 + 1)
+        self.ops += [CALL_NAMED, dst, rcvr, site, first, len(expr.args),
+                     namedFirst, len(expr.namedArgs)]
+
+    def compileDef(self, expr, dst):
+        ir = self.src
+        patt = expr.patt
+        if (isinstance(expr.ex, ir.NullExpr) and
+                isinstance(patt, ir.NounPatt) and
+                isinstance(patt.guard, ir.NullExpr)):
+            self.compileExpr(expr.rvalue, dst)
+            self.ops += [MOVE, patt.index, dst]
+            return
+        ex = self.alloc(1)
+        self.compileExpr(expr.ex, ex)
+        self.compileExpr(expr.rvalue, dst)
+        self.patts.append(patt)
+        self.ops += [BIND, len(self.patts) - 1, dst, ex]
+
+
+def getLocation(pc, code):
+    return "%s:%d:%s" % (code.name, pc, opNames[code.ops[pc]])
+
+
+bytecodeDriver = JitDriver(greens=["pc", "code"],
+                           reds=["regs", "evaluator"],
+                           get_printable_location=getLocation,
+                           is_recursive=True)
+
+
+# The argument counts are green. ~ C.
+@unroll_safe
+def gatherArgs(code, regs, pc):
+    first = code.ops[pc + 4]
+    return [regs[first + i] for i in range(code.ops[pc + 5])]
+
+
+@unroll_safe
+def gatherNamedArgs(code, regs, pc):
+    first = code.ops[pc + 6]
+    d = monteMap()
+    for i in range(code.ops[pc + 7]):
+        d[regs[first + i * 2]] = regs[first + i * 2 + 1]
+    return ConstMap(d)
+
+
+@unroll_safe
+def gatherNamedVals(code, regs, pc):
+    first = code.ops[pc + 6]
+    return [regs[first + i * 2 + 1] for i in range(code.ops[pc + 7])]
+
+
+def runCode(code, evaluator):
+    """
+    Run compiled code, with the evaluator's locals as registers.
+
+    The evaluator must have room for all of the code's registers.
+    """
+
+    regs = evaluator.locals
+    pc = 0
+    while True:
+        bytecodeDriver.jit_merge_point(pc=pc, code=code, regs=regs,
+                                       evaluator=evaluator)
+        op = code.ops[pc]
+        if op == CONST:
+            regs[code.ops[pc + 1]] = code.consts[code.ops[pc + 2]]
+            pc += 3
+        elif op == MOVE:
+            regs[code.ops[pc + 1]] = regs[code.ops[pc + 2]]
+            pc += 3
+        elif op == FRAME:
+            regs[code.ops[pc + 1]] = evaluator.frame[code.ops[pc + 2]]
+            pc += 3
+        elif op == CALL:
+            rcvr = regs[code.ops[pc + 2]]
+            site = code.sites[code.ops[pc + 3]]
+            args = gatherArgs(code, regs, pc)
+            regs[code.ops[pc + 1]] = site.call(rcvr, args, EMPTY_MAP)
+            pc += 6
+        elif op == CALL_NAMED:
+            rcvr = regs[code.ops[pc + 2]]
+            site = code.sites[code.ops[pc + 3]]
+            args = gatherArgs(code, regs, pc)
+            if site.keys is None:
+                namedArgs = gatherNamedArgs(code, regs, pc)
+                regs[code.ops[pc + 1]] = site.call(rcvr, args, namedArgs)
+            else:
+                namedVals = gatherNamedVals(code, regs, pc)
+                regs[code.ops[pc + 1]] = site.callNamed(rcvr, args,
+                                                        namedVals)
+            pc += 8
+        elif op == JUMP:
+            pc = code.ops[pc + 1]
+        elif op == JUMP_FALSE:
+            if unwrapBool(regs[code.ops[pc + 1]]):
+                pc += 3
+            else:
+                pc = code.ops[pc + 2]
+        elif op == ASSIGN:
+            guard = regs[code.ops[pc + 2]]
+            value = regs[code.ops[pc + 3]]
+            regs[code.ops[pc + 1]] = evaluator.runGuard(guard, value, None)
+            pc += 4
+        elif op == BIND:
+            patt = code.patts[code.ops[pc + 1]]
+            evaluator.matchBind(patt, regs[code.ops[pc + 2]],
+                                regs[code.ops[pc + 3]])
+            pc += 4
+        elif op == EVAL:
+            expr = code.exprs[code.ops[pc + 2]]
+            regs[code.ops[pc + 1]] = evaluator.visitExpr(expr)
+            pc += 3
+        elif op == RETURN:
+            return regs[code.ops[pc + 1]]
+        else:
+            assert False, "unknown opcode"
+
+
+class LazyCode(object):
+    """
+    The compiled code for one method or matcher body.
+
+    Each method and matcher carries its own, which is filled in when the body
+    is first run by the bytecode engine and never changes afterwards.
+    """
+
+    _immutable_fields_ = "code?",
+
+    code = None
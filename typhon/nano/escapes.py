@@ -6,8 +6,24 @@ from typhon.nano.scopes import SCOPE_LOCAL, BoundNounsIR
 
 def elideEscapes(ast):
     ast = ElideMethodReturn().visitExpr(ast)
+    ast = ElideEjectors().visitExpr(ast)
     return ast
 
+ElidedEscapesIR = BoundNounsIR.extend("ElidedEscapes",
+    [],
+    {
+        "Expr": {
+            "LocalEscapeOnlyExpr": [("name", "Noun"), ("index", None),
+                                    ("body", "Expr")],
+            "LocalEscapeExpr": [("name", "Noun"), ("index", None),
+                                ("body", "Expr"), ("catchPatt", "Patt"),
+                                ("catchBody", "Expr")],
+            "LocalEjectExpr": [("name", "Noun"), ("index", None),
+                               ("value", "Expr")],
+        }
+    }
+)
+
 class FindUsage(BoundNounsIR.selfPass()):
 
     found = False
@@ -30,17 +46,206 @@ class FindUsage(BoundNounsIR.selfPass()):
         return self.dest.ObjectExpr(doc, patt, auditors, methods, matchers,
                                     mast, layout)
 
-class ElideMethodReturn(BoundNounsIR.selfPass()):
+def pattIndex(patt):
+    if isinstance(patt, BoundNounsIR.NounPatt):
+        return patt.index
+    elif isinstance(patt, BoundNounsIR.FinalSlotPatt):
+        return patt.index
+    elif isinstance(patt, BoundNounsIR.FinalBindingPatt):
+        return patt.index
+    else:
+        return -1
+
+def pattGets(patt):
+    """
+    The number of .get/0 calls which read the noun bound by a pattern: none
+    for nouns, one for slots, and two for bindings.
+    """
+
+    if isinstance(patt, BoundNounsIR.FinalSlotPatt):
+        return 1
+    elif isinstance(patt, BoundNounsIR.FinalBindingPatt):
+        return 2
+    else:
+        return 0
 
-    def pattIndex(self, patt):
-        if isinstance(patt, self.dest.NounPatt):
-            return patt.index
-        elif isinstance(patt, self.dest.FinalSlotPatt):
-            return patt.index
-        elif isinstance(patt, self.dest.FinalBindingPatt):
-            return patt.index
+def unwrappingGets(expr, gets):
+    """
+    Strip exactly `gets` .get/0 calls from a noun, or return None if they
+    aren't there.
+    """
+
+    for _ in range(gets):
+        if (isinstance(expr, BoundNounsIR.CallExpr) and
+                expr.verb == u"get" and
+                len(expr.args) == len(expr.namedArgs) == 0):
+            expr = expr.obj
         else:
+            return None
+    return expr
+
+def ejectedLocal(obj, verb, args, namedArgs, gets):
+    """
+    If a call directly invokes a local ejector, read with `gets` .get/0
+    calls, return that local.
+
+    Otherwise, return None.
+    """
+
+    if verb == u"run" and len(args) <= 1 and len(namedArgs) == 0:
+        obj = unwrappingGets(obj, gets)
+        if isinstance(obj, BoundNounsIR.LocalExpr):
+            return obj
+    return None
+
+class CountEjects(BoundNounsIR.selfPass()):
+    """
+    Count the uses of a local ejector, and how many of them directly invoke
+    it.
+
+    Methods of nested objects have their own locals and are skipped; the
+    ejector escapes into a nested object only via its frame.
+    """
+
+    captured = False
+    uses = 0
+    ejects = 0
+
+    def __init__(self, index, gets):
+        self.index = index
+        self.gets = gets
+
+    def visitCallExpr(self, obj, verb, args, namedArgs):
+        local = ejectedLocal(obj, verb, args, namedArgs, self.gets)
+        if local is not None and local.index == self.index:
+            self.uses += 1
+            self.ejects += 1
+            for arg in args:
+                self.visitExpr(arg)
+            return self.dest.CallExpr(obj, verb, args, namedArgs)
+        return self.super.visitCallExpr(self, obj, verb, args, namedArgs)
+
+    def visitLocalExpr(self, name, index):
+        if index == self.index:
+            self.uses += 1
+        return self.dest.LocalExpr(name, index)
+
+    def visitObjectExpr(self, doc, patt, auditors, methods, matchers, mast,
+                        layout):
+        frameNames = layout.frameNames
+        for name, (position, scope, index, severity) in frameNames.items():
+            if scope is SCOPE_LOCAL and index == self.index:
+                self.captured = True
+        self.visitPatt(patt)
+        for auditor in auditors:
+            self.visitExpr(auditor)
+        return self.dest.ObjectExpr(doc, patt, auditors, methods, matchers,
+                                    mast, layout)
+
+class ElideEjectors(BoundNounsIR.makePassTo(ElidedEscapesIR)):
+    """
+    Turn escapes whose ejectors are only ever invoked directly, and never
+    stored, passed, or closed over, into local control flow.
+
+    Such an ejector can only be invoked while its escape is running, within
+    the same method, so no Ejector needs to be allocated. An ejector which is
+    never used at all is removed along with its escape.
+    """
+
+    def __init__(self):
+        # The indices of the ejectors which have been elided, innermost last,
+        # with the number of .get/0 calls which read each of them.
+        self.labels = []
+
+    def ejectorName(self, patt):
+        """
+        The name of an unguarded final ejector pattern, or None.
+        """
+
+        if isinstance(patt, self.src.NounPatt):
+            guard = patt.guard
+            name = patt.name
+        elif isinstance(patt, self.src.FinalSlotPatt):
+            guard = patt.guard
+            name = patt.name
+        elif isinstance(patt, self.src.FinalBindingPatt):
+            guard = patt.guard
+            name = patt.name
+        else:
+            return None
+        if isinstance(guard, self.src.NullExpr):
+            return name
+        return None
+
+    def countEjects(self, patt, body):
+        """
+        Count the direct invocations of the ejector bound by `patt`, or
+        return -1 if it cannot be elided.
+        """
+
+        if self.ejectorName(patt) is None:
+            return -1
+        counter = CountEjects(pattIndex(patt), pattGets(patt))
+        counter.visitExpr(body)
+        if counter.captured or counter.uses != counter.ejects:
             return -1
+        return counter.ejects
+
+    def visitEscapeOnlyExpr(self, patt, body):
+        ejects = self.countEjects(patt, body)
+        if ejects == 0:
+            return self.visitExpr(body)
+        elif ejects > 0:
+            index = pattIndex(patt)
+            self.labels.append((index, pattGets(patt)))
+            body = self.visitExpr(body)
+            self.labels.pop()
+            return self.dest.LocalEscapeOnlyExpr(self.ejectorName(patt),
+                                                 index, body)
+        return self.super.visitEscapeOnlyExpr(self, patt, body)
+
+    def visitEscapeExpr(self, ejPatt, ejBody, catchPatt, catchBody):
+        ejects = self.countEjects(ejPatt, ejBody)
+        if ejects == 0:
+            return self.visitExpr(ejBody)
+        elif ejects > 0:
+            index = pattIndex(ejPatt)
+            self.labels.append((index, pattGets(ejPatt)))
+            ejBody = self.visitExpr(ejBody)
+            self.labels.pop()
+            return self.dest.LocalEscapeExpr(self.ejectorName(ejPatt), index,
+                                             ejBody,
+                                             self.visitPatt(catchPatt),
+                                             self.visitExpr(catchBody))
+        return self.super.visitEscapeExpr(self, ejPatt, ejBody, catchPatt,
+                                          catchBody)
+
+    def visitCallExpr(self, obj, verb, args, namedArgs):
+        for index, gets in self.labels:
+            local = ejectedLocal(obj, verb, args, namedArgs, gets)
+            if local is not None and local.index == index:
+                if args:
+                    value = self.visitExpr(args[0])
+                else:
+                    value = self.dest.NullExpr()
+                return self.dest.LocalEjectExpr(local.name, local.index,
+                                                value)
+        return self.super.visitCallExpr(self, obj, verb, args, namedArgs)
+
+    def visitObjectExpr(self, doc, patt, auditors, methods, matchers, mast,
+                        layout):
+        patt = self.visitPatt(patt)
+        auditors = [self.visitExpr(auditor) for auditor in auditors]
+        # Methods have their own locals; no labels are visible inside.
+        labels = self.labels
+        self.labels = []
+        methods = [self.visitMethod(method) for method in methods]
+        matchers = [self.visitMatcher(matcher) for matcher in matchers]
+        self.labels = labels
+        return self.dest.ObjectExpr(doc, patt, auditors, methods, matchers,
+                                    mast, layout)
+
+class ElideMethodReturn(BoundNounsIR.selfPass()):
 
     # XXX common code with t.n.auditors
     def unwrappingGet(self, expr):
@@ -55,7 +260,7 @@ class ElideMethodReturn(BoundNounsIR.selfPass()):
         patt = self.visitPatt(patt)
         body = self.visitExpr(body)
 
-        index = self.pattIndex(patt)
+        index = pattIndex(patt)
         if index == -1:
             # Nope, weird pattern.
             return self.dest.EscapeOnlyExpr(patt, body)
@@ -0,0 +1,255 @@
+"""
+Hoisting of frame reads out of method bodies.
+
+A captured name which is stored as a slot or binding is read from the frame
+with one or two calls to .get/0 on every use. When the frame only ever holds
+final slots or bindings for that name, the unwrapped value can't change, and
+a method body which reads it more than once can unwrap it once, up front,
+into a local.
+"""
+
+from typhon.atoms import getAtom
+from typhon.nano.mix import MixIR
+from typhon.nano.scopes import SCOPE_FRAME, SCOPE_LOCAL, SEV_BINDING, SEV_SLOT
+
+GET_0 = getAtom(u"get", 0)
+
+def hoistFrameReads(ast):
+    finder = FindFinalStorage()
+    finder.visitExpr(ast)
+    ast = HoistFrameReads(finder.finalLocals()).visitExpr(ast)
+    return ast
+
+def frameRead(obj, atom, namedArgs, severities):
+    """
+    If obj.atom(), with the given named args, reads the value of a slot or
+    binding in the frame, return the index of its frame entry.
+
+    Otherwise, return -1.
+    """
+
+    if atom is not GET_0 or namedArgs:
+        return -1
+    if isinstance(obj, MixIR.FrameExpr):
+        if severities[obj.index] is SEV_SLOT:
+            return obj.index
+    elif (isinstance(obj, MixIR.CallExpr) and obj.atom is GET_0 and
+          not obj.namedArgs):
+        frame = obj.obj
+        if (isinstance(frame, MixIR.FrameExpr) and
+                severities[frame.index] is SEV_BINDING):
+            return frame.index
+    return -1
+
+class FindFinalStorage(MixIR.selfPass()):
+    """
+    Find the locals of a single method which only ever hold final slots or
+    bindings, and count the reads of frame values.
+
+    Scripts have their own locals, and are not searched.
+    """
+
+    def __init__(self):
+        # Reads are only counted once this is set to the frame's severities.
+        self.severities = None
+        self.final = {}
+        self.other = {}
+        self.reads = {}
+
+    def finalLocals(self):
+        rv = {}
+        for index in self.final:
+            if index not in self.other:
+                rv[index] = None
+        return rv
+
+    def visitCallExpr(self, obj, atom, args, namedArgs):
+        if self.severities is not None:
+            index = frameRead(obj, atom, namedArgs, self.severities)
+            if index != -1:
+                self.reads[index] = self.reads.get(index, 0) + 1
+                return self.dest.CallExpr(obj, atom, args, namedArgs)
+        return self.super.visitCallExpr(self, obj, atom, args, namedArgs)
+
+    def visitFinalSlotPatt(self, name, guard, index):
+        self.final[index] = None
+        return self.super.visitFinalSlotPatt(self, name, guard, index)
+
+    def visitFinalBindingPatt(self, name, guard, index):
+        self.final[index] = None
+        return self.super.visitFinalBindingPatt(self, name, guard, index)
+
+    def visitProvenFinalSlotPatt(self, name, guard, index):
+        self.final[index] = None
+        return self.super.visitProvenFinalSlotPatt(self, name, guard, index)
+
+    def visitProvenFinalBindingPatt(self, name, guard, index):
+        self.final[index] = None
+        return self.super.visitProvenFinalBindingPatt(self, name, guard,
+                                                      index)
+
+    def visitNounPatt(self, name, guard, index):
+        self.other[index] = None
+        return self.super.visitNounPatt(self, name, guard, index)
+
+    def visitBindingPatt(self, name, index):
+        self.other[index] = None
+        return self.super.visitBindingPatt(self, name, index)
+
+    def visitVarSlotPatt(self, name, guard, index):
+        self.other[index] = None
+        return self.super.visitVarSlotPatt(self, name, guard, index)
+
+    def visitVarBindingPatt(self, name, guard, index):
+        self.other[index] = None
+        return self.super.visitVarBindingPatt(self, name, guard, index)
+
+    def visitLocalAssignExpr(self, name, guard, index, value):
+        self.other[index] = None
+        return self.super.visitLocalAssignExpr(self, name, guard, index,
+                                               value)
+
+    def visitLocalEscapeOnlyExpr(self, name, index, body):
+        self.other[index] = None
+        return self.super.visitLocalEscapeOnlyExpr(self, name, index, body)
+
+    def visitLocalEscapeExpr(self, name, index, body, catchPatt, catchBody):
+        self.other[index] = None
+        return self.super.visitLocalEscapeExpr(self, name, index, body,
+                                               catchPatt, catchBody)
+
+    def visitObjectExpr(self, doc, patt, guards, auditors, script, mast,
+                        layout, clipboard):
+        patt = self.visitPatt(patt)
+        auditors = [self.visitExpr(auditor) for auditor in auditors]
+        return self.dest.ObjectExpr(doc, patt, guards, auditors, script, mast,
+                                    layout, clipboard)
+
+    def visitClearObjectExpr(self, doc, patt, script, layout):
+        patt = self.visitPatt(patt)
+        return self.dest.ClearObjectExpr(doc, patt, script, layout)
+
+class HoistFrameReads(MixIR.selfPass()):
+    """
+    Unwrap final frame slots and bindings which a method body reads more
+    than once into locals at the top of the body.
+
+    Only the body is rewritten; patterns and the return guard run before the
+    hoisted reads and keep reading the frame.
+    """
+
+    def __init__(self, finalLocals):
+        # The locals of the current method which hold final storage.
+        self.finalLocals = finalLocals
+        # Whether each entry of the current frame holds final storage, and
+        # its name and severity.
+        self.finalFrame = []
+        self.names = []
+        self.severities = []
+        # Frame indices hoisted into the current body, and their locals.
+        self.hoisted = {}
+
+    def visitCallExpr(self, obj, atom, args, namedArgs):
+        index = frameRead(obj, atom, namedArgs, self.severities)
+        if index in self.hoisted:
+            local = self.hoisted[index]
+            return self.dest.LocalExpr(local.name, local.index)
+        return self.super.visitCallExpr(self, obj, atom, args, namedArgs)
+
+    def enterFrame(self, layout):
+        finalFrame = []
+        for (_, scope, index, _) in layout.frameTable.frameInfo:
+            if scope is SCOPE_LOCAL:
+                finalFrame.append(index in self.finalLocals)
+            elif scope is SCOPE_FRAME:
+                finalFrame.append(self.finalFrame[index])
+            else:
+                finalFrame.append(False)
+        rv = (self.finalFrame, self.names, self.severities, self.finalLocals,
+              self.hoisted)
+        self.finalFrame = finalFrame
+        self.names = [name for (name, _, _, _) in
+                      layout.frameTable.frameInfo]
+        self.severities = [severity for (_, _, _, severity) in
+                           layout.frameTable.frameInfo]
+        return rv
+
+    def leaveFrame(self, saved):
+        (self.finalFrame, self.names, self.severities, self.finalLocals,
+         self.hoisted) = saved
+
+    def visitObjectExpr(self, doc, patt, guards, auditors, script, mast,
+                        layout, clipboard):
+        patt = self.visitPatt(patt)
+        auditors = [self.visitExpr(auditor) for auditor in auditors]
+        saved = self.enterFrame(layout)
+        script = self.visitScript(script)
+        self.leaveFrame(saved)
+        return self.dest.ObjectExpr(doc, patt, guards, auditors, script, mast,
+                                    layout, clipboard)
+
+    def visitClearObjectExpr(self, doc, patt, script, layout):
+        patt = self.visitPatt(patt)
+        saved = self.enterFrame(layout)
+        script = self.visitScript(script)
+        self.leaveFrame(saved)
+        return self.dest.ClearObjectExpr(doc, patt, script, layout)
+
+    def hoist(self, finder, body, localSize):
+        """
+        Hoist the frame reads counted by `finder` out of `body`.
+
+        Returns the new body and local size.
+        """
+
+        defs = []
+        for index, count in finder.reads.items():
+            if count < 2 or not self.finalFrame[index]:
+                continue
+            name = self.names[index]
+            local = self.dest.LocalExpr(name, localSize)
+            frame = self.dest.FrameExpr(name, index)
+            read = self.dest.CallExpr(frame, GET_0, [], [])
+            if self.severities[index] is SEV_BINDING:
+                read = self.dest.CallExpr(read, GET_0, [], [])
+            defs.append(self.dest.DefExpr(
+                self.dest.NounPatt(name, self.dest.NullExpr(), localSize),
+                self.dest.NullExpr(), read))
+            self.hoisted[index] = local
+            localSize += 1
+        body = self.visitExpr(body)
+        if defs:
+            body = self.dest.SeqExpr(defs + [body])
+        return body, localSize
+
+    def visitMethodExpr(self, doc, atom, patts, namedPatts, guard, body,
+                        localSize):
+        finder = FindFinalStorage()
+        for patt in patts:
+            finder.visitPatt(patt)
+        for namedPatt in namedPatts:
+            finder.visitNamedPatt(namedPatt)
+        finder.visitExpr(guard)
+        finder.severities = self.severities
+        finder.visitExpr(body)
+        # Patterns and guards are visited before anything is hoisted.
+        self.finalLocals = finder.finalLocals()
+        self.hoisted = {}
+        patts = [self.visitPatt(patt) for patt in patts]
+        namedPatts = [self.visitNamedPatt(namedPatt) for namedPatt in
+                      namedPatts]
+        guard = self.visitExpr(guard)
+        body, localSize = self.hoist(finder, body, localSize)
+        return self.dest.MethodExpr(doc, atom, patts, namedPatts, guard, body,
+                                    localSize)
+
+    def visitMatcherExpr(self, patt, body, localSize):
+        finder = FindFinalStorage()
+        finder.visitPatt(patt)
+        finder.severities = self.severities
+        finder.visitExpr(body)
+        self.finalLocals = finder.finalLocals()
+        self.hoisted = {}
+        patt = self.visitPatt(patt)
+        body, localSize = self.hoist(finder, body, localSize)
+        return self.dest.MatcherExpr(patt, body, localSize)
@@ -2,34 +2,53 @@
 A simple AST interpreter.
 """
 
+from collections import OrderedDict
+from time import time
+
 from rpython.rlib import rvmprof
-from rpython.rlib.jit import jit_debug, promote, unroll_safe, we_are_jitted
-from rpython.rlib.objectmodel import import_from_mixin
+from rpython.rlib.jit import (elidable, jit_debug, promote, unroll_safe,
+                              we_are_jitted)
+from rpython.rlib.objectmodel import import_from_mixin, specialize
+from rpython.rlib.rsha import RSHA
 
 from typhon.atoms import getAtom
-from typhon.errors import Ejecting, UserException, userError
-from typhon.nano.auditors import dischargeAuditors
-from typhon.nano.escapes import elideEscapes
-from typhon.nano.mast import saveScripts
+from typhon.errors import (Ejecting, LocalEjecting, UserException,
+                           theLocalEjecting, userError)
+from typhon.load.nano import loadMASTBytes
+from typhon.lru import LRU
+from typhon.metrics import callSiteStats, compilerStats
+from typhon.nano.auditors import DeepFrozenIR, dischargeAuditors
+from typhon.nano.bytecode import (BytecodeCompiler, LazyCode, engineSettings,
+                                  runCode)
+from typhon.nano.escapes import ElidedEscapesIR, elideEscapes
+from typhon.nano.hoist import hoistFrameReads
+from typhon.nano.mast import SaveScriptIR, saveScripts
 from typhon.nano.mix import MixIR, mix
 from typhon.nano.scopes import (SCOPE_FRAME, SCOPE_LOCAL,
-                                SEV_BINDING, SEV_NOUN, SEV_SLOT, layoutScopes,
-                                bindNouns)
-from typhon.nano.slots import recoverSlots
-from typhon.nano.structure import refactorStructure
+                                SEV_BINDING, SEV_NOUN, SEV_SLOT, BoundNounsIR,
+                                LayoutIR, layoutScopes, bindNouns)
+from typhon.nano.slots import NoAssignIR, recoverSlots
+from typhon.nano.structure import SplitAuditorsIR, refactorStructure
+from typhon.nano.unbox import unboxVars
+from typhon.objects.auditors import (deepFrozenGuard, deepFrozenStamp,
+                                     selfless, transparentStamp)
 from typhon.objects.constants import NullObject
+from typhon.objects.collections.helpers import asSet
 from typhon.objects.collections.lists import unwrapList
 from typhon.objects.collections.maps import (ConstMap, EMPTY_MAP, monteMap,
                                              unwrapMap)
-from typhon.objects.constants import unwrapBool
+from typhon.objects.constants import TrueObject, unwrapBool
 from typhon.objects.data import StrObject, unwrapStr
 from typhon.objects.ejectors import Ejector, theThrower, throw
 from typhon.objects.exceptions import sealException
-from typhon.objects.guards import FinalSlotGuard, VarSlotGuard, anyGuard
+from typhon.objects.guards import (BoolGuard, BytesGuard, CharGuard,
+                                   DoubleGuard, FinalSlotGuard, Guard,
+                                   IntGuard, StrGuard, VarSlotGuard,
+                                   VoidGuard, anyGuard)
 from typhon.objects.root import Object
 from typhon.objects.slots import (Binding, FinalSlot, VarSlot, finalBinding,
                                   varBinding)
-from typhon.objects.user import UserObjectHelper
+from typhon.objects.user import AuditorReport, UserObjectHelper
 from typhon.profile import profileTyphon
 
 RUN_2 = getAtom(u"run", 2)
@@ -48,19 +67,57 @@ MIRANDA_ARGS = mkMirandaArgs()
 ProfileNameIR = MixIR.extend("ProfileName",
     ["ProfileName"],
     {
+        "Expr": {
+            "CallExpr": [("obj", "Expr"), ("atom", None), ("args", "Expr*"),
+                         ("namedArgs", "NamedArg*"), ("site", None)],
+        },
+        "Script": {
+            "ScriptExpr": [("stamps", "Object*"), ("methods", "Method*"),
+                           ("matchers", "Matcher*"), ("methodTable", None)],
+        },
         "Method": {
             "MethodExpr": [("profileName", "ProfileName"), ("doc", None),
                            ("atom", None), ("patts", "Patt*"),
                            ("namedPatts", "NamedPatt*"), ("guard", "Expr"),
-                           ("body", "Expr"), ("localSize", None)],
+                           ("body", "Expr"), ("localSize", None),
+                           ("code", None)],
         },
         "Matcher": {
             "MatcherExpr": [("profileName", "ProfileName"), ("patt", "Patt"),
-                            ("body", "Expr"), ("localSize", None)],
+                            ("body", "Expr"), ("localSize", None),
+                            ("code", None)],
         },
     }
 )
 
+class MethodTable(object):
+    """
+    The methods of a script, by atom, and the report for its stamps.
+
+    Built once per script, when the script is made ready for evaluation.
+    """
+
+    _immutable_ = True
+
+    def __init__(self, methods, stamps):
+        # Objects which aren't audited still carry their script's stamps.
+        if stamps:
+            self.report = AuditorReport(asSet(stamps))
+        else:
+            self.report = None
+        self.methods = {}
+        self.atoms = {}
+        for method in methods:
+            # The first method for an atom wins, as with a linear search.
+            if method.atom not in self.methods:
+                self.methods[method.atom] = method
+                self.atoms[method.atom] = method.doc
+
+    @elidable
+    def lookup(self, atom):
+        return self.methods.get(atom, None)
+
+
 # super() doesn't work in RPython, so this is a way to get at the default
 # implementations of the pass methods. ~ C.
 _MakeProfileNames = MixIR.makePassTo(ProfileNameIR)
@@ -76,6 +133,18 @@ class MakeProfileNames(_MakeProfileNames):
         # NB: self.objectNames cannot be empty unless we somehow obtain a
         # method/matcher without a body. ~ C.
         self.objectNames = []
+        # The profile name of the current method or matcher, for labelling
+        # call sites.
+        self.profileName = "mt:<top>"
+
+    def visitCallExpr(self, obj, atom, args, namedArgs):
+        obj = self.visitExpr(obj)
+        args = [self.visitExpr(arg) for arg in args]
+        namedArgs = [self.visitNamedArg(namedArg) for namedArg in namedArgs]
+        site = CallSite(atom, literalKeys(namedArgs))
+        if callSiteStats.enabled:
+            callSiteStats.register(self.profileName, site)
+        return self.dest.CallExpr(obj, atom, args, namedArgs, site)
 
     def visitClearObjectExpr(self, doc, patt, script, layout):
         # Push, do the recursion, pop.
@@ -105,6 +174,12 @@ class MakeProfileNames(_MakeProfileNames):
         self.objectNames.pop()
         return rv
 
+    def visitScriptExpr(self, stamps, methods, matchers):
+        methods = [self.visitMethod(method) for method in methods]
+        matchers = [self.visitMatcher(matcher) for matcher in matchers]
+        return self.dest.ScriptExpr(stamps, methods, matchers,
+                                    MethodTable(methods, stamps))
+
     def makeProfileName(self, inner):
         name, fqn = self.objectNames[-1]
         return "mt:%s.%s:1:%s" % (name, inner, fqn)
@@ -114,21 +189,28 @@ class MakeProfileNames(_MakeProfileNames):
         # NB: `atom.repr` is tempting but wrong. ~ C.
         description = "%s/%d" % (atom.verb.encode("utf-8"), atom.arity)
         profileName = self.makeProfileName(description)
+        outerName = self.profileName
+        self.profileName = profileName
         patts = [self.visitPatt(patt) for patt in patts]
         namedPatts = [self.visitNamedPatt(namedPatt) for namedPatt in
                 namedPatts]
         guard = self.visitExpr(guard)
         body = self.visitExpr(body)
+        self.profileName = outerName
         rv = self.dest.MethodExpr(profileName, doc, atom, patts, namedPatts,
-                guard, body, localSize)
+                guard, body, localSize, LazyCode())
         rvmprof.register_code(rv, lambda method: method.profileName)
         return rv
 
     def visitMatcherExpr(self, patt, body, localSize):
         profileName = self.makeProfileName("matcher")
+        outerName = self.profileName
+        self.profileName = profileName
         patt = self.visitPatt(patt)
         body = self.visitExpr(body)
-        rv = self.dest.MatcherExpr(profileName, patt, body, localSize)
+        self.profileName = outerName
+        rv = self.dest.MatcherExpr(profileName, patt, body, localSize,
+                                   LazyCode())
         rvmprof.register_code(rv, lambda matcher: matcher.profileName)
         return rv
 
@@ -148,9 +230,6 @@ class InterpObject(Object):
 
     _immutable_fields_ = "doc", "displayName", "script", "report"
 
-    # Inline single-entry method cache.
-    cachedMethod = None, None
-
     def __init__(self, doc, name, script, frame, ast, fqn):
         self.objectAst = ast
         self.fqn = fqn
@@ -159,7 +238,7 @@ class InterpObject(Object):
         self.script = script
         self.frame = frame
 
-        self.report = None
+        self.report = script.methodTable.report
 
     def docString(self):
         return self.doc
@@ -189,45 +268,70 @@ class InterpObject(Object):
         # super().
         return Object.auditedBy(self, prospect)
 
-    @unroll_safe
     def getMethod(self, atom):
-        # If we are JIT'd, then don't bother with the method cache. It will
-        # only slow things down. Instead, head directly to the script and find
-        # the right method.
-        if we_are_jitted():
-            for method in promote(self.script).methods:
-                if method.atom is atom:
-                    return promote(method)
-        else:
-            if self.cachedMethod[0] is atom:
-                return self.cachedMethod[1]
-            for method in self.script.methods:
-                if method.atom is atom:
-                    self.cachedMethod = atom, method
-                    return method
+        # The table is immutable, so JIT'd lookups are constant-folded.
+        return promote(self.script).methodTable.lookup(atom)
 
     def getMatchers(self):
         return promote(self.script).matchers
 
     def respondingAtoms(self):
-        d = {}
-        for method in self.script.methods:
-            d[method.atom] = method.doc
-        return d
+        return self.script.methodTable.atoms
 
-    # Two loops, both of which loop over greens. ~ C.
     @rvmprof.vmprof_execute_code("method",
             lambda self, method, args, namedArgs: method,
             result_class=Object)
-    @unroll_safe
     def runMethod(self, method, args, namedArgs):
-        e = Evaluator(self.frame, method.localSize)
+        return self.activate(method, args, namedArgs, None, None)
+
+    @rvmprof.vmprof_execute_code("methodNamed",
+            lambda self, method, args, namedVals, plan: method,
+            result_class=Object)
+    def runMethodNamed(self, method, args, namedVals, plan):
+        """
+        Run a method, with named args already placed by a plan.
+        """
+
+        return self.activate(method, args, EMPTY_MAP, namedVals, plan)
+
+    def activate(self, method, args, namedArgs, namedVals, plan):
+        if engineSettings.bytecode:
+            code = codeFor(method.code, method.profileName, method.body,
+                           method.localSize)
+            e = evaluatorPool.acquire(self.frame, code.registers)
+        else:
+            code = None
+            e = evaluatorPool.acquire(self.frame, method.localSize)
+        try:
+            return self.runBody(e, code, method, args, namedArgs, namedVals,
+                                plan)
+        finally:
+            evaluatorPool.release(e)
+
+    # Two loops, both of which loop over greens. ~ C.
+    @unroll_safe
+    def runBody(self, e, code, method, args, namedArgs, namedVals, plan):
         if len(args) != len(method.patts):
             raise userError(u"Method '%s.%s' expected %d args, got %d" % (
                 self.getDisplayName(), method.atom.verb, len(method.patts),
                 len(args)))
         for i in range(len(method.patts)):
             e.matchBind(method.patts[i], args[i])
+        if plan is None:
+            self.bindNamedMap(e, method, namedArgs)
+        else:
+            self.bindNamedPlan(e, method, namedVals, plan)
+        resultGuard = e.visitExpr(method.guard)
+        if code is None:
+            v = e.visitExpr(method.body)
+        else:
+            v = runCode(code, e)
+        if resultGuard is NullObject:
+            return v
+        return e.runGuard(resultGuard, v, None)
+
+    @unroll_safe
+    def bindNamedMap(self, e, method, namedArgs):
         namedArgDict = unwrapMap(namedArgs)
         for np in method.namedPatts:
             k = e.visitExpr(np.key)
@@ -240,19 +344,738 @@ class InterpObject(Object):
                 e.matchBind(np.patt, e.visitExpr(np.default))
             else:
                 e.matchBind(np.patt, namedArgDict[k])
-        resultGuard = e.visitExpr(method.guard)
-        v = e.visitExpr(method.body)
-        if resultGuard is NullObject:
-            return v
-        return e.runGuard(resultGuard, v, None)
+
+    # The plan is green. ~ C.
+    @unroll_safe
+    def bindNamedPlan(self, e, method, namedVals, plan):
+        for i in range(len(method.namedPatts)):
+            np = method.namedPatts[i]
+            slot = plan.slots[i]
+            if slot != -1:
+                e.matchBind(np.patt, namedVals[slot])
+            elif isinstance(np.default, ProfileNameIR.NullExpr):
+                raise userError(u"Named arg %s missing in call" % (
+                    e.visitExpr(np.key).toString(),))
+            else:
+                e.matchBind(np.patt, e.visitExpr(np.default))
 
     @rvmprof.vmprof_execute_code("matcher",
             lambda self, matcher, message, ej: matcher,
             result_class=Object)
     def runMatcher(self, matcher, message, ej):
-        e = Evaluator(self.frame, matcher.localSize)
-        e.matchBind(matcher.patt, message, ej)
-        return e.visitExpr(matcher.body)
+        if engineSettings.bytecode:
+            code = codeFor(matcher.code, matcher.profileName, matcher.body,
+                           matcher.localSize)
+            e = evaluatorPool.acquire(self.frame, code.registers)
+        else:
+            code = None
+            e = evaluatorPool.acquire(self.frame, matcher.localSize)
+        try:
+            e.matchBind(matcher.patt, message, ej)
+            if code is None:
+                return e.visitExpr(matcher.body)
+            return runCode(code, e)
+        finally:
+            evaluatorPool.release(e)
+
+
+AUDIT_1 = getAtom(u"audit", 1)
+ASK_1 = getAtom(u"ask", 1)
+
+
+def isStamp(obj):
+    return (obj is deepFrozenStamp or obj is selfless or
+            obj is transparentStamp)
+
+
+def forwardedStamp(auditor):
+    """
+    If `auditor` does nothing but ask a stamp on behalf of its audition,
+    return that stamp.
+
+    Otherwise, return None.
+
+    Transparent's value auditors are like this; the maker auditor has already
+    checked the object, so the value auditor just asks TransparentStamp. The
+    auditor must be DeepFrozen so that its frame can't change underneath us.
+    """
+
+    if not isinstance(auditor, InterpObject):
+        return None
+    if not auditor.auditedBy(deepFrozenStamp):
+        return None
+    method = auditor.getMethod(AUDIT_1)
+    if method is None or method.namedPatts:
+        return None
+    if not isinstance(method.guard, ProfileNameIR.NullExpr):
+        return None
+    patt = method.patts[0]
+    if not (isinstance(patt, ProfileNameIR.NounPatt) and
+            isinstance(patt.guard, ProfileNameIR.NullExpr)):
+        return None
+    # audition.ask(stamp); true
+    body = method.body
+    if not isinstance(body, ProfileNameIR.SeqExpr) or len(body.exprs) != 2:
+        return None
+    ask = body.exprs[0]
+    rv = body.exprs[1]
+    if not (isinstance(rv, ProfileNameIR.LiveExpr) and rv.obj is TrueObject):
+        return None
+    if not (isinstance(ask, ProfileNameIR.CallExpr) and ask.atom is ASK_1 and
+            not ask.namedArgs):
+        return None
+    rcvr = ask.obj
+    if not (isinstance(rcvr, ProfileNameIR.LocalExpr) and
+            rcvr.index == patt.index):
+        return None
+    arg = ask.args[0]
+    if isinstance(arg, ProfileNameIR.LiveExpr):
+        stamp = arg.obj
+    elif isinstance(arg, ProfileNameIR.FrameExpr):
+        stamp = auditor.frame[arg.index]
+    else:
+        return None
+    return stamp if isStamp(stamp) else None
+
+
+def forwardedStamps(auditors):
+    """
+    If every auditor is a stamp, or forwards to one, return the forwarded
+    stamps; none of the auditors need to be asked.
+
+    Otherwise, return None.
+    """
+
+    stamps = []
+    for auditor in auditors:
+        if isStamp(auditor):
+            continue
+        stamp = forwardedStamp(auditor)
+        if stamp is None:
+            return None
+        stamps.append(stamp)
+    return stamps
+
+
+# The most scripts remembered by a single call site.
+CALL_SITE_ENTRIES = 4
+
+
+class CallSite(object):
+    """
+    A polymorphic inline cache for a single call site.
+
+    Receivers are keyed on their scripts; the methods for the first few
+    scripts seen at the site are remembered, and any further scripts make
+    the site megamorphic and are looked up every time.
+    """
+
+    _immutable_fields_ = "atom", "keys[*]"
+
+    def __init__(self, atom, keys=None):
+        self.atom = atom
+        # The keys of the named args, when they are all literal strings.
+        self.keys = keys
+        self.scripts = []
+        self.methods = []
+        self.plans = {}
+        self.hits = 0
+        self.misses = 0
+        self.megamorphic = 0
+
+    def methodFor(self, script):
+        for i in range(len(self.scripts)):
+            if self.scripts[i] is script:
+                self.hits += 1
+                return self.methods[i]
+        method = script.methodTable.lookup(self.atom)
+        if len(self.scripts) < CALL_SITE_ENTRIES:
+            self.misses += 1
+            self.scripts.append(script)
+            self.methods.append(method)
+        else:
+            self.megamorphic += 1
+        return method
+
+    def call(self, rcvr, args, namedArgs):
+        # Traces promote the script and find the method themselves, so the
+        # cache is only for the interpreter.
+        if not we_are_jitted() and isinstance(rcvr, InterpObject):
+            method = self.methodFor(rcvr.script)
+            if method is not None:
+                return rcvr.runMethod(method, args, namedArgs)
+        return rcvr.recvNamed(self.atom, args, namedArgs)
+
+    @elidable
+    def planFor(self, method):
+        """
+        Plan how the named args of this site bind to the named patterns of a
+        method, or return None if the method has non-literal keys.
+        """
+
+        if method in self.plans:
+            return self.plans[method]
+        plan = makeNamedPlan(self.keys, method.namedPatts)
+        self.plans[method] = plan
+        return plan
+
+    def namedMap(self, namedVals):
+        d = monteMap()
+        for i, key in enumerate(self.keys):
+            d[key] = namedVals[i]
+        return ConstMap(d)
+
+    def callNamed(self, rcvr, args, namedVals):
+        """
+        Call with named args whose keys are this site's literal keys.
+
+        Methods whose named patterns all have literal keys get the values
+        straight into their slots; everything else gets a map.
+        """
+
+        if isinstance(rcvr, InterpObject):
+            if we_are_jitted():
+                method = rcvr.getMethod(self.atom)
+            else:
+                method = self.methodFor(rcvr.script)
+            if method is not None:
+                plan = self.planFor(method)
+                if plan is not None:
+                    return rcvr.runMethodNamed(method, args, namedVals, plan)
+        return rcvr.recvNamed(self.atom, args, self.namedMap(namedVals))
+
+
+def literalKeys(namedArgs):
+    """
+    The keys of some named args, if they are all literal strings.
+    """
+
+    keys = []
+    for namedArg in namedArgs:
+        key = namedArg.key
+        if not (isinstance(key, ProfileNameIR.LiveExpr) and
+                isinstance(key.obj, StrObject)):
+            return None
+        keys.append(key.obj)
+    return keys
+
+
+class NamedPlan(object):
+    """
+    For each named pattern of a method, the index of the caller's named arg
+    which binds it, or -1 if the caller doesn't pass it.
+    """
+
+    _immutable_ = True
+    _immutable_fields_ = "slots[*]",
+
+    def __init__(self, slots):
+        self.slots = slots
+
+
+def makeNamedPlan(keys, namedPatts):
+    slots = []
+    for namedPatt in namedPatts:
+        key = namedPatt.key
+        if not (isinstance(key, ProfileNameIR.LiveExpr) and
+                isinstance(key.obj, StrObject)):
+            return None
+        name = unwrapStr(key.obj)
+        slot = -1
+        # As with a map, the last of any repeated keys wins.
+        for i, k in enumerate(keys):
+            if unwrapStr(k) == name:
+                slot = i
+        slots.append(slot)
+    return NamedPlan(slots)
+
+
+# The largest method, in nodes, which will be inlined into its callers.
+INLINE_BUDGET = 24
+
+COERCE_2 = getAtom(u"coerce", 2)
+GET_0 = getAtom(u"get", 0)
+
+
+class FindObjects(ProfileNameIR.selfPass()):
+    """
+    Find any objects built by a method body. Their frames are built from the
+    method's locals, so the body can't be moved into another frame.
+    """
+
+    found = False
+
+    def visitObjectExpr(self, doc, patt, guards, auditors, script, mast,
+                        layout, clipboard):
+        self.found = True
+        return self.dest.ObjectExpr(doc, patt, guards, auditors, script, mast,
+                                    layout, clipboard)
+
+    def visitClearObjectExpr(self, doc, patt, script, layout):
+        self.found = True
+        return self.dest.ClearObjectExpr(doc, patt, script, layout)
+
+
+class MoveLocals(ProfileNameIR.makePassTo(MixIR)):
+    """
+    Move a method body into a caller's frame.
+
+    Locals are shifted past the caller's locals, and the callee's frame,
+    which must be immutable, is read now rather than at each call.
+    """
+
+    def __init__(self, frame, offset):
+        self.frame = frame
+        self.offset = offset
+
+    def visitLocalExpr(self, name, index):
+        return self.dest.LocalExpr(name, index + self.offset)
+
+    def visitFrameExpr(self, name, index):
+        return self.dest.LiveExpr(self.frame[index])
+
+    def visitCallExpr(self, obj, atom, args, namedArgs, site):
+        # The caller gets its own call site.
+        return self.dest.CallExpr(self.visitExpr(obj), atom,
+                                  [self.visitExpr(arg) for arg in args],
+                                  [self.visitNamedArg(namedArg)
+                                   for namedArg in namedArgs])
+
+    def visitBindingPatt(self, name, index):
+        return self.dest.BindingPatt(name, index + self.offset)
+
+    def visitNounPatt(self, name, guard, index):
+        return self.dest.NounPatt(name, self.visitExpr(guard),
+                                  index + self.offset)
+
+    def visitFinalSlotPatt(self, name, guard, index):
+        return self.dest.FinalSlotPatt(name, self.visitExpr(guard),
+                                       index + self.offset)
+
+    def visitVarSlotPatt(self, name, guard, index):
+        return self.dest.VarSlotPatt(name, self.visitExpr(guard),
+                                     index + self.offset)
+
+    def visitFinalBindingPatt(self, name, guard, index):
+        return self.dest.FinalBindingPatt(name, self.visitExpr(guard),
+                                          index + self.offset)
+
+    def visitVarBindingPatt(self, name, guard, index):
+        return self.dest.VarBindingPatt(name, self.visitExpr(guard),
+                                        index + self.offset)
+
+    def visitProvenFinalSlotPatt(self, name, guard, index):
+        return self.dest.ProvenFinalSlotPatt(name, self.visitExpr(guard),
+                                             index + self.offset)
+
+    def visitProvenFinalBindingPatt(self, name, guard, index):
+        return self.dest.ProvenFinalBindingPatt(name, self.visitExpr(guard),
+                                                index + self.offset)
+
+    def visitLocalEscapeOnlyExpr(self, name, index, body):
+        return self.dest.LocalEscapeOnlyExpr(name, index + self.offset,
+                                             self.visitExpr(body))
+
+    def visitLocalEscapeExpr(self, name, index, body, catchPatt, catchBody):
+        return self.dest.LocalEscapeExpr(name, index + self.offset,
+                                         self.visitExpr(body),
+                                         self.visitPatt(catchPatt),
+                                         self.visitExpr(catchBody))
+
+    def visitLocalEjectExpr(self, name, index, value):
+        return self.dest.LocalEjectExpr(name, index + self.offset,
+                                        self.visitExpr(value))
+
+    def visitLocalAssignExpr(self, name, guard, index, value):
+        return self.dest.LocalAssignExpr(name, self.visitExpr(guard),
+                                         index + self.offset,
+                                         self.visitExpr(value))
+
+    def visitObjectExpr(self, doc, patt, guards, auditors, script, mast,
+                        layout, clipboard):
+        assert False, "cuckoo"
+
+    def visitClearObjectExpr(self, doc, patt, script, layout):
+        assert False, "cuckoo"
+
+    def visitScriptExpr(self, stamps, methods, matchers, methodTable):
+        assert False, "cuckoo"
+
+    def visitMethodExpr(self, profileName, doc, atom, patts, namedPatts,
+                        guard, body, localSize, code):
+        assert False, "cuckoo"
+
+    def visitMatcherExpr(self, profileName, patt, body, localSize, code):
+        assert False, "cuckoo"
+
+
+class InlineCalls(MixIR.selfPass()):
+    """
+    Inline small methods of live DeepFrozen objects into their callers.
+
+    The call's arguments are bound to the method's patterns in fresh locals
+    at the end of the caller's frame, followed by the method's body and
+    return guard. Methods which build objects, take named arguments, or are
+    larger than the budget are left alone.
+    """
+
+    def __init__(self, localSize):
+        self.localSize = localSize
+
+    def isPure(self, expr):
+        return (isinstance(expr, self.dest.LiveExpr) or
+                isinstance(expr, self.dest.NullExpr) or
+                isinstance(expr, self.dest.LocalExpr) or
+                isinstance(expr, self.dest.FrameExpr))
+
+    def findMethod(self, obj, atom):
+        """
+        Find the method which a call to a live object would run, if it can be
+        inlined.
+        """
+
+        if not isinstance(obj, InterpObject):
+            return None
+        if not obj.auditedBy(deepFrozenStamp):
+            return None
+        method = obj.getMethod(atom)
+        if method is None or method.namedPatts:
+            return None
+        counter = ProfileNameCounter()
+        size = counter.visitExpr(method.body)
+        size += counter.visitExpr(method.guard)
+        for patt in method.patts:
+            size += counter.visitPatt(patt)
+        if size > INLINE_BUDGET:
+            return None
+        finder = FindObjects()
+        finder.visitExpr(method.body)
+        if finder.found:
+            return None
+        return method
+
+    def visitCallExpr(self, obj, atom, args, namedArgs):
+        obj = self.visitExpr(obj)
+        args = [self.visitExpr(arg) for arg in args]
+        namedArgs = [self.visitNamedArg(namedArg) for namedArg in namedArgs]
+        if isinstance(obj, self.dest.LiveExpr) and not namedArgs:
+            # Arguments are bound as they're evaluated, so every argument
+            # but the last must not care whether an earlier one has been
+            # bound yet.
+            pure = True
+            for arg in args[:-1]:
+                if not self.isPure(arg):
+                    pure = False
+            if pure:
+                method = self.findMethod(obj.obj, atom)
+                if method is not None:
+                    return self.inline(obj.obj, method, args)
+        return self.dest.CallExpr(obj, atom, args, namedArgs)
+
+    def inline(self, obj, method, args):
+        assert isinstance(obj, InterpObject), "vapor"
+        mover = MoveLocals(obj.frame, self.localSize)
+        self.localSize += method.localSize
+        exprs = []
+        for i, patt in enumerate(method.patts):
+            exprs.append(self.dest.DefExpr(mover.visitPatt(patt),
+                                           self.dest.LiveExpr(theThrower),
+                                           args[i]))
+        body = mover.visitExpr(method.body)
+        if not isinstance(method.guard, ProfileNameIR.NullExpr):
+            body = self.dest.CallExpr(mover.visitExpr(method.guard), COERCE_2,
+                                      [body, self.dest.LiveExpr(theThrower)],
+                                      [])
+        exprs.append(body)
+        return self.dest.SeqExpr(exprs)
+
+    def visitMethodExpr(self, doc, atom, patts, namedPatts, guard, body,
+                        localSize):
+        outerSize = self.localSize
+        self.localSize = localSize
+        patts = [self.visitPatt(patt) for patt in patts]
+        namedPatts = [self.visitNamedPatt(namedPatt) for namedPatt in
+                      namedPatts]
+        guard = self.visitExpr(guard)
+        body = self.visitExpr(body)
+        localSize = self.localSize
+        self.localSize = outerSize
+        return self.dest.MethodExpr(doc, atom, patts, namedPatts, guard, body,
+                                    localSize)
+
+    def visitMatcherExpr(self, patt, body, localSize):
+        outerSize = self.localSize
+        self.localSize = localSize
+        patt = self.visitPatt(patt)
+        body = self.visitExpr(body)
+        localSize = self.localSize
+        self.localSize = outerSize
+        return self.dest.MatcherExpr(patt, body, localSize)
+
+
+def asUnretractable(guard):
+    """
+    If `guard` is a guard whose verdict on a near value never changes, and
+    which passes its specimens through unchanged, return it.
+
+    Otherwise, return None.
+    """
+
+    if (guard is deepFrozenGuard or isinstance(guard, BoolGuard) or
+            isinstance(guard, BytesGuard) or isinstance(guard, CharGuard) or
+            isinstance(guard, DoubleGuard) or isinstance(guard, IntGuard) or
+            isinstance(guard, StrGuard) or isinstance(guard, VoidGuard)):
+        return guard
+    return None
+
+
+def unretractableGuard(expr):
+    if isinstance(expr, MixIR.LiveExpr):
+        return asUnretractable(expr.obj)
+    return None
+
+
+class ElideGuards(MixIR.selfPass()):
+    """
+    Skip the guards of patterns whose specimens are already known to pass
+    them.
+
+    A specimen passes an unretractable guard if it is a live value which the
+    guard admits, or a noun or slot bound by a pattern with the same guard,
+    or the result of calling a live object's method whose return guard is the
+    same guard. Every such guard admits only DeepFrozen values, so they all
+    also pass DeepFrozen.
+
+    Noun and ignore patterns lose their guards. Final slot and binding
+    patterns keep them, since they store them, but become Proven patterns
+    which don't coerce.
+    """
+
+    def __init__(self):
+        # The guards of the noun and slot locals of the current method.
+        self.nounGuards = {}
+        self.slotGuards = {}
+        # The expression being matched by the pattern being visited.
+        self.specimen = None
+
+    def typeOf(self, expr):
+        """
+        The unretractable guard which `expr` is known to pass, or None.
+        """
+
+        if isinstance(expr, self.dest.LocalExpr):
+            return self.nounGuards.get(expr.index, None)
+        elif isinstance(expr, self.dest.DefExpr):
+            return self.typeOf(expr.rvalue)
+        elif isinstance(expr, self.dest.SeqExpr):
+            if expr.exprs:
+                return self.typeOf(expr.exprs[-1])
+        elif isinstance(expr, self.dest.IfExpr):
+            guard = self.typeOf(expr.cons)
+            if guard is not None and self.typeOf(expr.alt) is guard:
+                return guard
+        elif isinstance(expr, self.dest.CallExpr):
+            obj = expr.obj
+            if isinstance(obj, self.dest.LocalExpr):
+                if expr.atom is GET_0:
+                    return self.slotGuards.get(obj.index, None)
+            elif isinstance(obj, self.dest.LiveExpr):
+                live = obj.obj
+                if not isinstance(live, InterpObject):
+                    return None
+                method = live.getMethod(expr.atom)
+                if method is not None:
+                    # runMethod() coerces the result with this guard.
+                    guard = method.guard
+                    if isinstance(guard, ProfileNameIR.LiveExpr):
+                        return asUnretractable(guard.obj)
+                    return None
+        return None
+
+    def passes(self, expr, guard):
+        """
+        Whether `expr` certainly passes the unretractable `guard`, unchanged.
+        """
+
+        if isinstance(expr, self.dest.LiveExpr):
+            return self.admits(guard, expr.obj)
+        elif isinstance(expr, self.dest.NullExpr):
+            return self.admits(guard, NullObject)
+        elif isinstance(expr, self.dest.DefExpr):
+            return self.passes(expr.rvalue, guard)
+        elif isinstance(expr, self.dest.SeqExpr):
+            if expr.exprs:
+                return self.passes(expr.exprs[-1], guard)
+            return self.admits(guard, NullObject)
+        elif isinstance(expr, self.dest.IfExpr):
+            return (self.passes(expr.cons, guard) and
+                    self.passes(expr.alt, guard))
+        known = self.typeOf(expr)
+        return known is not None and (known is guard or
+                                      guard is deepFrozenGuard)
+
+    def admits(self, guard, obj):
+        if guard is deepFrozenGuard:
+            return obj.auditedBy(deepFrozenStamp)
+        assert isinstance(guard, Guard), "unguarded"
+        return guard.subCoerce(obj) is obj
+
+    def proven(self, guard):
+        """
+        If the current specimen passes `guard`, return the guard.
+
+        Otherwise, return None.
+        """
+
+        g = unretractableGuard(guard)
+        if g is not None and self.specimen is not None:
+            if self.passes(self.specimen, g):
+                return g
+        return None
+
+    def matchBind(self, patt, specimen):
+        oldSpecimen = self.specimen
+        self.specimen = specimen
+        patt = self.visitPatt(patt)
+        self.specimen = oldSpecimen
+        return patt
+
+    def forget(self, index):
+        if index in self.nounGuards:
+            del self.nounGuards[index]
+        if index in self.slotGuards:
+            del self.slotGuards[index]
+
+    def visitExpr(self, expr):
+        # Patterns within expressions, including guards, have their own
+        # specimens.
+        specimen = self.specimen
+        self.specimen = None
+        rv = self.super.visitExpr(self, expr)
+        self.specimen = specimen
+        return rv
+
+    def visitDefExpr(self, patt, ex, rvalue):
+        # Same order as evaluation: the pattern is matched last.
+        ex = self.visitExpr(ex)
+        rvalue = self.visitExpr(rvalue)
+        patt = self.matchBind(patt, rvalue)
+        return self.dest.DefExpr(patt, ex, rvalue)
+
+    def visitIgnorePatt(self, guard):
+        guard = self.visitExpr(guard)
+        if self.proven(guard) is not None:
+            guard = self.dest.NullExpr()
+        return self.dest.IgnorePatt(guard)
+
+    def visitNounPatt(self, name, guard, index):
+        guard = self.visitExpr(guard)
+        self.forget(index)
+        g = unretractableGuard(guard)
+        if g is not None:
+            if self.proven(guard) is not None:
+                guard = self.dest.NullExpr()
+            self.nounGuards[index] = g
+        elif isinstance(guard, self.dest.NullExpr) and self.specimen is not None:
+            g = self.typeOf(self.specimen)
+            if g is not None:
+                self.nounGuards[index] = g
+        return self.dest.NounPatt(name, guard, index)
+
+    def visitFinalSlotPatt(self, name, guard, index):
+        guard = self.visitExpr(guard)
+        self.forget(index)
+        g = unretractableGuard(guard)
+        if g is not None:
+            self.slotGuards[index] = g
+            if self.proven(guard) is not None:
+                return self.dest.ProvenFinalSlotPatt(name, guard, index)
+        return self.dest.FinalSlotPatt(name, guard, index)
+
+    def visitFinalBindingPatt(self, name, guard, index):
+        guard = self.visitExpr(guard)
+        self.forget(index)
+        if self.proven(guard) is not None:
+            return self.dest.ProvenFinalBindingPatt(name, guard, index)
+        return self.dest.FinalBindingPatt(name, guard, index)
+
+    def visitBindingPatt(self, name, index):
+        self.forget(index)
+        return self.dest.BindingPatt(name, index)
+
+    def visitVarSlotPatt(self, name, guard, index):
+        self.forget(index)
+        return self.super.visitVarSlotPatt(self, name, guard, index)
+
+    def visitVarBindingPatt(self, name, guard, index):
+        self.forget(index)
+        return self.super.visitVarBindingPatt(self, name, guard, index)
+
+    def visitLocalAssignExpr(self, name, guard, index, value):
+        guard = self.visitExpr(guard)
+        value = self.visitExpr(value)
+        self.forget(index)
+        g = unretractableGuard(guard)
+        if g is not None:
+            self.nounGuards[index] = g
+        return self.dest.LocalAssignExpr(name, guard, index, value)
+
+    def visitListPatt(self, patts):
+        return self.dest.ListPatt([self.matchBind(patt, None)
+                                   for patt in patts])
+
+    def visitViaPatt(self, trans, patt):
+        trans = self.visitExpr(trans)
+        return self.dest.ViaPatt(trans, self.matchBind(patt, None))
+
+    def forgetPatt(self, patt):
+        if isinstance(patt, self.dest.NounPatt):
+            self.forget(patt.index)
+        elif isinstance(patt, self.dest.FinalSlotPatt):
+            self.forget(patt.index)
+
+    def visitObjectExpr(self, doc, patt, guards, auditors, script, mast,
+                        layout, clipboard):
+        # The object is coerced by its as-auditor, not its pattern's guard.
+        patt = self.matchBind(patt, None)
+        self.forgetPatt(patt)
+        auditors = [self.visitExpr(auditor) for auditor in auditors]
+        script = self.visitScript(script)
+        return self.dest.ObjectExpr(doc, patt, guards, auditors, script, mast,
+                                    layout, clipboard)
+
+    def visitClearObjectExpr(self, doc, patt, script, layout):
+        patt = self.matchBind(patt, None)
+        self.forgetPatt(patt)
+        script = self.visitScript(script)
+        return self.dest.ClearObjectExpr(doc, patt, script, layout)
+
+    def visitMethodExpr(self, doc, atom, patts, namedPatts, guard, body,
+                        localSize):
+        nounGuards = self.nounGuards
+        slotGuards = self.slotGuards
+        self.nounGuards = {}
+        self.slotGuards = {}
+        patts = [self.matchBind(patt, None) for patt in patts]
+        namedPatts = [self.visitNamedPatt(namedPatt) for namedPatt in
+                      namedPatts]
+        guard = self.visitExpr(guard)
+        body = self.visitExpr(body)
+        self.nounGuards = nounGuards
+        self.slotGuards = slotGuards
+        return self.dest.MethodExpr(doc, atom, patts, namedPatts, guard, body,
+                                    localSize)
+
+    def visitMatcherExpr(self, patt, body, localSize):
+        nounGuards = self.nounGuards
+        slotGuards = self.slotGuards
+        self.nounGuards = {}
+        self.slotGuards = {}
+        patt = self.matchBind(patt, None)
+        body = self.visitExpr(body)
+        self.nounGuards = nounGuards
+        self.slotGuards = slotGuards
+        return self.dest.MatcherExpr(patt, body, localSize)
 
 
 def retrieveGuard(severity, storage):
@@ -278,6 +1101,53 @@ def retrieveGuard(severity, storage):
         assert False, "landlord"
 
 
+# The most idle evaluators kept for any one number of locals.
+POOL_DEPTH = 8
+
+
+class EvaluatorPool(object):
+    """
+    Evaluators of finished method and matcher activations, kept for reuse.
+
+    An activation's evaluator and locals never outlive it; objects built
+    during the activation copy what they need into their own frames. So,
+    when an activation finishes, its evaluator can be cleared and handed to
+    the next activation with the same number of locals.
+
+    JIT'd code doesn't use the pool, since its evaluators are virtual and
+    cost nothing to allocate.
+    """
+
+    def __init__(self):
+        self.idle = {}
+
+    def acquire(self, frame, localSize):
+        if not we_are_jitted():
+            idle = self.idle.get(localSize, None)
+            if idle:
+                e = idle.pop()
+                e.frame = frame
+                return e
+        return Evaluator(frame, localSize)
+
+    def release(self, e):
+        if we_are_jitted():
+            return
+        localSize = len(e.locals)
+        idle = self.idle.get(localSize, None)
+        if idle is None:
+            idle = self.idle[localSize] = []
+        if len(idle) < POOL_DEPTH:
+            # Don't keep the activation's values alive.
+            for i in range(localSize):
+                e.locals[i] = NULL_BINDING
+            e.frame = None
+            e.specimen = None
+            e.patternFailure = None
+            e.ejected = None
+            idle.append(e)
+
+
 class Evaluator(ProfileNameIR.makePassTo(None)):
 
     def __init__(self, frame, localSize):
@@ -285,6 +1155,9 @@ class Evaluator(ProfileNameIR.makePassTo(None)):
         self.frame = frame
         self.specimen = None
         self.patternFailure = None
+        # The index and value of the elided ejector being used, if any.
+        self.ejectIndex = -1
+        self.ejected = None
 
     def matchBind(self, patt, val, ej=theThrower):
         oldSpecimen = self.specimen
@@ -323,19 +1196,20 @@ class Evaluator(ProfileNameIR.makePassTo(None)):
 
     # Length of args and namedArgs are fixed. ~ C.
     @unroll_safe
-    def visitCallExpr(self, obj, atom, args, namedArgs):
+    def visitCallExpr(self, obj, atom, args, namedArgs, site):
         jit_debug("CallExpr")
         rcvr = self.visitExpr(obj)
         argVals = [self.visitExpr(a) for a in args]
-        if namedArgs:
-            d = monteMap()
-            for na in namedArgs:
-                (k, v) = self.visitNamedArg(na)
-                d[k] = v
-            namedArgMap = ConstMap(d)
-        else:
-            namedArgMap = EMPTY_MAP
-        return rcvr.recvNamed(atom, argVals, namedArgMap)
+        if not namedArgs:
+            return site.call(rcvr, argVals, EMPTY_MAP)
+        if site.keys is not None:
+            namedVals = [self.visitExpr(na.value) for na in namedArgs]
+            return site.callNamed(rcvr, argVals, namedVals)
+        d = monteMap()
+        for na in namedArgs:
+            (k, v) = self.visitNamedArg(na)
+            d[k] = v
+        return site.call(rcvr, argVals, ConstMap(d))
 
     def visitDefExpr(self, patt, ex, rvalue):
         jit_debug("DefExpr")
@@ -373,12 +1247,58 @@ class Evaluator(ProfileNameIR.makePassTo(None)):
             self.matchBind(catchPatt, e.value)
             return self.visitExpr(catchBody)
 
+    def visitLocalEscapeOnlyExpr(self, name, index, body):
+        jit_debug("LocalEscapeOnlyExpr")
+        try:
+            return self.visitExpr(body)
+        except LocalEjecting:
+            if self.ejectIndex != index:
+                raise
+            return self.takeEjected()
+
+    def visitLocalEscapeExpr(self, name, index, body, catchPatt, catchBody):
+        jit_debug("LocalEscapeExpr")
+        try:
+            return self.visitExpr(body)
+        except LocalEjecting:
+            if self.ejectIndex != index:
+                raise
+            self.matchBind(catchPatt, self.takeEjected())
+            return self.visitExpr(catchBody)
+
+    def takeEjected(self):
+        value = self.ejected
+        self.ejectIndex = -1
+        self.ejected = None
+        return value
+
+    def visitLocalEjectExpr(self, name, index, value):
+        jit_debug("LocalEjectExpr")
+        # Nothing is allocated to eject; the value rides on the evaluator.
+        self.ejected = self.visitExpr(value)
+        self.ejectIndex = index
+        raise theLocalEjecting
+
+    def visitLocalAssignExpr(self, name, guard, index, value):
+        jit_debug("LocalAssignExpr %s" % name.encode("utf-8"))
+        val = self.visitExpr(value)
+        if not isinstance(guard, self.src.NullExpr):
+            val = self.runGuard(self.visitExpr(guard), val, None)
+        self.locals[index] = val
+        return NullObject
+
     def visitFinallyExpr(self, body, atLast):
         jit_debug("FinallyExpr")
         try:
             return self.visitExpr(body)
         finally:
+            # atLast may use its own elided ejectors while one of ours is
+            # still unwinding.
+            ejectIndex = self.ejectIndex
+            ejected = self.ejected
             self.visitExpr(atLast)
+            self.ejectIndex = ejectIndex
+            self.ejected = ejected
 
     def visitIfExpr(self, test, cons, alt):
         jit_debug("IfExpr")
@@ -404,6 +1324,34 @@ class Evaluator(ProfileNameIR.makePassTo(None)):
         else:
             assert False, "teacher"
 
+    def lookupPlanned(self, idx):
+        if idx >= 0:
+            return self.locals[idx]
+        return self.frame[-1 - idx]
+
+    # The copy plan is immutable. ~ C.
+    @unroll_safe
+    def buildFrame(self, frameTable):
+        """
+        Build the frame for a new object, following its site's copy plan.
+
+        A shareable site only copies final DeepFrozen entries out of the
+        enclosing frame, so its frame is built once per enclosing frame and
+        then reused.
+        """
+
+        plan = frameTable.copyPlan
+        if not frameTable.shareable:
+            return [self.lookupPlanned(idx) for idx in plan]
+        shared = frameTable.sharedFrame
+        if shared is not None and (not plan or
+                                   frameTable.sharedFrom is self.frame):
+            return shared
+        frame = [self.lookupPlanned(idx) for idx in plan]
+        frameTable.sharedFrom = self.frame
+        frameTable.sharedFrame = frame
+        return frame
+
     # Everything passed to this method, except self, is immutable. ~ C.
     @unroll_safe
     def visitClearObjectExpr(self, doc, patt, script, layout):
@@ -412,16 +1360,13 @@ class Evaluator(ProfileNameIR.makePassTo(None)):
             objName = u"_"
         else:
             objName = patt.name
-        ast = NullObject
         frameTable = layout.frameTable
-        frame = [self.lookupBinding(scope, index) for (_, scope, index, _)
-                 in frameTable.frameInfo]
-
-        # Build the object.
-        val = InterpObject(doc, objName, script, frame, ast, layout.fqn)
-
         # Check whether we have a spot in the frame.
         position = frameTable.positionOf(objName)
+        frame = self.buildFrame(frameTable)
+
+        # Build the object.
+        val = InterpObject(doc, objName, script, frame, None, layout.fqn)
 
         # Set up the self-binding.
         selfGuard = self.selfGuard(patt)
@@ -469,8 +1414,9 @@ class Evaluator(ProfileNameIR.makePassTo(None)):
         else:
             auds = [guardAuditor] + auds
         frameTable = layout.frameTable
-        frame = [self.lookupBinding(scope, index) for (_, scope, index, _)
-                 in frameTable.frameInfo]
+        # Check whether we have a spot in the frame.
+        position = frameTable.positionOf(objName)
+        frame = self.buildFrame(frameTable)
         # Grab any remaining dynamic guards. We use a copy here in order to
         # preserve the original dict for reuse.
         guards = guards.copy()
@@ -487,12 +1433,14 @@ class Evaluator(ProfileNameIR.makePassTo(None)):
         o = InterpObject(doc, objName, script, frame,  mast, layout.fqn)
         if auds and (len(auds) != 1 or auds[0] is not NullObject):
             # Actually perform the audit.
-            o.report = clipboard.audit(auds, guards)
+            stamps = forwardedStamps(auds)
+            if stamps is None:
+                o.report = clipboard.audit(auds, guards, script.stamps)
+            else:
+                # Nothing is left to ask; every auditor would pass.
+                o.report = AuditorReport(asSet(auds + stamps + script.stamps))
         val = self.runGuard(guardAuditor, o, theThrower)
 
-        # Check whether we have a spot in the frame.
-        position = frameTable.positionOf(objName)
-
         # Set up the self-binding.
         if isinstance(patt, self.src.IgnorePatt):
             b = NULL_BINDING
@@ -574,6 +1522,16 @@ class Evaluator(ProfileNameIR.makePassTo(None)):
         val = self.runGuard(guard, self.specimen, self.patternFailure)
         self.locals[idx] = FinalSlot(val, guard)
 
+    def visitProvenFinalBindingPatt(self, name, guard, idx):
+        jit_debug("ProvenFinalBindingPatt %s" % name.encode("utf-8"))
+        guard = self.visitExpr(guard)
+        self.locals[idx] = finalBinding(self.specimen, guard)
+
+    def visitProvenFinalSlotPatt(self, name, guard, idx):
+        jit_debug("ProvenFinalSlotPatt %s" % name.encode("utf-8"))
+        guard = self.visitExpr(guard)
+        self.locals[idx] = FinalSlot(self.specimen, guard)
+
     def visitVarBindingPatt(self, name, guard, idx):
         jit_debug("VarBindingPatt %s" % name.encode("utf-8"))
         if isinstance(guard, self.src.NullExpr):
@@ -615,6 +1573,31 @@ class Evaluator(ProfileNameIR.makePassTo(None)):
         return (self.visitExpr(key), self.visitExpr(value))
 
 
+class CompileBytecode(object):
+    """
+    Compile method and matcher bodies for the bytecode engine.
+    """
+
+    import_from_mixin(BytecodeCompiler)
+
+    src = ProfileNameIR
+
+
+def codeFor(lazy, name, body, localSize):
+    """
+    Return the compiled code for a body, compiling it on first use.
+    """
+
+    code = lazy.code
+    if code is None:
+        code = CompileBytecode(name, localSize).compileBody(body)
+        lazy.code = code
+    return code
+
+
+evaluatorPool = EvaluatorPool()
+
+
 def scope2env(scope):
     environment = {}
     for k, v in scope.items():
@@ -638,18 +1621,83 @@ def env2scope(outerNames, env):
     return scope
 
 
-def evalMonte(expr, environment, fqnPrefix, inRepl=False):
+SaveScriptCounter = SaveScriptIR.makeNodeCounter()
+NoAssignCounter = NoAssignIR.makeNodeCounter()
+LayoutCounter = LayoutIR.makeNodeCounter()
+BoundNounsCounter = BoundNounsIR.makeNodeCounter()
+ElidedEscapesCounter = ElidedEscapesIR.makeNodeCounter()
+DeepFrozenCounter = DeepFrozenIR.makeNodeCounter()
+SplitAuditorsCounter = SplitAuditorsIR.makeNodeCounter()
+MixCounter = MixIR.makeNodeCounter()
+ProfileNameCounter = ProfileNameIR.makeNodeCounter()
+
+
+class PassTimer(object):
+    """
+    Record each compiler pass run on a module, when compiler statistics are
+    enabled.
+    """
+
+    def __init__(self, fqn):
+        self.fqn = fqn
+        self.last = time()
+
+    @specialize.arg(2)
+    def lap(self, name, counter, ast):
+        if compilerStats.enabled:
+            elapsed = time() - self.last
+            compilerStats.record(self.fqn, name, elapsed,
+                                 counter().visitExpr(ast))
+            # Don't charge the counting to the next pass.
+            self.last = time()
+
+
+def lowerMonte(expr, outerNames, fqnPrefix, inRepl=False):
+    """
+    Run every pass which only depends on the names, and not the values, of
+    the outer scope.
+
+    The lowered program can be saved and reused with any environment which
+    has the same outer names.
+    """
+
+    timer = PassTimer(fqnPrefix)
     ss = saveScripts(expr)
+    timer.lap("saveScripts", SaveScriptCounter, ss)
     slotted = recoverSlots(ss)
+    timer.lap("recoverSlots", NoAssignCounter, slotted)
     ll, outerNames, topLocalNames, localSize = layoutScopes(slotted,
-            environment.keys(), fqnPrefix, inRepl)
+            outerNames, fqnPrefix, inRepl)
+    timer.lap("layoutScopes", LayoutCounter, ll)
     bound = bindNouns(ll)
+    timer.lap("bindNouns", BoundNounsCounter, bound)
     ast = elideEscapes(bound)
+    timer.lap("elideEscapes", ElidedEscapesCounter, ast)
     ast = dischargeAuditors(ast)
+    timer.lap("dischargeAuditors", DeepFrozenCounter, ast)
     ast = refactorStructure(ast)
+    timer.lap("refactorStructure", SplitAuditorsCounter, ast)
+    return ast, outerNames, topLocalNames, localSize
+
+
+def evalLowered(lowered, environment, fqnPrefix):
+    ast, outerNames, topLocalNames, localSize = lowered
     outers = env2scope(outerNames, environment)
+    timer = PassTimer(fqnPrefix)
     ast = mix(ast, outers)
+    timer.lap("mix", MixCounter, ast)
+    inliner = InlineCalls(localSize)
+    ast = inliner.visitExpr(ast)
+    localSize = inliner.localSize
+    timer.lap("InlineCalls", MixCounter, ast)
+    ast = ElideGuards().visitExpr(ast)
+    timer.lap("ElideGuards", MixCounter, ast)
+    ast = unboxVars(ast)
+    timer.lap("UnboxVars", MixCounter, ast)
+    ast = hoistFrameReads(ast)
+    timer.lap("HoistFrameReads", MixCounter, ast)
     ast = MakeProfileNames().visitExpr(ast)
+    timer.lap("MakeProfileNames", ProfileNameCounter, ast)
     result = NullObject
     e = Evaluator([], localSize)
     result = e.visitExpr(ast)
@@ -664,12 +1712,110 @@ def evalMonte(expr, environment, fqnPrefix, inRepl=False):
     return result, topLocals
 
 
+def evalMonte(expr, environment, fqnPrefix, inRepl=False):
+    lowered = lowerMonte(expr, environment.keys(), fqnPrefix, inRepl)
+    return evalLowered(lowered, environment, fqnPrefix)
+
+
+def layoutNames(outerNames):
+    """
+    The names of an outer scope, as they matter to a lowered program.
+    """
+
+    # Outer indices are assigned by position in the environment, but the
+    # lowered program carries its own outer-name layout, including the
+    # severity of each outer, so only the set of names matters.
+    names = [name.encode("utf-8") for name in outerNames]
+    names.sort()
+    return names
+
+
+def loweringKey(sourceHash, outerNames, fqnPrefix, inRepl):
+    """
+    The key of a lowered program, given the hash of its MAST and everything
+    else which lowering depends on.
+    """
+
+    h = RSHA(sourceHash)
+    h.update("\x01" if inRepl else "\x00")
+    h.update(fqnPrefix.encode("utf-8"))
+    for name in layoutNames(outerNames):
+        h.update("\x00" + name)
+    return h.hexdigest()
+
+
+class LoweringMemo(object):
+    """
+    Lowered programs, remembered by the hash of their MAST and the names of
+    their outer scope.
+
+    Evaluating the same bytes again only runs the passes which depend on the
+    outer values. The least recently used entries are evicted once there are
+    more than maxSize of them.
+    """
+
+    import_from_mixin(LRU)
+
+    maxSize = 256
+
+    hits = 0
+    misses = 0
+
+    def __init__(self):
+        self.cache = OrderedDict()
+
+    def keyFor(self, bs, outerNames, inRepl):
+        return loweringKey(RSHA(bs).digest(), outerNames, u"<eval>", inRepl)
+
+    def get(self, key):
+        lowered = self.getRecent(key)
+        if lowered is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return lowered
+
+    def put(self, key, lowered):
+        self.putRecent(key, lowered)
+
+    def lower(self, bs, outerNames, inRepl):
+        key = self.keyFor(bs, outerNames, inRepl)
+        lowered = self.get(key)
+        if lowered is None:
+            lowered = lowerMonte(loadMASTBytes(bs), outerNames, u"<eval>",
+                                 inRepl)
+            self.put(key, lowered)
+        return lowered
+
+    def clear(self):
+        self.cache.clear()
+
+loweringMemo = LoweringMemo()
+
+
 def evalToPair(expr, scopeMap, inRepl=False):
     scope = unwrapMap(scopeMap)
     result, topLocals = evalMonte(expr, scope2env(scope), u"<eval>", inRepl)
+    return result, bindTopLocals(scope, topLocals)
+
+
+def evalBytesToPair(bs, scopeMap, inRepl=False):
+    """
+    Like evalToPair(), but from MAST bytes, reusing the lowered program if
+    the same bytes have been evaluated with the same outer names before.
+    """
+
+    scope = unwrapMap(scopeMap)
+    env = scope2env(scope)
+    lowered = loweringMemo.lower(bs, env.keys(), inRepl)
+    result, topLocals = evalLowered(lowered, env, u"<eval>")
+    return result, bindTopLocals(scope, topLocals)
+
+
+def bindTopLocals(scope, topLocals):
     d = scope.copy()
     # XXX Future versions may choose to keep old env structures so that
     # debuggers can rewind and inspect bindings in old REPL lines.
     for name, val in topLocals:
         d[StrObject(u"&&" + name)] = val
-    return result, ConstMap(d)
+    return ConstMap(d)
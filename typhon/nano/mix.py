@@ -13,15 +13,18 @@ from collections import OrderedDict
 from typhon.errors import UserException
 from typhon.nano.scopes import SEV_BINDING, SEV_NOUN, SEV_SLOT
 from typhon.nano.structure import SplitAuditorsIR
-from typhon.objects.auditors import deepFrozenStamp
+from typhon.nanopass import fusePasses
+from typhon.objects.auditors import (deepFrozenStamp, selfless,
+                                     transparentStamp)
+from typhon.objects.collections.maps import ConstMap, EMPTY_MAP, monteMap
+from typhon.objects.constants import FalseObject, TrueObject
 from typhon.objects.data import (BigInt, CharObject, DoubleObject, IntObject,
                                  StrObject)
 from typhon.objects.guards import FinalSlotGuard, VarSlotGuard, anyGuard
 from typhon.objects.slots import Binding, FinalSlot, VarSlot
 
 def mix(ast, outers):
-    ast = FillOuters(outers).visitExpr(ast)
-    ast = ThawLiterals().visitExpr(ast)
+    ast = FillAndThaw(outers).visitExpr(ast)
     ast = SpecializeCalls().visitExpr(ast)
     return ast
 
@@ -116,12 +119,27 @@ class ThawLiterals(NoOutersIR.makePassTo(NoLiteralsIR)):
     def visitStrExpr(self, s):
         return self.dest.LiveExpr(StrObject(s))
 
+# The first stage, in one traversal. SpecializeCalls stays separate, since it
+# chooses which branches of folded ifs to visit at all.
+FillAndThaw = fusePasses(FillOuters, ThawLiterals)
+
 MixIR = NoLiteralsIR.extend("Mix",
     ["Exception"],
     {
         "Expr": {
             "ExceptionExpr": [("exception", "Exception")],
-        }
+            # Assignment to an unboxed var; see t.n.unbox.UnboxVars.
+            "LocalAssignExpr": [("name", "Noun"), ("guard", "Expr"),
+                                ("index", None), ("value", "Expr")],
+        },
+        "Patt": {
+            # Final patterns whose specimens are statically known to pass
+            # their guards; see t.n.interp.ElideGuards.
+            "ProvenFinalSlotPatt": [("name", "Noun"), ("guard", "Expr"),
+                                    ("index", None)],
+            "ProvenFinalBindingPatt": [("name", "Noun"), ("guard", "Expr"),
+                                       ("index", None)],
+        },
     }
 )
 
@@ -142,6 +160,25 @@ class SpecializeCalls(NoLiteralsIR.makePassTo(MixIR)):
                 return obj
         return None
 
+    def enlivenNamedArgs(self, namedArgs):
+        """
+        If every named arg is live, return them as a live map.
+
+        Otherwise, return None.
+        """
+
+        if not namedArgs:
+            return EMPTY_MAP
+        d = monteMap()
+        for namedArg in namedArgs:
+            assert isinstance(namedArg, self.dest.NamedArgExpr), "nameless"
+            key = self.enliven(namedArg.key)
+            value = self.enliven(namedArg.value)
+            if key is None or value is None:
+                return None
+            d[key] = value
+        return ConstMap(d)
+
     def visitCallExpr(self, obj, atom, args, namedArgs):
         obj = self.visitExpr(obj)
         args = [self.visitExpr(arg) for arg in args]
@@ -149,20 +186,131 @@ class SpecializeCalls(NoLiteralsIR.makePassTo(MixIR)):
         liveObj = self.enliven(obj)
         if liveObj is not None:
             liveArgs = [self.enliven(arg) for arg in args]
-            if None not in liveArgs:
-                # XXX named args
-                if not namedArgs:
-                    try:
-                        # Side-effect: The live object might have observable
-                        # side effects even though it is DeepFrozen; in
-                        # particular, traceln() comes to mind. We generally
-                        # don't care about those side effects, and invite them
-                        # for debugging purposes, but it's good to be aware of
-                        # this. ~ C.
-                        result = liveObj.call(atom.verb, liveArgs)
-                        assert result is not None, "livewire"
-                        if result.auditedBy(deepFrozenStamp):
-                            return self.dest.LiveExpr(result)
-                    except UserException as ue:
-                        return self.dest.ExceptionExpr(ue)
+            liveNamedArgs = self.enlivenNamedArgs(namedArgs)
+            if None not in liveArgs and liveNamedArgs is not None:
+                try:
+                    # Side-effect: The live object might have observable side
+                    # effects even though it is DeepFrozen; in particular,
+                    # traceln() comes to mind. We generally don't care about
+                    # those side effects, and invite them for debugging
+                    # purposes, but it's good to be aware of this. ~ C.
+                    result = liveObj.call(atom.verb, liveArgs,
+                                          namedArgs=liveNamedArgs)
+                    assert result is not None, "livewire"
+                    if result.auditedBy(deepFrozenStamp):
+                        return self.dest.LiveExpr(result)
+                except UserException as ue:
+                    return self.dest.ExceptionExpr(ue)
         return self.dest.CallExpr(obj, atom, args, namedArgs)
+
+    def visitIfExpr(self, test, cons, alt):
+        test = self.visitExpr(test)
+        # Only the two booleans are folded; anything else, including refs
+        # which might resolve to booleans, is left for runtime to judge.
+        if isinstance(test, self.dest.LiveExpr):
+            if test.obj is TrueObject:
+                return self.visitExpr(cons)
+            elif test.obj is FalseObject:
+                return self.visitExpr(alt)
+        return self.dest.IfExpr(test, self.visitExpr(cons),
+                                self.visitExpr(alt))
+
+    def isPure(self, expr):
+        return (isinstance(expr, self.dest.LiveExpr) or
+                isinstance(expr, self.dest.NullExpr))
+
+    def visitSeqExpr(self, exprs):
+        rv = []
+        for i, expr in enumerate(exprs):
+            expr = self.visitExpr(expr)
+            last = i == len(exprs) - 1
+            if isinstance(expr, self.dest.SeqExpr) and not last:
+                # Splice, so that the inner sequence's literals go too.
+                for inner in expr.exprs:
+                    if not self.isPure(inner):
+                        rv.append(inner)
+            elif last or not self.isPure(expr):
+                # The last value is the sequence's value; everything else
+                # is only evaluated for effect.
+                rv.append(expr)
+        if not rv:
+            return self.dest.NullExpr()
+        elif len(rv) == 1:
+            return rv[0]
+        return self.dest.SeqExpr(rv)
+
+    def liveStamp(self, expr):
+        """
+        If `expr` is a live stamp whose audit always passes, return it.
+
+        Otherwise, return None.
+        """
+
+        if isinstance(expr, self.dest.LiveExpr):
+            obj = expr.obj
+            if (obj is deepFrozenStamp or obj is selfless or
+                    obj is transparentStamp):
+                return obj
+        return None
+
+    def guardPatt(self, patt, guard):
+        """
+        Give an object's pattern the object's as-auditor as its guard.
+
+        Returns None if the pattern can't hold a guard.
+        """
+
+        if isinstance(patt, self.dest.IgnorePatt):
+            return self.dest.IgnorePatt(guard)
+        elif isinstance(patt, self.dest.NounPatt):
+            return self.dest.NounPatt(patt.name, guard, patt.index)
+        elif isinstance(patt, self.dest.FinalSlotPatt):
+            return self.dest.FinalSlotPatt(patt.name, guard, patt.index)
+        elif isinstance(patt, self.dest.VarSlotPatt):
+            return self.dest.VarSlotPatt(patt.name, guard, patt.index)
+        elif isinstance(patt, self.dest.FinalBindingPatt):
+            return self.dest.FinalBindingPatt(patt.name, guard, patt.index)
+        elif isinstance(patt, self.dest.VarBindingPatt):
+            return self.dest.VarBindingPatt(patt.name, guard, patt.index)
+        return None
+
+    def visitObjectExpr(self, doc, patt, guards, auditors, script, mast,
+                        layout, clipboard):
+        patt = self.visitPatt(patt)
+        auditors = [self.visitExpr(auditor) for auditor in auditors]
+        script = self.visitScript(script)
+        assert isinstance(script, self.dest.ScriptExpr), "manuscript"
+        # Stamps always pass their audits, so they can be applied now rather
+        # than asked at every construction.
+        stamps = []
+        rest = [auditors[0]]
+        for auditor in auditors[1:]:
+            stamp = self.liveStamp(auditor)
+            if stamp is None:
+                rest.append(auditor)
+            elif stamp not in stamps and stamp not in script.stamps:
+                stamps.append(stamp)
+        discharged = len(rest) < len(auditors)
+        # The as-auditor is also the object's guard. It can only go when no
+        # audit is left to be held, and if it passes everything it stamps;
+        # DeepFrozenStamp and Selfless do, but TransparentStamp can't coerce.
+        asStamp = self.liveStamp(auditors[0])
+        if (len(rest) == 1 and asStamp is not None and
+                asStamp is not transparentStamp):
+            guarded = self.guardPatt(patt, auditors[0])
+            if guarded is not None:
+                patt = guarded
+                rest = [self.dest.NullExpr()]
+                discharged = True
+                if asStamp not in stamps and asStamp not in script.stamps:
+                    stamps.append(asStamp)
+        if not discharged:
+            return self.dest.ObjectExpr(doc, patt, guards, auditors, script,
+                                        mast, layout, clipboard)
+        script = self.dest.ScriptExpr(script.stamps + stamps, script.methods,
+                                      script.matchers)
+        if len(rest) == 1 and isinstance(rest[0], self.dest.NullExpr):
+            # No more auditing.
+            return self.dest.ClearObjectExpr(doc, patt, script, layout)
+        return self.dest.ObjectExpr(doc, patt, guards, rest, script, mast,
+                                    layout, clipboard)
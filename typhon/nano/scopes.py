@@ -152,15 +152,32 @@ class ScopeOuter(ScopeBase):
 class FrameTable(object):
     "Static frame layout information."
 
-    __immutable_fields_ = 'dynamicGuards', 'frameInfo[*]', 'names'
+    _immutable_fields_ = ('copyPlan[*]', 'dynamicGuards', 'frameInfo[*]',
+                          'names', 'shareable?')
+
+    # Whether objects built within the same enclosing object may share one
+    # frame; see t.n.auditors.DischargeDF.
+    shareable = False
+
+    # The last shared frame, and the enclosing frame it was copied from; see
+    # t.n.interp.Evaluator.
+    sharedFrom = None
+    sharedFrame = None
 
     def __init__(self, frameInfo):
         self.frameInfo = frameInfo
         self.names = OrderedDict()
         self.dynamicGuards = OrderedDict()
-        for i, (name, _, _, severity) in enumerate(frameInfo):
+        # Where each entry is copied from when building a frame: locals are
+        # numbered from 0, and entries of the enclosing frame from -1 down.
+        self.copyPlan = []
+        for i, (name, scope, idx, severity) in enumerate(frameInfo):
             self.names[name] = i
             self.dynamicGuards[name] = i
+            if scope is SCOPE_LOCAL:
+                self.copyPlan.append(idx)
+            else:
+                self.copyPlan.append(-1 - idx)
 
     def positionOf(self, name):
         """
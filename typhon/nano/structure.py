@@ -9,14 +9,12 @@ from rpython.rlib.rbigint import BASE10
 from typhon.atoms import getAtom
 from typhon.nano.mast import BuildKernelNodes
 from typhon.nano.auditors import DeepFrozenIR
+from typhon.nanopass import fusePasses
 from typhon.objects.user import AuditClipboard
 from typhon.quoting import quoteChar, quoteStr
 
 def refactorStructure(ast):
-    ast = RemoveDefIgnore().visitExpr(ast)
-    ast = SplitScript().visitExpr(ast)
-    ast = MakeAtoms().visitExpr(ast)
-    ast = SplitAuditors().visitExpr(ast)
+    ast = RefactorStructure().visitExpr(ast)
     return ast
 
 class RemoveDefIgnore(DeepFrozenIR.selfPass()):
@@ -31,10 +29,12 @@ class RemoveDefIgnore(DeepFrozenIR.selfPass()):
     def visitDefExpr(self, patt, ex, rvalue):
         if isinstance(patt, self.src.IgnorePatt):
             guard = patt.guard
+            rvalue = self.visitExpr(rvalue)
             if isinstance(guard, self.src.NullExpr):
                 return rvalue
             else:
-                return self.dest.CallExpr(guard, u"coerce", [rvalue, ex], [])
+                return self.dest.CallExpr(self.visitExpr(guard), u"coerce",
+                                          [rvalue, self.visitExpr(ex)], [])
         return self.super.visitDefExpr(self, patt, ex, rvalue)
 
 SplitScriptIR = DeepFrozenIR.extend("SplitScript", [],
@@ -122,12 +122,17 @@ class SplitAuditors(AtomIR.makePassTo(SplitAuditorsIR)):
             # No more auditing.
             return self.dest.ClearObjectExpr(doc, patt, script, layout)
         else:
-            # Runtime auditing.
+            # Runtime auditing. Keep the MAST around as well as the kernel
+            # AST, so that the lowered object can be serialized.
             ast = BuildKernelNodes().visitExpr(mast)
             clipboard = AuditClipboard(layout.fqn, ast)
-            return self.dest.ObjectExpr(doc, patt, auditors, script, ast,
+            return self.dest.ObjectExpr(doc, patt, auditors, script, mast,
                                         layout, clipboard)
 
+# All of the above, in one traversal.
+RefactorStructure = fusePasses(RemoveDefIgnore, SplitScript, MakeAtoms,
+                               SplitAuditors)
+
 # Pretty-printer for the final pass.
 
 def prettifyStructure(ast):
@@ -238,6 +243,32 @@ class PrettySpecialNouns(SplitAuditorsIR.makePassTo(None)):
         with self.braces():
             self.visitExpr(catchBody)
 
+    def visitLocalEscapeOnlyExpr(self, name, index, body):
+        self.write(u"escape ")
+        self.write(name)
+        self.write(asIndex(index))
+        with self.braces():
+            self.visitExpr(body)
+
+    def visitLocalEscapeExpr(self, name, index, body, catchPatt, catchBody):
+        self.write(u"escape ")
+        self.write(name)
+        self.write(asIndex(index))
+        with self.braces():
+            self.visitExpr(body)
+        self.write(u" catch ")
+        self.visitPatt(catchPatt)
+        with self.braces():
+            self.visitExpr(catchBody)
+
+    def visitLocalEjectExpr(self, name, index, value):
+        self.write(name)
+        self.write(u"⒧")
+        self.write(asIndex(index))
+        self.write(u"(")
+        self.visitExpr(value)
+        self.write(u")")
+
     def visitFinallyExpr(self, body, atLast):
         self.write(u"try")
         with self.braces():
@@ -0,0 +1,184 @@
+"""
+Unboxing of var slots which never escape their methods.
+"""
+
+from typhon.atoms import getAtom
+from typhon.nano.mix import MixIR
+from typhon.nano.scopes import SCOPE_LOCAL
+
+GET_0 = getAtom(u"get", 0)
+PUT_1 = getAtom(u"put", 1)
+
+def unboxVars(ast):
+    ast = UnboxVars().visitExpr(ast)
+    return ast
+
+def sameGuard(left, right):
+    if isinstance(left, MixIR.NullExpr):
+        return isinstance(right, MixIR.NullExpr)
+    elif isinstance(left, MixIR.LiveExpr):
+        return isinstance(right, MixIR.LiveExpr) and left.obj is right.obj
+    return False
+
+class FindBoxedVars(MixIR.selfPass()):
+    """
+    Find the var slots of a single method which must stay boxed.
+
+    A var slot can be unboxed if its guard can be re-evaluated freely, every
+    pattern binding its local is such a var pattern with the same guard, and
+    the local is only ever read with .get/0 or written with .put/1. Slots
+    which are reified with `&`, or closed over by objects, stay boxed.
+    """
+
+    def __init__(self):
+        self.guards = {}
+        self.boxed = {}
+
+    def unboxed(self):
+        rv = {}
+        for index, guard in self.guards.items():
+            if index not in self.boxed:
+                rv[index] = guard
+        return rv
+
+    def box(self, index):
+        self.boxed[index] = None
+
+    def visitVarSlotPatt(self, name, guard, index):
+        guard = self.visitExpr(guard)
+        if not (isinstance(guard, self.dest.NullExpr) or
+                isinstance(guard, self.dest.LiveExpr)):
+            self.box(index)
+        elif index not in self.guards:
+            self.guards[index] = guard
+        elif not sameGuard(self.guards[index], guard):
+            self.box(index)
+        return self.dest.VarSlotPatt(name, guard, index)
+
+    def visitNounPatt(self, name, guard, index):
+        self.box(index)
+        return self.super.visitNounPatt(self, name, guard, index)
+
+    def visitBindingPatt(self, name, index):
+        self.box(index)
+        return self.dest.BindingPatt(name, index)
+
+    def visitFinalSlotPatt(self, name, guard, index):
+        self.box(index)
+        return self.super.visitFinalSlotPatt(self, name, guard, index)
+
+    def visitFinalBindingPatt(self, name, guard, index):
+        self.box(index)
+        return self.super.visitFinalBindingPatt(self, name, guard, index)
+
+    def visitVarBindingPatt(self, name, guard, index):
+        self.box(index)
+        return self.super.visitVarBindingPatt(self, name, guard, index)
+
+    def visitProvenFinalSlotPatt(self, name, guard, index):
+        self.box(index)
+        return self.super.visitProvenFinalSlotPatt(self, name, guard, index)
+
+    def visitProvenFinalBindingPatt(self, name, guard, index):
+        self.box(index)
+        return self.super.visitProvenFinalBindingPatt(self, name, guard,
+                                                      index)
+
+    def visitCallExpr(self, obj, atom, args, namedArgs):
+        if (isinstance(obj, self.dest.LocalExpr) and not namedArgs and
+                (atom is GET_0 or atom is PUT_1)):
+            args = [self.visitExpr(arg) for arg in args]
+            return self.dest.CallExpr(obj, atom, args, namedArgs)
+        return self.super.visitCallExpr(self, obj, atom, args, namedArgs)
+
+    def visitLocalExpr(self, name, index):
+        self.box(index)
+        return self.dest.LocalExpr(name, index)
+
+    def visitLocalAssignExpr(self, name, guard, index, value):
+        # Already unboxed, by an earlier pass over an inlined method.
+        self.box(index)
+        return self.super.visitLocalAssignExpr(self, name, guard, index,
+                                               value)
+
+    def boxFrame(self, layout):
+        for (_, scope, index, _) in layout.frameTable.frameInfo:
+            if scope is SCOPE_LOCAL:
+                self.box(index)
+
+    # Scripts have their own locals, and are not searched.
+
+    def visitObjectExpr(self, doc, patt, guards, auditors, script, mast,
+                        layout, clipboard):
+        self.boxFrame(layout)
+        patt = self.visitPatt(patt)
+        auditors = [self.visitExpr(auditor) for auditor in auditors]
+        return self.dest.ObjectExpr(doc, patt, guards, auditors, script, mast,
+                                    layout, clipboard)
+
+    def visitClearObjectExpr(self, doc, patt, script, layout):
+        self.boxFrame(layout)
+        patt = self.visitPatt(patt)
+        return self.dest.ClearObjectExpr(doc, patt, script, layout)
+
+class UnboxVars(MixIR.selfPass()):
+    """
+    Store var slots which never escape their method directly in the
+    method's locals.
+
+    Var patterns become noun patterns, reads become plain local reads, and
+    writes become local assignments which coerce with the var's guard.
+    Top-level locals are left boxed, since they are exported as bindings.
+    """
+
+    def __init__(self):
+        # The guards of the current method's unboxed vars.
+        self.unboxed = {}
+
+    def visitVarSlotPatt(self, name, guard, index):
+        if index in self.unboxed:
+            return self.dest.NounPatt(name, self.visitExpr(guard), index)
+        return self.super.visitVarSlotPatt(self, name, guard, index)
+
+    def visitCallExpr(self, obj, atom, args, namedArgs):
+        if (isinstance(obj, self.dest.LocalExpr) and
+                obj.index in self.unboxed):
+            if atom is GET_0:
+                return obj
+            elif atom is PUT_1:
+                return self.dest.LocalAssignExpr(obj.name,
+                                                 self.unboxed[obj.index],
+                                                 obj.index,
+                                                 self.visitExpr(args[0]))
+        return self.super.visitCallExpr(self, obj, atom, args, namedArgs)
+
+    def visitMethodExpr(self, doc, atom, patts, namedPatts, guard, body,
+                        localSize):
+        finder = FindBoxedVars()
+        for patt in patts:
+            finder.visitPatt(patt)
+        for namedPatt in namedPatts:
+            finder.visitNamedPatt(namedPatt)
+        finder.visitExpr(guard)
+        finder.visitExpr(body)
+        unboxed = self.unboxed
+        self.unboxed = finder.unboxed()
+        patts = [self.visitPatt(patt) for patt in patts]
+        namedPatts = [self.visitNamedPatt(namedPatt) for namedPatt in
+                      namedPatts]
+        guard = self.visitExpr(guard)
+        body = self.visitExpr(body)
+        self.unboxed = unboxed
+        return self.dest.MethodExpr(doc, atom, patts, namedPatts, guard, body,
+                                    localSize)
+
+    def visitMatcherExpr(self, patt, body, localSize):
+        finder = FindBoxedVars()
+        finder.visitPatt(patt)
+        finder.visitExpr(body)
+        unboxed = self.unboxed
+        self.unboxed = finder.unboxed()
+        patt = self.visitPatt(patt)
+        body = self.visitExpr(body)
+        self.unboxed = unboxed
+        return self.dest.MatcherExpr(patt, body, localSize)
@@ -137,6 +137,44 @@ def visit%(name)s(self, specimen):
         return Pass
     irAttrs["makePassTo"] = makePassTo
 
+    def makeNodeCounter(self):
+        """
+        Construct a pass which counts the nodes in a tree of this IR.
+        """
+
+        attrs = {}
+        for nonterm, constructors in self.nonterms.iteritems():
+            for constructor, pieces in constructors.iteritems():
+                visitName = "visit%s" % constructor
+                # Only non-terminals are nodes; terminals and untyped
+                # elements are not counted.
+                lines = ["rv = 1"]
+                for piece, ty in pieces:
+                    if not ty:
+                        continue
+                    if ty.endswith('*'):
+                        ty = ty[:-1]
+                        if ty in self.nonterms:
+                            lines.append("for x in %s: rv += self.visit%s(x)"
+                                         % (piece, ty))
+                    elif ty in self.nonterms:
+                        lines.append("rv += self.visit%s(%s)" % (ty, piece))
+                params = {
+                    "args": ",".join(p[0] for p in pieces),
+                    "name": visitName,
+                    "body": "\n    ".join(lines),
+                }
+                d = {}
+                exec py.code.Source("""
+def %(name)s(self, %(args)s):
+    %(body)s
+    return rv
+                """ % params).compile() in d
+                attrs[visitName] = d[visitName]
+                attrs[visitName].__name__ += str(increment())
+        return type("NodeCounter", (self.makePassTo(None),), attrs)
+    irAttrs["makeNodeCounter"] = makeNodeCounter
+
     def extend(self, name, terminals, nonterms):
         ts = self.terminals[:]
         for t in terminals:
@@ -178,3 +216,50 @@ def visit%(name)s(self, specimen):
     irAttrs["selfPass"] = selfPass
 
     return type(name + "IR", (object,), irAttrs)()
+
+def fusePasses(*passes):
+    """
+    Fuse a chain of passes into a single traversal.
+
+    The fused pass runs the first pass, but each node built by a pass is
+    handed straight to the next pass, whose visitor sees its children already
+    rewritten. So, only the first pass may inspect nodes of its source IR,
+    only the last pass may inspect nodes of its destination IR, and no pass
+    may revisit nodes of its own making. Every pass but the first must take
+    no arguments.
+    """
+
+    dest = passes[-1].dest
+    for p in reversed(passes[1:]):
+        assert p.src is not None, "fusePasses: Missing source IR"
+        # Nodes arrive already rewritten, so don't recurse into them again.
+        attrs = {}
+        for nonterm in p.src.nonterms:
+            def visitor(self, specimen):
+                return specimen
+            visitor.__name__ = "visit" + nonterm
+            attrs[visitor.__name__] = visitor
+        attrs["dest"] = dest
+        stage = type("Shallow" + p.__name__, (p,), attrs)()
+
+        # Building a node of this pass's source IR hands it to the stage.
+        builders = {}
+        for nonterm, constructors in p.src.nonterms.iteritems():
+            for constructor, pieces in constructors.iteritems():
+                params = {
+                    "args": ",".join(piece[0] for piece in pieces),
+                    "constructor": constructor,
+                }
+                d = {}
+                exec py.code.Source("""
+                    def %(constructor)s(self, %(args)s):
+                        return self.stage.visit%(constructor)s(%(args)s)
+                """ % params).compile() in d
+                builders[constructor] = d[constructor]
+        Builder = type("Fused" + p.src.__class__.__name__, (object,),
+                       builders)
+        dest = Builder()
+        dest.stage = stage
+
+    first = passes[0]
+    return type("Fused" + first.__name__, (first,), {"dest": dest})
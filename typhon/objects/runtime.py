@@ -3,6 +3,7 @@ from rpython.rlib.rerased import new_erasing_pair
 
 # from typhon import ruv
 from typhon.autohelp import autohelp, method
+from typhon.importing import moduleCache
 from typhon.nano.interp import InterpObject
 from typhon.objects.collections.lists import wrapList
 from typhon.objects.collections.maps import monteMap
@@ -138,6 +139,45 @@ def makeReactorStats():
     return LoopStats(loop)
 
 
+@autohelp
+class ModuleCacheStats(Object):
+    """
+    A snapshot of the counters of the module cache.
+    """
+
+    def __init__(self, cache):
+        self.size = len(cache.cache)
+        self.hits = cache.hits
+        self.misses = cache.misses
+        self.invalidations = cache.invalidations
+        self.evictions = cache.evictions
+        self.loadTime = cache.loadTime
+
+    @method("Int")
+    def getSize(self):
+        return self.size
+
+    @method("Int")
+    def getHits(self):
+        return self.hits
+
+    @method("Int")
+    def getMisses(self):
+        return self.misses
+
+    @method("Int")
+    def getInvalidations(self):
+        return self.invalidations
+
+    @method("Int")
+    def getEvictions(self):
+        return self.evictions
+
+    @method("Double")
+    def getLoadTime(self):
+        return self.loadTime
+
+
 @autohelp
 class CurrentRuntime(Object):
     """
@@ -161,3 +201,7 @@ class CurrentRuntime(Object):
     @method("Any")
     def getReactorStatistics(self):
         return makeReactorStats()
+
+    @method("Any")
+    def getModuleCacheStatistics(self):
+        return ModuleCacheStats(moduleCache)
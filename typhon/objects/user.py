@@ -156,11 +156,14 @@ class Audition(Object):
                 self.guardLog = None
         return answer
 
-    def prepareReport(self, auditors):
+    def prepareReport(self, auditors, stamps):
         s = monteSet()
         for (k, (result, _, _)) in self.cache.items():
             if result:
                 s[k] = None
+        # Stamps discharged before the audition still belong in the report.
+        for stamp in stamps:
+            s[stamp] = None
         return AuditorReport(s)
 
     @method("Any")
@@ -240,7 +243,7 @@ class AuditClipboard(object):
         else:
             self.reportCabinet.append((auditors, [(gs, report)]))
 
-    def createReport(self, auditors, guards):
+    def createReport(self, auditors, guards, stamps):
         """
         Do an audit, make a report from the results.
         """
@@ -248,18 +251,19 @@ class AuditClipboard(object):
         with Audition(self.fqn, self.ast, guards) as audition:
             for a in auditors:
                 audition.ask(a)
-        return audition.prepareReport(auditors)
+        return audition.prepareReport(auditors, stamps)
 
-    def audit(self, auditors, guards):
+    def audit(self, auditors, guards, stamps):
         """
-        Hold an audition and return a report of the results.
+        Hold an audition and return a report of the results, including the
+        script's stamps.
 
         Auditions are cached for quality assurance and training purposes.
         """
 
         report = self.getReport(auditors, guards)
         if report is None:
-            report = self.createReport(auditors, guards)
+            report = self.createReport(auditors, guards, stamps)
             self.putReport(auditors, guards, report)
         return report
 
@@ -17,9 +17,8 @@ from typhon.atoms import getAtom
 from typhon.autohelp import autohelp, method
 from typhon.errors import userError
 from typhon.importing import AstModule, obtainModule
-from typhon.load.nano import loadMASTBytes as realLoad
-from typhon.nano.interp import (evalToPair as astEvalToPair,
-                                scope2env)
+from typhon.load.nano import MASTStream, openMAST
+from typhon.nano.interp import evalBytesToPair, scope2env
 from typhon.nodes import kernelAstStamp
 from typhon.objects.auditors import deepFrozenStamp, transparentStamp
 from typhon.objects.collections.lists import ConstList
@@ -58,7 +57,7 @@ def moduleFromString(source, recorder):
     # propagate. ~ C.
     assert isinstance(source, bytes)
     mod = AstModule(recorder, u"<eval>")
-    mod.load(source)
+    mod.load(MASTStream(source))
     return mod
 
 
@@ -75,11 +74,11 @@ class GetMonteFile(Object):
             path = pname.encode("utf-8") + extension
             for base in self.paths:
                 try:
-                    with open(os.path.join(base, path), "rb") as handle:
-                        source = handle.read()
-                        mod = AstModule(self.recorder, pname)
-                        mod.load(source)
-                        return mod
+                    fullpath = os.path.join(base, path)
+                    source = openMAST(fullpath)
+                    mod = AstModule(self.recorder, pname)
+                    mod.load(source, fullpath)
+                    return mod
                 except IOError:
                     continue
         raise userError(u"Could not locate " + pname)
@@ -100,17 +99,15 @@ class AstEval(Object):
     @method("Any", "Any", "Any")
     @profileTyphon("astEval.run/2")
     def run(self, bs, scope):
-        ast = realLoad(unwrapBytes(bs))
-        return astEvalToPair(ast, scope)[0]
+        return evalBytesToPair(unwrapBytes(bs), scope)[0]
 
     @method("List", "Any", "Any", inRepl="Any")
     def evalToPair(self, bs, scope, inRepl=False):
-        ast = realLoad(unwrapBytes(bs))
         if inRepl is None:
             inRepl = False
         else:
             inRepl = unwrapBool(inRepl)
-        result, envMap = astEvalToPair(ast, scope, inRepl)
+        result, envMap = evalBytesToPair(unwrapBytes(bs), scope, inRepl)
         return [result, envMap]
 
 
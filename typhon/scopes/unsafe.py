@@ -13,23 +13,37 @@
 # under the License.
 import os
 
+from rpython.rlib.rarithmetic import intmask
+
+from typhon import ruv
+from typhon.atoms import getAtom
 from typhon.autohelp import autohelp, method
+from typhon.errors import userError
+from typhon.importing import AstModule, findTyphonFile
+from typhon.load.nano import InvalidMAST, MASTStream
+from typhon.metrics import globalRecorder
+from typhon.nano.interp import scope2env
+from typhon.objects.collections.maps import EMPTY_MAP, monteMap, unwrapMap
 from typhon.objects.constants import NullObject
-from typhon.objects.data import StrObject
+from typhon.objects.data import StrObject, unwrapStr
 from typhon.objects.exceptions import unsealException
-from typhon.objects.files import makeFileResource
+from typhon.objects.files import GetContents, makeFileResource
 from typhon.objects.networking.dns import getAddrInfo
 from typhon.objects.networking.endpoints import (makeTCP4ClientEndpoint,
                                                  makeTCP4ServerEndpoint)
 from typhon.objects.networking.stdio import (makeStdErr, makeStdIn,
         makeStdOut, stdio)
 from typhon.objects.processes import CurrentProcess, makeProcess
+from typhon.objects.refs import makePromise
 from typhon.objects.root import Object, audited
 from typhon.objects.runtime import CurrentRuntime
 from typhon.objects.slots import finalize
 from typhon.objects.timeit import bench
 from typhon.objects.timers import Timer
-from typhon.vats import CurrentVatProxy
+from typhon.vats import CurrentVatProxy, currentVat, scopedVat
+
+
+RUN_0 = getAtom(u"run", 0)
 
 
 @autohelp
@@ -40,13 +54,114 @@ class FindTyphonFile(Object):
 
     @method("Any", "Str")
     def run(self, pname):
-        for extension in [".ty", ".mast"]:
-            path = pname.encode("utf-8") + extension
-            for base in self.paths:
-                fullpath = os.path.join(base, path)
-                if os.path.exists(fullpath):
-                    return StrObject(fullpath.decode("utf-8"))
-        return NullObject
+        fullpath = findTyphonFile(self.paths, pname)
+        if fullpath is None:
+            return NullObject
+        return StrObject(fullpath.decode("utf-8"))
+
+
+@autohelp
+class ModuleEvaluator(Object):
+    """
+    A decoded module, waiting for its turn to be evaluated.
+    """
+
+    def __init__(self, module, env):
+        self.module = module
+        self.env = env
+
+    @method("Any")
+    def run(self):
+        # With the lowered cache, a module is only decoded on a miss, so a
+        # damaged module can turn up here; it breaks the module's promise.
+        try:
+            return self.module.eval(self.env)[0]
+        except InvalidMAST:
+            raise userError(u"Couldn't decode module %s" %
+                            self.module.origin)
+
+
+class ModuleContents(GetContents):
+    """
+    A module file being read by loadTyphonFiles.
+    """
+
+    def __init__(self, vat, fs, resolver, origin, path, env):
+        GetContents.__init__(self, vat, fs, -1, resolver)
+        self.origin = origin
+        self.path = path
+        self.env = env
+
+    def succeed(self):
+        ruv.fsClose(self.vat.uv_loop, self.fs, self.fd, ruv.fsDiscard)
+
+        # Decode, or with the lowered cache hash, right away, while the other
+        # reads are still in flight, but leave evaluation, which runs user
+        # code, for a turn.
+        module = AstModule(globalRecorder(), self.origin)
+        try:
+            module.load(MASTStream("".join(self.pieces)), self.path)
+        except InvalidMAST:
+            self.resolver.smash(StrObject(u"Couldn't decode module %s" %
+                                          self.origin))
+            return
+        evaluator = ModuleEvaluator(module, self.env)
+        self.resolver.resolve(self.vat.send(evaluator, RUN_0, [], EMPTY_MAP))
+
+
+def openModuleContentsCB(fs):
+    try:
+        fd = intmask(fs.c_result)
+        vat, mc = ruv.unstashFS(fs)
+        assert isinstance(mc, ModuleContents)
+        with scopedVat(vat):
+            if fd < 0:
+                msg = ruv.formatError(fd).decode("utf-8")
+                mc.resolver.smash(StrObject(u"Couldn't open module %s: %s" %
+                                            (mc.origin, msg)))
+                # Done with fs.
+                ruv.fsDiscard(fs)
+            else:
+                mc.fd = fd
+                ruv.stashFS(fs, (vat, mc))
+                mc.queueRead()
+    except:
+        print "Exception in openModuleContentsCB"
+
+
+@autohelp
+@audited.DF
+class LoadTyphonFiles(Object):
+    """
+    Load many modules at once.
+
+    All of the module files are read concurrently, and each is decoded as
+    soon as it arrives; each module is then evaluated in `scope` in its own
+    turn. Returns a map of module names to promises for evaluated modules.
+    """
+
+    def __init__(self, paths):
+        self.paths = paths
+
+    @method("Map", "List", "Any")
+    def run(self, pnames, scope):
+        vat = currentVat.get()
+        env = scope2env(unwrapMap(scope))
+        rv = monteMap()
+        for pnameObj in pnames:
+            pname = unwrapStr(pnameObj)
+            p, r = makePromise()
+            rv[pnameObj] = p
+            fullpath = findTyphonFile(self.paths, pname)
+            if fullpath is None:
+                r.smash(StrObject(u"Unable to locate %s" % pname))
+                continue
+            fs = ruv.alloc_fs()
+            # Stashes itself on fs.
+            ModuleContents(vat, fs, r, pname, fullpath, env)
+            ruv.fsOpen(vat.uv_loop, fs, fullpath, os.O_RDONLY, 0000,
+                       openModuleContentsCB)
+        return rv
 
 
 def unsafeScope(config):
@@ -57,6 +172,7 @@ def unsafeScope(config):
         u"currentRuntime": CurrentRuntime(),
         u"currentVat": CurrentVatProxy(),
         u"_findTyphonFile": FindTyphonFile(config.libraryPaths),
+        u"_loadTyphonFiles": LoadTyphonFiles(config.libraryPaths),
         u"getAddrInfo": getAddrInfo(),
         u"makeFileResource": makeFileResource(),
         u"makeProcess": makeProcess(),
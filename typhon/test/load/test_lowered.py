@@ -0,0 +1,46 @@
+from unittest import TestCase
+
+from typhon.load.lowered import dumpLowered, loadLoweredBytes
+from typhon.load.nano import (InvalidMAST, dumpMASTBytes, loadMASTBytes)
+from typhon.nano.interp import lowerMonte
+from typhon.nano.mast import MastIR
+
+data = (
+    "Mont\xe0MAST\x00" # magic
+    "LN"               # null
+    "N\x03Int"         # Int
+    "PF\x01x\x01"      # x :Int
+    "LI\x54"           # 42
+    "D\x00\x00\x02"    # def x :Int := 42
+)
+
+
+class TestDumpMAST(TestCase):
+
+    def testRoundTrip(self):
+        expr = loadMASTBytes(dumpMASTBytes(loadMASTBytes(data)))
+        self.assertTrue(isinstance(expr, MastIR.DefExpr))
+        self.assertEqual(expr.patt.name, u"x")
+        self.assertEqual(expr.rvalue.i.toint(), 42)
+
+    def testFixedPoint(self):
+        bs = dumpMASTBytes(loadMASTBytes(data))
+        self.assertEqual(dumpMASTBytes(loadMASTBytes(bs)), bs)
+
+
+class TestLowered(TestCase):
+
+    def testRoundTrip(self):
+        lowered = lowerMonte(loadMASTBytes(data), [u"Int"], u"test")
+        bs = dumpLowered(lowered)
+        ast, outerNames, topLocalNames, localSize = loadLoweredBytes(bs)
+        self.assertEqual(outerNames.keys(), [u"Int"])
+        self.assertEqual([name for (name, _) in topLocalNames], [u"x"])
+        self.assertEqual(localSize, lowered[3])
+        self.assertEqual(dumpLowered((ast, outerNames, topLocalNames,
+                                      localSize)), bs)
+
+    def testWrongVersion(self):
+        bs = dumpLowered(lowerMonte(loadMASTBytes(data), [u"Int"], u"test"))
+        bs = bs[:10] + "\x7f" + bs[11:]
+        self.assertRaises(InvalidMAST, loadLoweredBytes, bs)
@@ -0,0 +1,136 @@
+import os
+from tempfile import mkstemp
+from unittest import TestCase
+
+from typhon.load.nano import (InvalidMAST, MAGIC_V1, MappedMASTStream,
+                              MASTSink, MASTStream, dumpMASTBytes,
+                              dumpMASTv1Bytes, loadMAST, loadMASTBytes,
+                              loadMASTStream, openMAST)
+from typhon.nano.mast import MastIR
+
+# object o as null { method run(x) { x } }
+null = MastIR.NullExpr()
+obj = MastIR.ObjectExpr(u"", MastIR.FinalPatt(u"o", null), [null],
+    [MastIR.MethodExpr(u"", u"run", [MastIR.FinalPatt(u"x", null)], [],
+                       null, MastIR.NounExpr(u"x"))],
+    [])
+
+
+class TestMASTStream(TestCase):
+
+    def testNextInt(self):
+        for i in [0, 1, 0x7f, 0x80, 300, 2 ** 40]:
+            sink = MASTSink()
+            sink.putInt(i)
+            self.assertEqual(MASTStream(sink.getvalue()).nextInt(), i)
+
+    def testNextIntOverflow(self):
+        stream = MASTStream("\xff" * 10 + "\x01")
+        self.assertRaises(InvalidMAST, stream.nextInt)
+
+    def testNextStr(self):
+        stream = MASTStream("\x03abc\x02\xc3\xa9")
+        self.assertEqual(stream.nextStr(), u"abc")
+        self.assertEqual(stream.nextStr(), u"\xe9")
+        self.assertTrue(stream.exhausted())
+
+    def testNextStrUnderrun(self):
+        stream = MASTStream("\x04abc")
+        self.assertRaises(InvalidMAST, stream.nextStr)
+
+    def testWindow(self):
+        stream = MASTStream("\x01\x02\x03")
+        window = stream.window(1, 2)
+        self.assertEqual(window.nextInt(), 2)
+        self.assertTrue(window.exhausted())
+        self.assertRaises(InvalidMAST, stream.window, 2, 4)
+
+    def testNextZigZag(self):
+        stream = MASTStream("\xff" * 10 + "\x01")
+        self.assertEqual(stream.nextZigZag().tolong(), -(2 ** 70))
+
+
+class TestInterning(TestCase):
+
+    def testLeaves(self):
+        # [f.run(x), f.run(x)], built without any sharing.
+        call = lambda: MastIR.CallExpr(MastIR.NounExpr(u"f"), u"run",
+                                       [MastIR.NounExpr(u"x")], [])
+        expr = loadMASTBytes(dumpMASTBytes(MastIR.SeqExpr([call(), call()])))
+        first, second = expr.exprs
+        self.assertFalse(first is second)
+        self.assertTrue(first.obj is second.obj)
+        self.assertTrue(first.args[0] is second.args[0])
+        self.assertTrue(first.verb is second.verb)
+
+    def testDistinctLeaves(self):
+        expr = loadMASTBytes(dumpMASTBytes(MastIR.SeqExpr([
+            MastIR.NounExpr(u"x"), MastIR.NounExpr(u"y")])))
+        first, second = expr.exprs
+        self.assertEqual(first.name, u"x")
+        self.assertEqual(second.name, u"y")
+
+    def testVersionOne(self):
+        # Version one pools its strings, and isn't interned any further.
+        expr = loadMASTBytes(dumpMASTv1Bytes(MastIR.SeqExpr([
+            MastIR.NounExpr(u"x"), MastIR.NounExpr(u"x")])))
+        first, second = expr.exprs
+        self.assertFalse(first is second)
+        self.assertTrue(first.name is second.name)
+
+
+class TestMASTv1(TestCase):
+
+    def testRoundTrip(self):
+        bs = dumpMASTv1Bytes(obj)
+        expr = loadMASTBytes(bs)
+        self.assertEqual(dumpMASTv1Bytes(expr), bs)
+        self.assertEqual(dumpMASTBytes(expr), dumpMASTBytes(obj))
+
+    def testStringPool(self):
+        bs = dumpMASTv1Bytes(obj)
+        self.assertEqual(bs.count("run"), 1)
+        self.assertEqual(bs.count("x"), 1)
+
+    def testMissingSection(self):
+        bs = MAGIC_V1 + "\x00"
+        self.assertRaises(InvalidMAST, loadMASTBytes, bs)
+
+    def testWrongMagic(self):
+        self.assertRaises(InvalidMAST, loadMASTBytes, "Mont\xe0MAST\x7f")
+
+
+class TestMappedMAST(TestCase):
+
+    def setUp(self):
+        fd, self.path = mkstemp(suffix=".mast")
+        os.close(fd)
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def write(self, bs):
+        with open(self.path, "wb") as handle:
+            handle.write(bs)
+
+    def testMapped(self):
+        bs = dumpMASTv1Bytes(obj)
+        self.write(bs)
+        stream = openMAST(self.path)
+        self.assertTrue(isinstance(stream, MappedMASTStream))
+        expr = loadMAST(self.path)
+        self.assertEqual(dumpMASTv1Bytes(expr), bs)
+
+    def testClosed(self):
+        bs = dumpMASTv1Bytes(obj)
+        self.write(bs)
+        stream = openMAST(self.path)
+        expr = loadMASTStream(stream)
+        stream.close()
+        self.assertTrue(stream.mapping.closed)
+        self.assertEqual(dumpMASTv1Bytes(expr), bs)
+
+    def testEmpty(self):
+        self.write("")
+        self.assertFalse(isinstance(openMAST(self.path), MappedMASTStream))
+        self.assertRaises(InvalidMAST, loadMAST, self.path)
@@ -0,0 +1,118 @@
+from unittest import TestCase
+
+from typhon.atoms import getAtom
+from typhon.nano.bytecode import LazyCode, engineSettings, runCode
+from typhon.nano.interp import (CallSite, CompileBytecode, Evaluator,
+                                InterpObject, MethodTable, ProfileNameIR,
+                                literalKeys)
+from typhon.objects.collections.maps import EMPTY_MAP
+from typhon.objects.constants import wrapBool
+from typhon.objects.data import IntObject, StrObject
+
+ADD_1 = getAtom(u"add", 1)
+RUN_1 = getAtom(u"run", 1)
+
+def live(obj):
+    return ProfileNameIR.LiveExpr(obj)
+
+def local(index):
+    return ProfileNameIR.LocalExpr(u"x", index)
+
+def add(left, right):
+    return ProfileNameIR.CallExpr(left, ADD_1, [right], [], CallSite(ADD_1))
+
+def run(body, localSize, *args):
+    code = CompileBytecode("test", localSize).compileBody(body)
+    e = Evaluator([], code.registers)
+    for i, arg in enumerate(args):
+        e.locals[i] = arg
+    return code, runCode(code, e)
+
+
+class TestBytecode(TestCase):
+
+    def testCall(self):
+        code, result = run(add(local(0), live(IntObject(2))), 1,
+                           IntObject(40))
+        self.assertEqual(result.getInt(), 42)
+        self.assertEqual(code.registers, 4)
+
+    def testIf(self):
+        body = ProfileNameIR.IfExpr(local(0), live(IntObject(1)),
+                                    live(IntObject(2)))
+        _, result = run(body, 1, wrapBool(True))
+        self.assertEqual(result.getInt(), 1)
+        _, result = run(body, 1, wrapBool(False))
+        self.assertEqual(result.getInt(), 2)
+
+    def testDef(self):
+        # def y := x + x; y + y
+        body = ProfileNameIR.SeqExpr([
+            ProfileNameIR.DefExpr(
+                ProfileNameIR.NounPatt(u"y", ProfileNameIR.NullExpr(), 1),
+                ProfileNameIR.NullExpr(), add(local(0), local(0))),
+            add(local(1), local(1))])
+        code, result = run(body, 2, IntObject(3))
+        self.assertEqual(result.getInt(), 12)
+        ops = [line.split()[1] for line in code.disassemble()]
+        self.assertFalse("EVAL" in ops)
+
+    def testAssign(self):
+        body = ProfileNameIR.SeqExpr([
+            ProfileNameIR.LocalAssignExpr(u"x", ProfileNameIR.NullExpr(), 0,
+                                          live(IntObject(7))),
+            local(0)])
+        _, result = run(body, 1, IntObject(1))
+        self.assertEqual(result.getInt(), 7)
+
+    def testFallback(self):
+        # escape ej { ej(5) } + 1, with the escape left to the evaluator.
+        ej = ProfileNameIR.LocalEjectExpr(u"ej", 0, live(IntObject(5)))
+        escape = ProfileNameIR.LocalEscapeOnlyExpr(u"ej", 0, ej)
+        code, result = run(add(escape, live(IntObject(1))), 1)
+        self.assertEqual(result.getInt(), 6)
+        ops = [line.split()[1] for line in code.disassemble()]
+        self.assertTrue("EVAL" in ops)
+
+
+    def testNamedCall(self):
+        # o.run(0, "k" => 2), where o takes "k" => y and returns y.
+        null = ProfileNameIR.NullExpr()
+        namedPatt = ProfileNameIR.NamedPattern(live(StrObject(u"k")),
+            ProfileNameIR.NounPatt(u"y", null, 1), null)
+        method = ProfileNameIR.MethodExpr("mt:o.run/1:1:test", u"", RUN_1,
+            [ProfileNameIR.NounPatt(u"x", null, 0)], [namedPatt], null,
+            local(1), 2, LazyCode())
+        script = ProfileNameIR.ScriptExpr([], [method], [],
+                                          MethodTable([method], []))
+        obj = InterpObject(u"", u"o", script, [], None, u"test$o")
+        namedArgs = [ProfileNameIR.NamedArgExpr(live(StrObject(u"k")),
+                                                live(IntObject(2)))]
+        body = ProfileNameIR.CallExpr(live(obj), RUN_1, [live(IntObject(0))],
+            namedArgs, CallSite(RUN_1, literalKeys(namedArgs)))
+        _, result = run(body, 0)
+        self.assertEqual(result.getInt(), 2)
+
+
+class TestBytecodeEngine(TestCase):
+
+    def tearDown(self):
+        engineSettings.useAST()
+
+    def testRunMethod(self):
+        # object o { method run(x) { x + 1 } }
+        method = ProfileNameIR.MethodExpr("mt:o.run/1:1:test", u"", RUN_1,
+            [ProfileNameIR.NounPatt(u"x", ProfileNameIR.NullExpr(), 0)], [],
+            ProfileNameIR.NullExpr(), add(local(0), live(IntObject(1))), 1,
+            LazyCode())
+        script = ProfileNameIR.ScriptExpr([], [method], [],
+                                          MethodTable([method], []))
+        obj = InterpObject(u"", u"o", script, [], None, u"test$o")
+        engineSettings.useBytecode()
+        result = obj.runMethod(method, [IntObject(41)], EMPTY_MAP)
+        self.assertEqual(result.getInt(), 42)
+        code = method.code.code
+        self.assertTrue(code is not None)
+        result = obj.runMethod(method, [IntObject(1)], EMPTY_MAP)
+        self.assertEqual(result.getInt(), 2)
+        self.assertTrue(method.code.code is code)
@@ -0,0 +1,100 @@
+from unittest import TestCase
+
+from rpython.rlib.rbigint import rbigint
+
+from typhon.nano.escapes import ElidedEscapesIR, ElideEjectors
+from typhon.nano.scopes import SCOPE_LOCAL, SEV_NOUN, BoundNounsIR as ir
+
+def ejector():
+    return ir.NounPatt(u"ej", ir.NullExpr(), 0)
+
+def eject(value):
+    return ir.CallExpr(ir.LocalExpr(u"ej", 0), u"run", [value], [])
+
+def get(expr):
+    return ir.CallExpr(expr, u"get", [], [])
+
+def one():
+    return ir.IntExpr(rbigint.fromint(1))
+
+def elide(expr):
+    return ElideEjectors().visitExpr(expr)
+
+class Layout(object):
+    def __init__(self, frameNames):
+        self.frameNames = frameNames
+
+
+class TestElideEjectors(TestCase):
+
+    def testDirect(self):
+        expr = elide(ir.EscapeOnlyExpr(ejector(),
+            ir.SeqExpr([eject(one()), ir.NullExpr()])))
+        self.assertTrue(isinstance(expr, ElidedEscapesIR.LocalEscapeOnlyExpr))
+        self.assertEqual(expr.index, 0)
+        self.assertTrue(isinstance(expr.body.exprs[0],
+                                   ElidedEscapesIR.LocalEjectExpr))
+
+    def testCatch(self):
+        expr = elide(ir.EscapeExpr(ejector(), eject(one()),
+            ir.IgnorePatt(ir.NullExpr()), ir.NullExpr()))
+        self.assertTrue(isinstance(expr, ElidedEscapesIR.LocalEscapeExpr))
+
+    def testUnused(self):
+        expr = elide(ir.EscapeOnlyExpr(ejector(), one()))
+        self.assertTrue(isinstance(expr, ElidedEscapesIR.IntExpr))
+
+    def testPassed(self):
+        # The ejector is passed along, so it must be a real object.
+        expr = elide(ir.EscapeOnlyExpr(ejector(),
+            ir.CallExpr(ir.LocalExpr(u"f", 1), u"run",
+                        [ir.LocalExpr(u"ej", 0)], [])))
+        self.assertTrue(isinstance(expr, ElidedEscapesIR.EscapeOnlyExpr))
+
+    def testSlot(self):
+        patt = ir.FinalSlotPatt(u"ej", ir.NullExpr(), 0)
+        slotEject = ir.CallExpr(get(ir.LocalExpr(u"ej", 0)), u"run", [one()],
+                                [])
+        expr = elide(ir.EscapeOnlyExpr(patt, slotEject))
+        self.assertTrue(isinstance(expr, ElidedEscapesIR.LocalEscapeOnlyExpr))
+
+    def testTooFewGets(self):
+        # Calling run/1 on the slot itself doesn't eject.
+        patt = ir.FinalSlotPatt(u"ej", ir.NullExpr(), 0)
+        expr = elide(ir.EscapeOnlyExpr(patt, eject(one())))
+        self.assertTrue(isinstance(expr, ElidedEscapesIR.EscapeOnlyExpr))
+
+    def testTooManyGets(self):
+        # Calling run/1 on whatever the ejector's get/0 returns doesn't eject.
+        expr = elide(ir.EscapeOnlyExpr(ejector(),
+            ir.CallExpr(get(ir.LocalExpr(u"ej", 0)), u"run", [one()], [])))
+        self.assertTrue(isinstance(expr, ElidedEscapesIR.EscapeOnlyExpr))
+
+    def testLoopBreak(self):
+        # escape __break { _loop(xs, object _ { method run(k, v) {
+        #     escape __continue { __continue(); __break() } } }) }
+        # __continue is elided, but __break is closed over by the loop body
+        # and still needs an Ejector.
+        cont = ir.NounPatt(u"__continue", ir.NullExpr(), 2)
+        breakEject = ir.CallExpr(ir.FrameExpr(u"__break", 0), u"run", [],
+                                 [])
+        contEject = ir.CallExpr(ir.LocalExpr(u"__continue", 2), u"run", [],
+                                [])
+        method = ir.MethodExpr(None, u"run",
+            [ir.NounPatt(u"k", ir.NullExpr(), 0),
+             ir.NounPatt(u"v", ir.NullExpr(), 1)], [], ir.NullExpr(),
+            ir.EscapeOnlyExpr(cont, ir.SeqExpr([contEject, breakEject])), 3)
+        body = ir.ObjectExpr(None, ir.IgnorePatt(ir.NullExpr()), [],
+                             [method], [], None,
+                             Layout({u"__break": (0, SCOPE_LOCAL, 0,
+                                                  SEV_NOUN)}))
+        loop = ir.CallExpr(ir.OuterExpr(u"_loop", 0), u"run",
+                           [ir.LocalExpr(u"xs", 1), body], [])
+        expr = elide(ir.EscapeOnlyExpr(
+            ir.NounPatt(u"__break", ir.NullExpr(), 0), loop))
+        self.assertTrue(isinstance(expr, ElidedEscapesIR.EscapeOnlyExpr))
+        inner = expr.body.args[1].methods[0].body
+        self.assertTrue(isinstance(inner,
+                                   ElidedEscapesIR.LocalEscapeOnlyExpr))
+        self.assertTrue(isinstance(inner.body.exprs[1],
+                                   ElidedEscapesIR.CallExpr))
@@ -0,0 +1,58 @@
+from unittest import TestCase
+
+from typhon.atoms import getAtom
+from typhon.nano.hoist import hoistFrameReads
+from typhon.nano.mix import MixIR
+from typhon.nano.scopes import FrameTable, SCOPE_LOCAL, SEV_SLOT
+from typhon.objects.data import IntObject
+
+GET_0 = getAtom(u"get", 0)
+RUN_0 = getAtom(u"run", 0)
+
+
+class Layout(object):
+
+    def __init__(self, frameInfo):
+        self.frameTable = FrameTable(frameInfo)
+
+
+def read():
+    return MixIR.CallExpr(MixIR.FrameExpr(u"x", 0), GET_0, [], [])
+
+def closure(patt, reads):
+    # def x := 1; object o { method run() { x; x; ... } }
+    method = MixIR.MethodExpr(u"", RUN_0, [], [], MixIR.NullExpr(),
+                              MixIR.SeqExpr(reads), 2)
+    obj = MixIR.ClearObjectExpr(u"", MixIR.IgnorePatt(MixIR.NullExpr()),
+        MixIR.ScriptExpr([], [method], []),
+        Layout([(u"x", SCOPE_LOCAL, 0, SEV_SLOT)]))
+    return MixIR.SeqExpr([
+        MixIR.DefExpr(patt, MixIR.NullExpr(), MixIR.LiveExpr(IntObject(1))),
+        obj])
+
+
+class TestHoistFrameReads(TestCase):
+
+    def method(self, expr):
+        return expr.exprs[1].script.methods[0]
+
+    def testHoist(self):
+        patt = MixIR.FinalSlotPatt(u"x", MixIR.NullExpr(), 0)
+        method = self.method(hoistFrameReads(closure(patt, [read(), read()])))
+        self.assertEqual(method.localSize, 3)
+        hoisted, body = method.body.exprs
+        self.assertEqual(hoisted.patt.index, 2)
+        for expr in body.exprs:
+            self.assertTrue(isinstance(expr, MixIR.LocalExpr))
+            self.assertEqual(expr.index, 2)
+
+    def testSingleRead(self):
+        patt = MixIR.FinalSlotPatt(u"x", MixIR.NullExpr(), 0)
+        method = self.method(hoistFrameReads(closure(patt, [read()])))
+        self.assertEqual(method.localSize, 2)
+
+    def testVar(self):
+        patt = MixIR.VarSlotPatt(u"x", MixIR.NullExpr(), 0)
+        method = self.method(hoistFrameReads(closure(patt, [read(), read()])))
+        self.assertEqual(method.localSize, 2)
+        self.assertTrue(isinstance(method.body.exprs[0], MixIR.CallExpr))
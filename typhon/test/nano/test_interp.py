@@ -0,0 +1,448 @@
+from unittest import TestCase
+
+from rpython.rlib.rbigint import rbigint
+
+from typhon.atoms import getAtom
+from typhon.errors import UserException
+from typhon.load.nano import dumpMASTBytes
+from typhon.nano.bytecode import LazyCode
+from typhon.nano.interp import (CALL_SITE_ENTRIES, NULL_BINDING, CallSite,
+                                ElideGuards, Evaluator, EvaluatorPool,
+                                InlineCalls, InterpObject, LoweringMemo,
+                                MakeProfileNames, MethodTable, ProfileNameIR,
+                                evalBytesToPair, evalMonte, forwardedStamps,
+                                literalKeys, loweringMemo)
+from typhon.nano.mast import MastIR
+from typhon.nano.mix import MixIR
+from typhon.nano.scopes import (FrameTable, SCOPE_FRAME, SCOPE_LOCAL,
+                                SEV_NOUN)
+from typhon.objects.auditors import (deepFrozenGuard, deepFrozenStamp,
+                                     selfless, transparentStamp)
+from typhon.objects.collections.lists import wrapList
+from typhon.objects.collections.maps import EMPTY_MAP
+from typhon.objects.constants import NullObject, wrapBool
+from typhon.objects.data import IntObject, StrObject
+from typhon.objects.equality import isSameEver
+from typhon.objects.guards import IntGuard, anyGuard
+from typhon.objects.slots import finalBinding
+
+RUN_1 = getAtom(u"run", 1)
+
+def makeObject(stamps, body):
+    # object o { method run(x) { body } }
+    method = ProfileNameIR.MethodExpr("mt:o.run/1:1:test", u"", RUN_1,
+        [ProfileNameIR.NounPatt(u"x", ProfileNameIR.NullExpr(), 0)], [],
+        ProfileNameIR.NullExpr(), body, 1, LazyCode())
+    script = ProfileNameIR.ScriptExpr(stamps, [method], [],
+                                      MethodTable([method], stamps))
+    return InterpObject(u"", u"o", script, [], None, u"test$o")
+
+def call(obj, arg):
+    return MixIR.CallExpr(MixIR.LiveExpr(obj), RUN_1,
+                          [MixIR.LiveExpr(arg)], [])
+
+
+class TestInlineCalls(TestCase):
+
+    def testInline(self):
+        obj = makeObject([deepFrozenStamp], ProfileNameIR.LocalExpr(u"x", 0))
+        inliner = InlineCalls(3)
+        expr = inliner.visitExpr(call(obj, IntObject(5)))
+        self.assertTrue(isinstance(expr, MixIR.SeqExpr))
+        self.assertEqual(inliner.localSize, 4)
+        self.assertEqual(expr.exprs[-1].index, 3)
+        expr = MakeProfileNames().visitExpr(expr)
+        result = Evaluator([], inliner.localSize).visitExpr(expr)
+        self.assertEqual(result.getInt(), 5)
+
+    def testNotDeepFrozen(self):
+        obj = makeObject([], ProfileNameIR.LocalExpr(u"x", 0))
+        inliner = InlineCalls(3)
+        expr = inliner.visitExpr(call(obj, IntObject(5)))
+        self.assertTrue(isinstance(expr, MixIR.CallExpr))
+        self.assertEqual(inliner.localSize, 3)
+
+    def testOverBudget(self):
+        body = ProfileNameIR.SeqExpr([ProfileNameIR.LocalExpr(u"x", 0)] * 30)
+        obj = makeObject([deepFrozenStamp], body)
+        expr = InlineCalls(0).visitExpr(call(obj, IntObject(5)))
+        self.assertTrue(isinstance(expr, MixIR.CallExpr))
+
+
+class TestMethodTable(TestCase):
+
+    def testLookup(self):
+        obj = makeObject([], ProfileNameIR.LocalExpr(u"x", 0))
+        method = obj.script.methods[0]
+        self.assertTrue(obj.getMethod(RUN_1) is method)
+        self.assertTrue(obj.getMethod(getAtom(u"run", 0)) is None)
+
+    def testRespondsTo(self):
+        obj = makeObject([], ProfileNameIR.LocalExpr(u"x", 0))
+        self.assertEqual(obj.respondingAtoms().keys(), [RUN_1])
+        result = obj.call(u"_respondsTo", [StrObject(u"run"), IntObject(1)])
+        self.assertTrue(result is wrapBool(True))
+
+    def testBuilt(self):
+        # object _ { method run(x) { x } }, made ready for evaluation.
+        method = MixIR.MethodExpr(u"", RUN_1,
+            [MixIR.NounPatt(u"x", MixIR.NullExpr(), 0)], [],
+            MixIR.NullExpr(), MixIR.LocalExpr(u"x", 0), 1)
+        layout = Layout([])
+        expr = MakeProfileNames().visitExpr(MixIR.ClearObjectExpr(u"",
+            MixIR.IgnorePatt(MixIR.NullExpr()),
+            MixIR.ScriptExpr([], [method], []), layout))
+        script = expr.script
+        self.assertTrue(script.methodTable.lookup(RUN_1) is
+                        script.methods[0])
+
+
+UNCALL_0 = getAtom(u"_uncall", 0)
+AUDIT_1 = getAtom(u"audit", 1)
+ASK_1 = getAtom(u"ask", 1)
+
+def makeScript(stamps, atom, patts, body, localSize):
+    method = ProfileNameIR.MethodExpr("mt:o.test:1:test", u"", atom, patts,
+        [], ProfileNameIR.NullExpr(), body, localSize, LazyCode())
+    return ProfileNameIR.ScriptExpr(stamps, [method], [],
+                                    MethodTable([method], stamps))
+
+def makeRecord(i):
+    # object o implements Selfless, TransparentStamp { to _uncall() { [i] } }
+    body = ProfileNameIR.LiveExpr(wrapList([IntObject(i)]))
+    script = makeScript([selfless, transparentStamp], UNCALL_0, [], body, 0)
+    return InterpObject(u"", u"o", script, [], None, u"test$o")
+
+
+class TestStamps(TestCase):
+
+    def testDischargedEqual(self):
+        first = makeRecord(1)
+        self.assertTrue(selfless in first.auditorStamps())
+        self.assertTrue(isSameEver(first, makeRecord(1)))
+        self.assertFalse(isSameEver(first, makeRecord(2)))
+
+    def testForwarded(self):
+        # object _ as DeepFrozen { to audit(a) { a.ask(TransparentStamp); true } }
+        null = ProfileNameIR.NullExpr()
+        body = ProfileNameIR.SeqExpr([
+            ProfileNameIR.CallExpr(ProfileNameIR.LocalExpr(u"a", 0), ASK_1,
+                                   [ProfileNameIR.FrameExpr(u"T", 0)], [],
+                                   CallSite(ASK_1)),
+            ProfileNameIR.LiveExpr(wrapBool(True))])
+        script = makeScript([deepFrozenStamp], AUDIT_1,
+                            [ProfileNameIR.NounPatt(u"a", null, 0)], body, 1)
+        auditor = InterpObject(u"", u"_", script, [transparentStamp], None,
+                               u"test$_")
+        self.assertEqual(forwardedStamps([selfless, auditor]),
+                         [transparentStamp])
+        other = InterpObject(u"", u"_", script, [IntObject(1)], None,
+                             u"test$_")
+        self.assertTrue(forwardedStamps([other]) is None)
+
+
+class TestEvaluatorPool(TestCase):
+
+    def testReuse(self):
+        pool = EvaluatorPool()
+        e = pool.acquire([], 2)
+        e.locals[0] = IntObject(1)
+        pool.release(e)
+        again = pool.acquire([IntObject(2)], 2)
+        self.assertTrue(again is e)
+        self.assertTrue(again.locals[0] is NULL_BINDING)
+        self.assertEqual(again.frame[0].getInt(), 2)
+
+    def testPatternState(self):
+        pool = EvaluatorPool()
+        e = pool.acquire([], 1)
+        e.specimen = IntObject(1)
+        e.patternFailure = NullObject
+        e.ejected = IntObject(2)
+        pool.release(e)
+        again = pool.acquire([], 1)
+        self.assertTrue(again.specimen is None)
+        self.assertTrue(again.patternFailure is None)
+        self.assertTrue(again.ejected is None)
+
+    def testSizes(self):
+        pool = EvaluatorPool()
+        pool.release(pool.acquire([], 2))
+        self.assertEqual(len(pool.acquire([], 3).locals), 3)
+
+    def testNested(self):
+        pool = EvaluatorPool()
+        outer = pool.acquire([], 1)
+        inner = pool.acquire([], 1)
+        self.assertTrue(outer is not inner)
+
+
+def escape(index, body):
+    return ProfileNameIR.LocalEscapeOnlyExpr(u"ej", index, body)
+
+def eject(index, value):
+    return ProfileNameIR.LocalEjectExpr(u"ej", index,
+                                        ProfileNameIR.LiveExpr(value))
+
+
+class TestLocalEscapes(TestCase):
+
+    def testEject(self):
+        e = Evaluator([], 1)
+        result = e.visitExpr(escape(0, eject(0, IntObject(5))))
+        self.assertEqual(result.getInt(), 5)
+        self.assertTrue(e.ejected is None)
+
+    def testOuter(self):
+        # escape ej0 { escape ej1 { ej0(5) }; 6 }
+        body = escape(0, ProfileNameIR.SeqExpr([
+            escape(1, eject(0, IntObject(5))),
+            ProfileNameIR.LiveExpr(IntObject(6))]))
+        result = Evaluator([], 2).visitExpr(body)
+        self.assertEqual(result.getInt(), 5)
+
+    def testFinally(self):
+        # escape ej0 { try { ej0(5) } finally { escape ej1 { ej1(6) } } }
+        body = escape(0, ProfileNameIR.FinallyExpr(eject(0, IntObject(5)),
+            escape(1, eject(1, IntObject(6)))))
+        result = Evaluator([], 2).visitExpr(body)
+        self.assertEqual(result.getInt(), 5)
+
+
+class TestCallSite(TestCase):
+
+    def testHit(self):
+        obj = makeObject([], ProfileNameIR.LocalExpr(u"x", 0))
+        site = CallSite(RUN_1)
+        for i in range(3):
+            result = site.call(obj, [IntObject(i)], EMPTY_MAP)
+            self.assertEqual(result.getInt(), i)
+        self.assertEqual(site.misses, 1)
+        self.assertEqual(site.hits, 2)
+
+    def testPolymorphic(self):
+        site = CallSite(RUN_1)
+        for i in range(CALL_SITE_ENTRIES + 1):
+            obj = makeObject([], ProfileNameIR.LocalExpr(u"x", 0))
+            site.call(obj, [IntObject(i)], EMPTY_MAP)
+        self.assertEqual(len(site.scripts), CALL_SITE_ENTRIES)
+        self.assertEqual(site.megamorphic, 1)
+
+    def testBuiltin(self):
+        site = CallSite(getAtom(u"add", 1))
+        result = site.call(IntObject(1), [IntObject(2)], EMPTY_MAP)
+        self.assertEqual(result.getInt(), 3)
+        self.assertEqual(site.scripts, [])
+
+    def testSites(self):
+        expr = MakeProfileNames().visitExpr(call(IntObject(1), IntObject(2)))
+        self.assertTrue(isinstance(expr.site, CallSite))
+        self.assertTrue(expr.site.atom is RUN_1)
+
+
+def namedObject(default):
+    # object o { method run(x, "k" => y := default) { [x, y] } }
+    null = ProfileNameIR.NullExpr()
+    namedPatt = ProfileNameIR.NamedPattern(ProfileNameIR.LiveExpr(
+        StrObject(u"k")), ProfileNameIR.NounPatt(u"y", null, 1), default)
+    method = ProfileNameIR.MethodExpr("mt:o.run/1:1:test", u"", RUN_1,
+        [ProfileNameIR.NounPatt(u"x", null, 0)], [namedPatt], null,
+        ProfileNameIR.LocalExpr(u"y", 1), 2, LazyCode())
+    script = ProfileNameIR.ScriptExpr([], [method], [],
+                                      MethodTable([method], []))
+    return InterpObject(u"", u"o", script, [], None, u"test$o")
+
+def namedCall(obj, keys, values):
+    namedArgs = [ProfileNameIR.NamedArgExpr(ProfileNameIR.LiveExpr(k),
+                                            ProfileNameIR.LiveExpr(v))
+                 for k, v in zip(keys, values)]
+    site = CallSite(RUN_1, literalKeys(namedArgs))
+    return ProfileNameIR.CallExpr(ProfileNameIR.LiveExpr(obj), RUN_1,
+        [ProfileNameIR.LiveExpr(IntObject(0))], namedArgs, site)
+
+
+class TestNamedPlans(TestCase):
+
+    def testLiteral(self):
+        obj = namedObject(ProfileNameIR.NullExpr())
+        call = namedCall(obj, [StrObject(u"j"), StrObject(u"k")],
+                         [IntObject(1), IntObject(2)])
+        self.assertEqual(len(call.site.keys), 2)
+        result = Evaluator([], 0).visitExpr(call)
+        self.assertEqual(result.getInt(), 2)
+        plan = call.site.planFor(obj.script.methods[0])
+        self.assertEqual(plan.slots, [1])
+
+    def testDefault(self):
+        obj = namedObject(ProfileNameIR.LiveExpr(IntObject(7)))
+        call = namedCall(obj, [StrObject(u"j")], [IntObject(1)])
+        result = Evaluator([], 0).visitExpr(call)
+        self.assertEqual(result.getInt(), 7)
+
+    def testMissing(self):
+        obj = namedObject(ProfileNameIR.NullExpr())
+        call = namedCall(obj, [], [])
+        self.assertRaises(UserException, Evaluator([], 0).visitExpr, call)
+
+    def testDynamic(self):
+        obj = namedObject(ProfileNameIR.NullExpr())
+        call = namedCall(obj, [IntObject(1)], [IntObject(2)])
+        self.assertTrue(call.site.keys is None)
+
+
+def define(patt, value):
+    return MixIR.DefExpr(patt, MixIR.NullExpr(), value)
+
+
+class TestElideGuards(TestCase):
+
+    def setUp(self):
+        self.intGuard = MixIR.LiveExpr(IntGuard())
+
+    def testLiteralNoun(self):
+        expr = ElideGuards().visitExpr(define(
+            MixIR.NounPatt(u"x", self.intGuard, 0),
+            MixIR.LiveExpr(IntObject(1))))
+        self.assertTrue(isinstance(expr.patt.guard, MixIR.NullExpr))
+
+    def testWrongLiteral(self):
+        expr = ElideGuards().visitExpr(define(
+            MixIR.NounPatt(u"x", self.intGuard, 0),
+            MixIR.LiveExpr(StrObject(u"1"))))
+        self.assertTrue(isinstance(expr.patt.guard, MixIR.LiveExpr))
+
+    def testSlot(self):
+        expr = ElideGuards().visitExpr(define(
+            MixIR.FinalSlotPatt(u"x", self.intGuard, 0),
+            MixIR.LiveExpr(IntObject(1))))
+        self.assertTrue(isinstance(expr.patt, MixIR.ProvenFinalSlotPatt))
+        e = Evaluator([], 1)
+        e.visitExpr(MakeProfileNames().visitExpr(expr))
+        self.assertEqual(e.locals[0].call(u"getGuard", []), self.intGuard.obj)
+
+    def testThroughLocal(self):
+        # def x :Int := f(); def y :DeepFrozen := x
+        expr = ElideGuards().visitExpr(MixIR.SeqExpr([
+            define(MixIR.NounPatt(u"x", self.intGuard, 0),
+                   MixIR.LocalExpr(u"f", 2)),
+            define(MixIR.NounPatt(u"y", MixIR.LiveExpr(deepFrozenGuard), 1),
+                   MixIR.LocalExpr(u"x", 0))]))
+        first, second = expr.exprs
+        self.assertTrue(isinstance(first.patt.guard, MixIR.LiveExpr))
+        self.assertTrue(isinstance(second.patt.guard, MixIR.NullExpr))
+
+    def testMethodResult(self):
+        method = ProfileNameIR.MethodExpr("mt:o.run/1:1:test", u"", RUN_1,
+            [ProfileNameIR.NounPatt(u"x", ProfileNameIR.NullExpr(), 0)], [],
+            ProfileNameIR.LiveExpr(self.intGuard.obj),
+            ProfileNameIR.LocalExpr(u"x", 0), 1, LazyCode())
+        script = ProfileNameIR.ScriptExpr([], [method], [],
+                                          MethodTable([method], []))
+        obj = InterpObject(u"", u"o", script, [], None, u"test$o")
+        expr = ElideGuards().visitExpr(define(
+            MixIR.NounPatt(u"x", self.intGuard, 0),
+            call(obj, NullObject)))
+        self.assertTrue(isinstance(expr.patt.guard, MixIR.NullExpr))
+
+
+class TestLoweringMemo(TestCase):
+
+    def testRepeatedEval(self):
+        bs = dumpMASTBytes(MastIR.StrExpr(u"hi"))
+        loweringMemo.clear()
+        hits = loweringMemo.hits
+        for i in range(2):
+            result, _ = evalBytesToPair(bs, EMPTY_MAP)
+            self.assertEqual(result.toString(), u"hi")
+        self.assertEqual(loweringMemo.hits, hits + 1)
+
+    def testKey(self):
+        memo = LoweringMemo()
+        key = memo.keyFor("bytes", [u"x", u"y"], False)
+        self.assertEqual(key, memo.keyFor("bytes", [u"y", u"x"], False))
+        self.assertNotEqual(key, memo.keyFor("bytes", [u"x"], False))
+        self.assertNotEqual(key, memo.keyFor("bytes", [u"x", u"y"], True))
+
+    def testEviction(self):
+        memo = LoweringMemo()
+        memo.maxSize = 1
+        first = memo.lower(dumpMASTBytes(MastIR.StrExpr(u"a")), [], False)
+        second = memo.lower(dumpMASTBytes(MastIR.StrExpr(u"b")), [], False)
+        self.assertEqual(len(memo.cache), 1)
+        self.assertEqual(memo.evictions, 1)
+        self.assertTrue(memo.lower(dumpMASTBytes(MastIR.StrExpr(u"b")), [],
+                                   False) is second)
+        self.assertFalse(memo.lower(dumpMASTBytes(MastIR.StrExpr(u"a")), [],
+                                    False) is first)
+
+
+class Layout(object):
+
+    fqn = u"test$o"
+
+    def __init__(self, frameInfo):
+        self.frameTable = FrameTable(frameInfo)
+
+
+class TestFrames(TestCase):
+
+    def build(self, e, layout):
+        # object _ { } capturing x and y
+        return e.visitExpr(ProfileNameIR.ClearObjectExpr(u"",
+            ProfileNameIR.IgnorePatt(ProfileNameIR.NullExpr()),
+            ProfileNameIR.ScriptExpr([], [], [], MethodTable([], [])), layout))
+
+    def testCopyPlan(self):
+        layout = Layout([(u"x", SCOPE_LOCAL, 0, SEV_NOUN),
+                         (u"y", SCOPE_FRAME, 0, SEV_NOUN)])
+        e = Evaluator([IntObject(2)], 1)
+        e.locals[0] = IntObject(1)
+        first = self.build(e, layout)
+        self.assertEqual([o.getInt() for o in first.frame], [1, 2])
+        e.locals[0] = IntObject(3)
+        second = self.build(e, layout)
+        self.assertTrue(first.frame is not second.frame)
+        self.assertEqual(first.frame[0].getInt(), 1)
+        self.assertEqual(second.frame[0].getInt(), 3)
+
+    def testShared(self):
+        layout = Layout([(u"y", SCOPE_FRAME, 0, SEV_NOUN)])
+        layout.frameTable.shareable = True
+        e = Evaluator([IntObject(2)], 0)
+        first = self.build(e, layout)
+        self.assertTrue(self.build(e, layout).frame is first.frame)
+        other = self.build(Evaluator([IntObject(3)], 0), layout)
+        self.assertTrue(other.frame is not first.frame)
+        self.assertEqual(other.frame[0].getInt(), 3)
+
+    def makeMaker(self, patt):
+        # def x := 1; object maker { to run() { object _ { to get() { x } } } }
+        null = MastIR.NullExpr()
+        inner = MastIR.ObjectExpr(u"", MastIR.IgnorePatt(null), [null],
+            [MastIR.MethodExpr(u"", u"get", [], [], null,
+                               MastIR.NounExpr(u"x"))], [])
+        maker = MastIR.ObjectExpr(u"", MastIR.FinalPatt(u"maker", null),
+            [null], [MastIR.MethodExpr(u"", u"run", [], [], null, inner)], [])
+        expr = MastIR.SeqExpr([
+            MastIR.DefExpr(patt, null, MastIR.IntExpr(rbigint.fromint(1))),
+            maker])
+        env = {u"Int": finalBinding(IntGuard(), anyGuard)}
+        return evalMonte(expr, env, u"test")[0]
+
+    def testSharedDeepFrozen(self):
+        maker = self.makeMaker(MastIR.FinalPatt(u"x", MastIR.NounExpr(u"Int")))
+        first = maker.call(u"run", [])
+        second = maker.call(u"run", [])
+        self.assertTrue(first is not second)
+        self.assertTrue(first.frame is second.frame)
+        self.assertEqual(second.call(u"get", []).getInt(), 1)
+
+    def testNotSharedVar(self):
+        maker = self.makeMaker(MastIR.VarPatt(u"x", MastIR.NounExpr(u"Int")))
+        first = maker.call(u"run", [])
+        self.assertTrue(maker.call(u"run", []).frame is not first.frame)
+
+    def testNotSharedUnguarded(self):
+        maker = self.makeMaker(MastIR.FinalPatt(u"x", MastIR.NullExpr()))
+        first = maker.call(u"run", [])
+        self.assertTrue(maker.call(u"run", []).frame is not first.frame)
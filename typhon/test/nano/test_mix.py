@@ -0,0 +1,104 @@
+from unittest import TestCase
+
+from typhon.atoms import getAtom
+from typhon.nano.mix import MixIR, NoLiteralsIR, SpecializeCalls
+from typhon.objects.auditors import (deepFrozenStamp, selfless,
+                                     transparentStamp)
+from typhon.objects.constants import FalseObject, TrueObject
+from typhon.objects.data import IntObject, StrObject
+
+def live(obj):
+    return NoLiteralsIR.LiveExpr(obj)
+
+def specialize(expr):
+    return SpecializeCalls().visitExpr(expr)
+
+
+class TestSpecializeCalls(TestCase):
+
+    def testCall(self):
+        expr = specialize(NoLiteralsIR.CallExpr(live(IntObject(2)),
+            getAtom(u"add", 1), [live(IntObject(3))], []))
+        self.assertTrue(isinstance(expr, MixIR.LiveExpr))
+        self.assertEqual(expr.obj.getInt(), 5)
+
+    def testCallNamedArgs(self):
+        expr = specialize(NoLiteralsIR.CallExpr(live(IntObject(2)),
+            getAtom(u"add", 1), [live(IntObject(3))],
+            [NoLiteralsIR.NamedArgExpr(live(StrObject(u"k")),
+                                       live(IntObject(1)))]))
+        self.assertTrue(isinstance(expr, MixIR.LiveExpr))
+        self.assertEqual(expr.obj.getInt(), 5)
+
+    def testCallDynamicNamedArgs(self):
+        expr = specialize(NoLiteralsIR.CallExpr(live(IntObject(2)),
+            getAtom(u"add", 1), [live(IntObject(3))],
+            [NoLiteralsIR.NamedArgExpr(live(StrObject(u"k")),
+                                       NoLiteralsIR.LocalExpr(u"x", 0))]))
+        self.assertTrue(isinstance(expr, MixIR.CallExpr))
+
+    def testIfTrue(self):
+        expr = specialize(NoLiteralsIR.IfExpr(live(TrueObject),
+            live(IntObject(1)), NoLiteralsIR.LocalExpr(u"x", 0)))
+        self.assertEqual(expr.obj.getInt(), 1)
+
+    def testIfFalse(self):
+        expr = specialize(NoLiteralsIR.IfExpr(live(FalseObject),
+            live(IntObject(1)), NoLiteralsIR.LocalExpr(u"x", 0)))
+        self.assertTrue(isinstance(expr, MixIR.LocalExpr))
+
+    def testIfDynamic(self):
+        expr = specialize(NoLiteralsIR.IfExpr(NoLiteralsIR.LocalExpr(u"x", 0),
+            live(IntObject(1)), live(IntObject(2))))
+        self.assertTrue(isinstance(expr, MixIR.IfExpr))
+
+    def testSeqDropsLiterals(self):
+        local = NoLiteralsIR.LocalExpr(u"x", 0)
+        expr = specialize(NoLiteralsIR.SeqExpr([live(IntObject(1)),
+            NoLiteralsIR.NullExpr(), local, live(IntObject(2))]))
+        self.assertTrue(isinstance(expr, MixIR.SeqExpr))
+        self.assertEqual(len(expr.exprs), 2)
+        self.assertTrue(isinstance(expr.exprs[0], MixIR.LocalExpr))
+        self.assertEqual(expr.exprs[1].obj.getInt(), 2)
+
+    def testSeqCollapses(self):
+        expr = specialize(NoLiteralsIR.SeqExpr([live(IntObject(1)),
+            NoLiteralsIR.NullExpr(), live(IntObject(2))]))
+        self.assertTrue(isinstance(expr, MixIR.LiveExpr))
+        self.assertEqual(expr.obj.getInt(), 2)
+
+
+def makeObject(auditors):
+    # object o as auditors[0] implements auditors[1:]... { }
+    return NoLiteralsIR.ObjectExpr(u"",
+        NoLiteralsIR.NounPatt(u"o", NoLiteralsIR.NullExpr(), 0), {}, auditors,
+        NoLiteralsIR.ScriptExpr([], [], []), None, None, None)
+
+
+class TestDischargeStamps(TestCase):
+
+    def testImplements(self):
+        expr = specialize(makeObject([NoLiteralsIR.NullExpr(),
+                                      live(selfless), live(transparentStamp)]))
+        self.assertTrue(isinstance(expr, MixIR.ClearObjectExpr))
+        self.assertEqual(expr.script.stamps, [selfless, transparentStamp])
+
+    def testAs(self):
+        expr = specialize(makeObject([live(deepFrozenStamp)]))
+        self.assertTrue(isinstance(expr, MixIR.ClearObjectExpr))
+        self.assertEqual(expr.script.stamps, [deepFrozenStamp])
+        self.assertTrue(expr.patt.guard.obj is deepFrozenStamp)
+
+    def testAsTransparent(self):
+        expr = specialize(makeObject([live(transparentStamp)]))
+        self.assertTrue(isinstance(expr, MixIR.ObjectExpr))
+        self.assertEqual(expr.script.stamps, [])
+
+    def testOtherAuditor(self):
+        auditor = NoLiteralsIR.LocalExpr(u"a", 1)
+        expr = specialize(makeObject([live(deepFrozenStamp), auditor,
+                                      live(selfless)]))
+        self.assertTrue(isinstance(expr, MixIR.ObjectExpr))
+        self.assertEqual(expr.script.stamps, [selfless])
+        self.assertEqual(len(expr.auditors), 2)
+        self.assertTrue(expr.auditors[0].obj is deepFrozenStamp)
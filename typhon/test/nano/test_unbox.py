@@ -0,0 +1,61 @@
+from unittest import TestCase
+
+from typhon.atoms import getAtom
+from typhon.nano.interp import Evaluator, MakeProfileNames
+from typhon.nano.mix import MixIR
+from typhon.nano.unbox import UnboxVars
+from typhon.objects.data import IntObject
+from typhon.objects.guards import IntGuard
+
+GET_0 = getAtom(u"get", 0)
+PUT_1 = getAtom(u"put", 1)
+RUN_0 = getAtom(u"run", 0)
+
+def method(body):
+    return MixIR.MethodExpr(u"", RUN_0, [], [], MixIR.NullExpr(), body, 2)
+
+def var(guard):
+    # var x :guard := 1
+    return MixIR.DefExpr(MixIR.VarSlotPatt(u"x", guard, 0), MixIR.NullExpr(),
+                         MixIR.LiveExpr(IntObject(1)))
+
+def put(value):
+    return MixIR.CallExpr(MixIR.LocalExpr(u"x", 0), PUT_1,
+                          [MixIR.LiveExpr(value)], [])
+
+get = MixIR.CallExpr(MixIR.LocalExpr(u"x", 0), GET_0, [], [])
+
+
+class TestUnboxVars(TestCase):
+
+    def setUp(self):
+        self.intGuard = MixIR.LiveExpr(IntGuard())
+
+    def testUnbox(self):
+        # var x :Int := 1; x := 2; x
+        m = UnboxVars().visitMethod(method(MixIR.SeqExpr([
+            var(self.intGuard), put(IntObject(2)), get])))
+        first, second, third = m.body.exprs
+        self.assertTrue(isinstance(first.patt, MixIR.NounPatt))
+        self.assertTrue(isinstance(second, MixIR.LocalAssignExpr))
+        self.assertTrue(second.guard.obj is self.intGuard.obj)
+        self.assertTrue(isinstance(third, MixIR.LocalExpr))
+        e = Evaluator([], 1)
+        result = e.visitExpr(MakeProfileNames().visitExpr(m.body))
+        self.assertEqual(result.getInt(), 2)
+
+    def testReified(self):
+        # var x := 1; &x
+        m = UnboxVars().visitMethod(method(MixIR.SeqExpr([
+            var(MixIR.NullExpr()), MixIR.LocalExpr(u"x", 0)])))
+        self.assertTrue(isinstance(m.body.exprs[0].patt, MixIR.VarSlotPatt))
+
+    def testDynamicGuard(self):
+        # var x :g := 1; x
+        m = UnboxVars().visitMethod(method(MixIR.SeqExpr([
+            var(MixIR.LocalExpr(u"g", 1)), get])))
+        self.assertTrue(isinstance(m.body.exprs[0].patt, MixIR.VarSlotPatt))
+
+    def testTopLevel(self):
+        expr = UnboxVars().visitExpr(MixIR.SeqExpr([var(self.intGuard), get]))
+        self.assertTrue(isinstance(expr.exprs[0].patt, MixIR.VarSlotPatt))
@@ -0,0 +1,79 @@
+import os
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from typhon import ruv
+from typhon.load.nano import dumpMASTBytes
+from typhon.nano.mast import MastIR
+from typhon.objects.collections.lists import wrapList
+from typhon.objects.collections.maps import EMPTY_MAP, unwrapMap
+from typhon.objects.data import StrObject, unwrapStr
+from typhon.objects.refs import isBroken, resolution
+from typhon.scopes.unsafe import LoadTyphonFiles
+from typhon.vats import Vat, scopedVat
+
+
+class TestLoadTyphonFiles(TestCase):
+
+    def setUp(self):
+        self.dir = mkdtemp()
+
+    def tearDown(self):
+        for name in os.listdir(self.dir):
+            os.unlink(os.path.join(self.dir, name))
+        os.rmdir(self.dir)
+
+    def write(self, name, contents):
+        with open(os.path.join(self.dir, name + ".mast"), "wb") as handle:
+            handle.write(contents)
+
+    def module(self, name, s):
+        self.write(name, dumpMASTBytes(MastIR.StrExpr(s)))
+
+    def loadAll(self, names):
+        """
+        Load some modules in a single batch, run the vat and the loop until
+        all of the reads and evaluations are done, and return the promises
+        by module name.
+        """
+
+        uv_loop = ruv.alloc_loop()
+        vat = Vat(None, uv_loop, name=u"test", checkpoints=-1)
+        loader = LoadTyphonFiles([self.dir])
+        with scopedVat(vat):
+            rv = loader.call(u"run",
+                             [wrapList([StrObject(name) for name in names]),
+                              EMPTY_MAP])
+            while vat.hasTurns() or ruv.loopAlive(uv_loop):
+                vat.takeSomeTurns()
+                ruv.run(uv_loop, ruv.RUN_NOWAIT)
+        promises = {}
+        for k, v in unwrapMap(rv).items():
+            promises[unwrapStr(k)] = v
+        return promises
+
+    def testBatch(self):
+        self.module("a", u"first")
+        self.module("b", u"second")
+        promises = self.loadAll([u"a", u"b"])
+        self.assertEqual(sorted(promises.keys()), [u"a", u"b"])
+        self.assertEqual(unwrapStr(resolution(promises[u"a"])), u"first")
+        self.assertEqual(unwrapStr(resolution(promises[u"b"])), u"second")
+
+    def testMissing(self):
+        self.module("a", u"first")
+        promises = self.loadAll([u"a", u"missing"])
+        self.assertTrue(isBroken(promises[u"missing"]))
+        self.assertEqual(unwrapStr(promises[u"missing"].optProblem()),
+                         u"Unable to locate missing")
+        # The rest of the batch is unaffected.
+        self.assertEqual(unwrapStr(resolution(promises[u"a"])), u"first")
+
+    def testUndecodable(self):
+        self.module("a", u"first")
+        self.write("bad", "Not MAST at all")
+        promises = self.loadAll([u"a", u"bad"])
+        self.assertTrue(isBroken(promises[u"bad"]))
+        self.assertEqual(unwrapStr(promises[u"bad"].optProblem()),
+                         u"Couldn't decode module bad")
+        self.assertEqual(unwrapStr(resolution(promises[u"a"])), u"first")
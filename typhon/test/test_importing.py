@@ -0,0 +1,146 @@
+import os
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from typhon.importing import AstModule, ModuleCache, loweredCache, statFile
+from typhon.load.nano import InvalidMAST, MASTStream, dumpMASTBytes, openMAST
+from typhon.metrics import Recorder
+from typhon.nano.mast import MastIR
+
+
+class FakeModule(object):
+
+    def __init__(self, origin):
+        self.origin = origin
+
+
+class TestModuleCache(TestCase):
+
+    def setUp(self):
+        self.dir = mkdtemp()
+
+    def tearDown(self):
+        for name in os.listdir(self.dir):
+            os.unlink(os.path.join(self.dir, name))
+        os.rmdir(self.dir)
+
+    def module(self, name, contents="MAST"):
+        path = os.path.join(self.dir, name + ".mast")
+        with open(path, "wb") as handle:
+            handle.write(contents)
+        return FakeModule(path.decode("utf-8")), statFile(path)
+
+    def astModule(self, name):
+        path = os.path.join(self.dir, name + ".mast")
+        with open(path, "wb") as handle:
+            handle.write(dumpMASTBytes(MastIR.StrExpr(name.decode("utf-8"))))
+        module = AstModule(Recorder(), path.decode("utf-8"))
+        module.load(openMAST(path), path)
+        return module, statFile(path)
+
+    def testHit(self):
+        cache = ModuleCache()
+        module, stat = self.module("a")
+        cache.put("a", module, stat)
+        self.assertTrue(cache.get("a") is module)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 0)
+
+    def testMiss(self):
+        cache = ModuleCache()
+        self.assertTrue(cache.get("a") is None)
+        self.assertEqual(cache.misses, 1)
+
+    def testChanged(self):
+        cache = ModuleCache()
+        module, stat = self.module("a")
+        cache.put("a", module, stat)
+        self.module("a", "Changed MAST")
+        self.assertTrue(cache.get("a") is None)
+        self.assertEqual(cache.invalidations, 1)
+        self.assertEqual(len(cache.cache), 0)
+
+    def testRemoved(self):
+        cache = ModuleCache()
+        module, stat = self.module("a")
+        cache.put("a", module, stat)
+        os.unlink(module.origin)
+        self.assertTrue(cache.get("a") is None)
+        self.assertEqual(cache.invalidations, 1)
+
+    def testEviction(self):
+        cache = ModuleCache()
+        cache.maxSize = 2
+        modules = {}
+        for name in "abc":
+            module, stat = self.astModule(name)
+            modules[name] = module
+            cache.put(name, module, stat)
+            if name == "b":
+                # Touch a, so that b is the least recently used.
+                cache.get("a")
+        self.assertEqual(cache.cache.keys(), ["a", "c"])
+        self.assertEqual(cache.evictions, 1)
+        self.assertTrue(cache.get("b") is None)
+        self.assertTrue(cache.get("a") is modules["a"])
+        self.assertTrue(cache.get("c") is modules["c"])
+
+
+class TestAstModule(TestCase):
+
+    def testLowerOnce(self):
+        module = AstModule(Recorder(), u"test")
+        module.load(MASTStream(dumpMASTBytes(MastIR.StrExpr(u"hi"))))
+        lowered = module.lower([u"x", u"y"])
+        self.assertTrue(module.lower([u"y", u"x"]) is lowered)
+        self.assertFalse(module.lower([u"x"]) is lowered)
+
+
+class TestLoweredModules(TestCase):
+
+    def setUp(self):
+        self.dir = mkdtemp()
+        loweredCache.enable(os.path.join(self.dir, "cache"))
+        os.mkdir(loweredCache.path)
+        self.path = os.path.join(self.dir, "test.mast")
+        self.write(u"hi")
+
+    def tearDown(self):
+        for name in os.listdir(loweredCache.path):
+            os.unlink(os.path.join(loweredCache.path, name))
+        os.rmdir(loweredCache.path)
+        loweredCache.path = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        os.rmdir(self.dir)
+
+    def write(self, s):
+        with open(self.path, "wb") as handle:
+            handle.write(dumpMASTBytes(MastIR.StrExpr(s)))
+
+    def load(self):
+        module = AstModule(Recorder(), u"test")
+        module.load(openMAST(self.path), self.path)
+        return module
+
+    def testMiss(self):
+        module = self.load()
+        self.assertTrue(module.astSource is None)
+        self.assertTrue(module.lower([]) is not None)
+        # Lowered and stored, so the file can be read again if needed.
+        self.assertTrue(module.astSource is None)
+        self.assertEqual(len(os.listdir(loweredCache.path)), 1)
+
+    def testHit(self):
+        self.load().lower([])
+        module = self.load()
+        # Only the hash is kept, so a hit never needs the file.
+        os.unlink(self.path)
+        self.assertTrue(module.lower([]) is not None)
+        self.assertTrue(module.astSource is None)
+        self.assertFalse(hasattr(module, "source"))
+
+    def testChanged(self):
+        module = self.load()
+        self.write(u"bye")
+        self.assertRaises(InvalidMAST, module.lower, [])
@@ -0,0 +1,63 @@
+from unittest import TestCase
+
+from typhon.nanopass import fusePasses, makeIR
+
+TestIR = makeIR("Test",
+    ["Name"],
+    {
+        "Expr": {
+            "LeafExpr": [("name", "Name")],
+            "PairExpr": [("left", "Expr"), ("right", "Expr")],
+            "ListExpr": [("exprs", "Expr*"), ("note", None)],
+        },
+    }
+)
+
+NoPairsIR = TestIR.extend("NoPairs", [],
+    {
+        "Expr": {
+            "-PairExpr": None,
+        },
+    }
+)
+
+class Unpair(TestIR.makePassTo(NoPairsIR)):
+
+    def visitPairExpr(self, left, right):
+        return self.dest.ListExpr([self.visitExpr(left),
+                                   self.visitExpr(right)], None)
+
+class Flatten(NoPairsIR.selfPass()):
+
+    def visitListExpr(self, exprs, note):
+        rv = []
+        for expr in [self.visitExpr(expr) for expr in exprs]:
+            if isinstance(expr, self.dest.ListExpr):
+                rv.extend(expr.exprs)
+            else:
+                rv.append(expr)
+        return self.dest.ListExpr(rv, note)
+
+class Shout(NoPairsIR.selfPass()):
+
+    def visitName(self, name):
+        return name.upper()
+
+
+class TestNodeCounter(TestCase):
+
+    def testCount(self):
+        leaf = TestIR.LeafExpr(u"x")
+        tree = TestIR.ListExpr([TestIR.PairExpr(leaf, leaf), leaf], None)
+        counter = TestIR.makeNodeCounter()()
+        self.assertEqual(counter.visitExpr(tree), 5)
+
+
+class TestFusePasses(TestCase):
+
+    def testFuse(self):
+        leaf = TestIR.LeafExpr(u"x")
+        tree = TestIR.PairExpr(TestIR.PairExpr(leaf, leaf), leaf)
+        expr = fusePasses(Unpair, Shout, Flatten)().visitExpr(tree)
+        self.assertTrue(isinstance(expr, NoPairsIR.ListExpr))
+        self.assertEqual([e.name for e in expr.exprs], [u"X"] * 3)